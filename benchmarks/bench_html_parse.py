@@ -0,0 +1,85 @@
+"""Compare HTML parse time per message before and after sharing one tree.
+
+"before" reproduces the previous pipeline, which parsed the same body five
+times (text extraction, ``cid:`` discovery, two ADF builds and the PDF
+render).  "after" runs the same consumers against a single
+:class:`gaij.html_document.HtmlDocument`.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_html_parse.py [--messages N] [--parser P]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+from bs4 import BeautifulSoup
+
+from gaij.html_document import PARSER, HtmlDocument
+from gaij.html_renderer import render_html
+from gaij.html_to_adf import build_adf_from_tree
+
+
+def sample_html(paragraphs: int = 200) -> str:
+    rows = "".join(
+        f"<tr><td>Row {i}</td><td><a href='https://example.com/{i}'>link</a></td></tr>"
+        for i in range(20)
+    )
+    body = "".join(
+        f"<p style='color:#333'>Paragraph {i} with <b>bold</b>, <i>italic</i> and "
+        f"a line<br>break. <img src='cid:img{i % 5}@example'></p>"
+        for i in range(paragraphs)
+    )
+    return f"<html><body><div>{body}<table>{rows}</table></div></body></html>"
+
+
+def before(html: str, parser: str) -> None:
+    BeautifulSoup(html, parser).get_text().strip()
+    soup = BeautifulSoup(html, parser)
+    soup.find_all(src=True)
+    build_adf_from_tree(BeautifulSoup(html, parser), {})
+    build_adf_from_tree(BeautifulSoup(html, parser), {})
+    render_html(html, [], "pdf", document=HtmlDocument(html, parser))
+
+
+def after(html: str, parser: str) -> None:
+    document = HtmlDocument(html, parser)
+    _ = document.text
+    _ = document.cid_refs
+    build_adf_from_tree(document.soup, {})
+    build_adf_from_tree(document.soup, {})
+    render_html(html, [], "pdf", document=document)
+
+
+def timed(fn: Callable[[str, str], None], html: str, parser: str, runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(html, parser)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--messages", type=int, default=50)
+    ap.add_argument("--paragraphs", type=int, default=200)
+    ap.add_argument("--parser", default=PARSER)
+    args = ap.parse_args()
+
+    html = sample_html(args.paragraphs)
+    print(f"parser={args.parser} html={len(html)} bytes messages={args.messages}")
+    for name, fn in (("before", before), ("after", after)):
+        samples = timed(fn, html, args.parser, args.messages)
+        print(
+            f"{name:>6}: median {statistics.median(samples) * 1000:.1f} ms/message, "
+            f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare the e-mail PDF rendering before and after the streaming writer.
+
+"before" reproduces the previous single-page, uncompressed writer that built
+the whole document in a ``bytearray``.  "after" is
+:func:`gaij.html_renderer.render_html_to` writing into a file, as the app
+does.  Both start from the same parsed document, so only the PDF writing is
+measured.  Reports bytes per rendered e-mail, pages and render time for
+1 KB, 100 KB and 5 MB HTML bodies.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_pdf_render.py [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from functools import partial
+
+from gaij.html_document import HtmlDocument
+from gaij.html_renderer import render_html_to
+
+SIZES = {"1KB": 1024, "100KB": 100 * 1024, "5MB": 5 * 1024 * 1024}
+
+
+def sample_html(size: int) -> str:
+    paragraph = (
+        "<p>Hello team,<br>the invoice for <b>March</b> is attached (see the "
+        "<a href='https://example.com/x'>portal</a>). Please review the totals "
+        "and confirm by Friday.</p>"
+    )
+    return "<html><body>" + paragraph * max(1, size // len(paragraph)) + "</body></html>"
+
+
+def before(text: str) -> bytes:
+    esc = text.replace("\\", r"\\\\").replace("(", r"\\(").replace(")", r"\\)")
+    parts: list[str] = []
+    for i, line in enumerate(esc.split("\n")):
+        if i:
+            parts.append("0 -14 Td")
+        parts.append(f"({line}) Tj")
+    content = "BT /F1 12 Tf 72 720 Td " + " ".join(parts) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        "/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf.extend(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace"))
+    xref = len(pdf)
+    pdf.extend(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for off in offsets:
+        pdf.extend(f"{off:010d} 00000 n \n".encode())
+    pdf.extend(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n".encode())
+    pdf.extend(f"startxref\n{xref}\n%%EOF".encode())
+    return bytes(pdf)
+
+
+def after(document: HtmlDocument) -> int:
+    with tempfile.TemporaryFile() as sink:
+        render_html_to(sink, document.html, [], "pdf", document=document)
+        return sink.tell()
+
+
+def timed(fn: Callable[[], int], runs: int) -> tuple[int, float]:
+    samples, size = [], 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        size = fn()
+        samples.append(time.perf_counter() - started)
+    return size, statistics.median(samples)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    for label, size in SIZES.items():
+        document = HtmlDocument(sample_html(size))
+        text = document.render_text
+        results = {
+            "before": timed(partial(lambda t: len(before(t)), text), args.runs),
+            "after": timed(partial(after, document), args.runs),
+        }
+        for name, (size_out, seconds) in results.items():
+            print(
+                f"{label:>6} {name:>6}: {size_out:>10,} bytes/email, "
+                f"{seconds * 1000:8.1f} ms/render"
+            )
+
+
+if __name__ == "__main__":
+    main()
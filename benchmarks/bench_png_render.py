@@ -0,0 +1,55 @@
+"""Compare the e-mail PNG output before and after the text rasterizer.
+
+"before" is the previous placeholder, ``b"PNGFAKE"`` followed by the raw
+HTML.  "after" is :func:`gaij.html_renderer.render_html_to` drawing the
+e-mail's text into a 1-bit PNG with the default limits.  Reports bytes per
+rendered e-mail and render time for 1 KB, 100 KB and 5 MB HTML bodies.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_png_render.py [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+from functools import partial
+
+from bench_pdf_render import SIZES, sample_html, timed
+
+from gaij.html_document import HtmlDocument
+from gaij.html_renderer import render_html_to
+
+
+def before(html: str) -> int:
+    return len(b"PNGFAKE" + html.encode("utf-8"))
+
+
+def after(document: HtmlDocument) -> int:
+    with tempfile.TemporaryFile() as sink:
+        render_html_to(sink, document.html, [], "png", document=document)
+        return sink.tell()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    for label, size in SIZES.items():
+        document = HtmlDocument(sample_html(size))
+        document.render_text  # noqa: B018 - parse outside the timed region
+        results = {
+            "before": timed(partial(before, document.html), args.runs),
+            "after": timed(partial(after, document), args.runs),
+        }
+        for name, (size_out, seconds) in results.items():
+            print(
+                f"{label:>6} {name:>6}: {size_out:>10,} bytes/email, "
+                f"{seconds * 1000:8.1f} ms/render"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,38 @@
 import base64
+import itertools
 import json
 import os
 import re
-from collections.abc import Mapping
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
 from email.utils import parseaddr
+from functools import partial
 from typing import Any
 
+from bs4 import BeautifulSoup
 from flask import Flask, request
 
-from . import firestore_state, gmail_client, jira_client
-from .gpt_agent import gpt_classify_issue
-from .html_renderer import render_html
-from .html_to_adf import build_adf_from_html, prepend_note
+from . import (
+    classification_cache,
+    classifier,
+    firestore_state,
+    gmail_client,
+    jira_client,
+    jira_http,
+    payloads,
+    render_cache,
+    render_pool,
+    work_queue,
+)
+from .html_document import HtmlDocument
+from .html_renderer import render_html_to
+from .html_to_adf import build_adf_from_tree, prepend_note
 from .logger_setup import logger
+from .png_writer import PngOptions
 from .settings import settings
 
 TOKEN_PATH = settings.gmail_token_file_path
@@ -27,8 +47,9 @@ def validate_config() -> None:
 app = Flask(__name__)
 validate_config()
 
-DOMAIN_MAP = settings.domain_to_client_json
 ALLOWED_SENDERS = {s.strip().lower() for s in settings.allowed_senders_json}
+# Messages checkpointed just before the gap are rescanned to be safe.
+_GAP_OVERLAP = timedelta(hours=1)
 
 
 def is_sender_allowed(sender_addr: str, sender_full: str) -> bool:
@@ -38,14 +59,15 @@ def is_sender_allowed(sender_addr: str, sender_full: str) -> bool:
     return True
 
 
-def classify_client_and_issue(msg: Mapping[str, str], sender_addr: str) -> tuple[str, str]:
-    classification = gpt_classify_issue(msg.get("subject", ""), msg.get("body_text", ""))
-    issue_type = classification.get("issueType", "Task") if classification else "Task"
-    client = classification.get("client", "N/A") if classification else "N/A"
-    domain = sender_addr.split("@")[-1].lower() if "@" in sender_addr else ""
-    if domain in DOMAIN_MAP:
-        client = DOMAIN_MAP[domain]
-    return issue_type, client
+def _wants_full_message(meta: Mapping[str, Any]) -> bool:
+    sender_addr = parseaddr(meta.get("from", ""))[1].lower()
+    return not ALLOWED_SENDERS or sender_addr in ALLOWED_SENDERS
+
+
+def classify_client_and_issue(
+    msg: Mapping[str, Any], sender_addr: str
+) -> classifier.Classification:
+    return classifier.classify(msg.get("subject", ""), msg.get("body_text", ""), sender_addr)
 
 
 def sanitize_msg_id(raw_msg_id: str) -> str:
@@ -85,21 +107,259 @@ def extract_history_id(payload: Mapping[str, Any]) -> int | None:
         return None
 
 
-def handle_new_messages(last_history_id: int, history_id: int) -> None:
-    failed = False
-    for mid in gmail_client.list_new_message_ids_since(last_history_id, history_id):
-        try:
-            process_message(mid)
-        except Exception as exc:
-            failed = True
-            logger.error("Error processing message %s: %s", mid, exc)
-    if failed:
+def _process_safely(
+    message_id: str, writer: firestore_state.StateWriter | None = None
+) -> bool:
+    """Run :func:`process_message` and report whether it succeeded."""
+    try:
+        process_message(message_id, writer=writer)
+    except Exception as exc:
+        logger.error("Error processing message %s: %s", message_id, exc)
+        return False
+    return True
+
+
+def process_message_ids(
+    message_ids: Iterable[str],
+    writer: firestore_state.StateWriter | None = None,
+    failed: list[str] | None = None,
+) -> bool:
+    """Process ``message_ids`` on a bounded worker pool.
+
+    At most ``settings.message_concurrency`` messages run at once and only a
+    small window of IDs is pulled from ``message_ids`` ahead of the workers, so
+    long history listings are still consumed lazily.  Returns ``True`` only if
+    every message succeeded; the IDs that did not are appended to ``failed``.
+    With a ``writer``, end-of-message state is left in it for the caller to
+    flush.
+    """
+    failures = failed if failed is not None else []
+    before = len(failures)
+    concurrency = max(1, settings.message_concurrency)
+    if concurrency == 1:
+        failures.extend(mid for mid in message_ids if not _process_safely(mid, writer))
+    else:
+        _process_in_pool(message_ids, writer, failures, concurrency)
+    return len(failures) == before
+
+
+def _process_in_pool(
+    message_ids: Iterable[str],
+    writer: firestore_state.StateWriter | None,
+    failures: list[str],
+    concurrency: int,
+) -> None:
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gaij-msg") as pool:
+        pending: dict[Future[bool], str] = {}
+        for mid in message_ids:
+            if len(pending) >= 2 * concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                failures.extend(pending.pop(f) for f in done if not f.result())
+            pending[pool.submit(_process_safely, mid, writer)] = mid
+        failures.extend(mid for f, mid in pending.items() if not f.result())
+
+
+def _prefetch(chunk: list[str]) -> None:
+    try:
+        gmail_client.prefetch_messages(chunk, _wants_full_message)
+    except Exception as exc:
+        # Messages that were not prefetched are fetched one by one.
+        logger.warning("Prefetching %d messages failed: %s", len(chunk), exc)
+
+
+def _prefetching(message_ids: Iterable[str]) -> Iterator[str]:
+    """Yield ``message_ids`` while batch-fetching the next chunk ahead.
+
+    IDs are taken in chunks of ``GMAIL_PREFETCH_CHUNK``.  Before a chunk is
+    handed on, its messages are fetched with Gmail batch requests and the
+    fetch of the following chunk is started in the background, so it runs
+    while the current chunk goes through GPT and Jira.  The background
+    thread gets its own Gmail service from :func:`gmail_client.get_gmail_service`.
+    """
+    ids = iter(message_ids)
+    size = max(1, settings.gmail_prefetch_chunk)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="gaij-prefetch") as pool:
+        chunk = list(itertools.islice(ids, size))
+        ahead = pool.submit(_prefetch, chunk)
+        while chunk:
+            ahead.result()
+            upcoming = list(itertools.islice(ids, size))
+            ahead = pool.submit(_prefetch, upcoming)
+            yield from chunk
+            chunk = upcoming
+
+
+def _save_history_cursor(
+    start: int,
+    resumed_from: str | None,
+    pages: list[tuple[str | None, list[str]]],
+    failed: list[str],
+) -> None:
+    """Point the next listing from ``start`` at the first page with a failure.
+
+    Pages before it are fully processed, so a retry need not list them again.
+    Nothing is written when the cursor does not change.
+    """
+    failed_ids = set(failed)
+    token = next((t for t, ids in pages if failed_ids.intersection(ids)), None)
+    if token != resumed_from:
+        firestore_state.set_history_cursor(start, token)
+
+
+def _recover_history_gap(history_id: int) -> bool:
+    """Rescan the watched label after Gmail history expired, then re-baseline.
+
+    Messages received since the checkpoint was last advanced (at most
+    ``GAP_RECOVERY_MAX_DAYS`` back) go through the normal claim and dedupe
+    path, so ones that were already processed are skipped.  The checkpoint
+    moves to ``history_id`` only if every message succeeded; otherwise the
+    next push hits the gap again and repeats the scan.
+    """
+    now = datetime.now(UTC)
+    oldest = now - timedelta(days=settings.gap_recovery_max_days)
+    since = max(firestore_state.get_checkpoint_time() or oldest, oldest) - _GAP_OVERLAP
+    logger.warning("Gmail history expired; scanning messages received since %s", since)
+    try:
+        message_ids: Iterable[str] = gmail_client.scan_message_ids(
+            since, now, slices=settings.gap_recovery_slices
+        )
+        if settings.gmail_prefetch:
+            message_ids = _prefetching(message_ids)
+        ok = process_message_ids(message_ids)
+    except Exception as exc:
+        logger.error("Gap recovery scan failed: %s", exc)
+        return False
+    if not ok:
+        logger.error("Gap recovery incomplete; not re-baselining to history ID %s", history_id)
+        return False
+    firestore_state.set_last_history_id(history_id)
+    logger.info("Gap recovery complete; history re-baselined to %s", history_id)
+    return True
+
+
+def _finish_range(
+    writer: firestore_state.StateWriter | None,
+    ok: bool,
+    history_id: int,
+    pages: list[tuple[str | None, list[str]]],
+    failed: list[str],
+) -> tuple[bool, list[str]]:
+    """Advance the checkpoint if ``ok`` and commit a range writer.
+
+    Returns the final outcome and the IDs that must be listed again.
+    """
+    if writer is None:
+        if ok:
+            firestore_state.set_last_history_id(history_id)
+        return ok, failed
+    if ok:
+        writer.set_last_history_id(history_id)
+    # Markers that were not committed must be listed again.
+    if not writer.flush():
+        return False, [mid for _, ids in pages for mid in ids]
+    return ok, failed
+
+
+def handle_new_messages(
+    last_history_id: int, history_id: int, checkpoint_id: int | None = None
+) -> bool:
+    """Process the range and advance the checkpoint if every message succeeded.
+
+    The checkpoint moves to ``checkpoint_id`` (by default ``history_id``);
+    queued ranges pass a lower one while an earlier range is still pending.
+
+    With ``STATE_FLUSH_MODE=range`` the processed markers of the whole range
+    and the new checkpoint are committed together in Firestore write batches
+    once the range is done, instead of one write per message.  When messages
+    fail, the history page token of the first failure is stored so the retry
+    of the range resumes listing there.  If Gmail no longer has history from
+    ``last_history_id``, the range is recovered by scanning the label.
+    """
+    checkpoint = history_id if checkpoint_id is None else checkpoint_id
+    pages: list[tuple[str | None, list[str]]] = []
+    resume_token = firestore_state.get_history_cursor(last_history_id)
+    message_ids: Iterable[str] = gmail_client.list_new_message_ids_since(
+        last_history_id,
+        history_id,
+        page_token=resume_token,
+        on_page=lambda token, ids: pages.append((token, ids)),
+    )
+    if settings.gmail_prefetch:
+        message_ids = _prefetching(message_ids)
+    writer = firestore_state.StateWriter() if settings.state_flush_mode == "range" else None
+    failed: list[str] = []
+    try:
+        ok = process_message_ids(message_ids, writer, failed)
+    except gmail_client.HistoryGapError:
+        if writer is not None:
+            writer.flush()
+        return _recover_history_gap(checkpoint)
+    if not ok:
         logger.error(
             "One or more messages failed to process; not updating history ID %s",
-            history_id,
+            checkpoint,
         )
-    else:
-        firestore_state.set_last_history_id(history_id)
+    ok, failed = _finish_range(writer, ok, checkpoint, pages, failed)
+    _save_history_cursor(last_history_id, resume_token, pages, failed)
+    return ok
+
+
+_history_queue: work_queue.HistoryQueue | None = None
+_queue_lock = threading.Lock()
+_stop_consumers = threading.Event()
+_consumers: list[threading.Thread] = []
+
+
+def _handle_queued_range(start: int, end: int, checkpoint: int) -> bool:
+    return handle_new_messages(start, end, checkpoint_id=checkpoint)
+
+
+def _get_history_queue() -> work_queue.HistoryQueue:
+    """Open the local work queue and start its consumers on first use."""
+    global _history_queue
+    with _queue_lock:
+        if _history_queue is None:
+            _history_queue = work_queue.HistoryQueue(
+                settings.work_queue_path, settings.work_queue_lease_seconds
+            )
+            _stop_consumers.clear()
+            for i in range(max(1, settings.work_queue_consumers)):
+                thread = threading.Thread(
+                    target=work_queue.run_consumer,
+                    args=(_history_queue, _handle_queued_range, _stop_consumers),
+                    name=f"gaij-queue-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                _consumers.append(thread)
+        return _history_queue
+
+
+def shutdown_history_queue(timeout: float = 5.0) -> None:
+    """Stop the background consumers and close the local work queue."""
+    global _history_queue
+    with _queue_lock:
+        if _history_queue is None:
+            return
+        _stop_consumers.set()
+        _history_queue.wake()
+        for thread in _consumers:
+            thread.join(timeout)
+        _consumers.clear()
+        _history_queue.close()
+        _history_queue = None
+
+
+def enqueue_history(history_id: int) -> bool:
+    """Queue the range up to ``history_id`` for the background consumers."""
+    queue = _get_history_queue()
+    start = queue.watermark()
+    if start is None:
+        start = firestore_state.get_last_history_id() or 0
+    if not queue.enqueue(start, history_id):
+        logger.info("Received stale historyId %s", history_id)
+        return False
+    return True
 
 
 @app.get("/healthz")
@@ -107,78 +367,332 @@ def healthz() -> tuple[str, int]:
     return "ok", 200
 
 
-def process_message(message_id: str) -> None:
+@app.get("/stats")
+def stats() -> dict[str, Any]:
+    return {
+        "classification_cache": classification_cache.stats(),
+        "classifier": classifier.tier_report(),
+        "gmail": gmail_client.service_pool_stats(),
+        "jira": jira_http.latency_stats(),
+        "render_cache": render_cache.stats(),
+    }
+
+
+def _message_document(msg: Mapping[str, Any]) -> HtmlDocument:
+    """Return the message's parsed HTML body, reusing the one Gmail built."""
+    html = msg.get("body_html", msg.get("body_text", ""))
+    document = msg.get("html_document")
+    if isinstance(document, HtmlDocument) and document.html == (html or ""):
+        return document
+    return HtmlDocument(html)
+
+
+def _render_payload(render_name: str, **payload: Any) -> dict[str, Any]:
+    return {
+        "filename": render_name,
+        "mime_type": "application/pdf"
+        if settings.html_render_format == "pdf"
+        else "image/png",
+        **payload,
+        "is_inline": False,
+        "content_id": None,
+    }
+
+
+def _png_options() -> PngOptions | None:
+    if settings.html_render_format != "png":
+        return None
+    return PngOptions(
+        dpi=settings.html_render_png_dpi,
+        columns=settings.html_render_png_columns,
+        max_height=settings.html_render_png_max_height,
+        max_bytes=settings.html_render_png_max_bytes,
+    )
+
+
+def _render_note(render_name: str) -> str:
+    return f"Full-fidelity email rendering attached: {render_name}"
+
+
+def _render_attachment(
+    document: HtmlDocument, inline_parts: list[dict[str, Any]], cache_key: str
+) -> tuple[dict[str, Any], str]:
+    """Render the e-mail and return it as an attachment plus the ADF note.
+
+    The rendering is written to a spooled file, like downloaded attachments,
+    and stored in the render cache under ``cache_key``.
+    """
+    spool = tempfile.SpooledTemporaryFile(  # noqa: SIM115 - closed with the payloads
+        max_size=settings.attachment_spool_bytes, dir=settings.attachment_spool_dir
+    )
+    render_name = render_html_to(
+        spool,
+        document.html,
+        inline_parts,
+        settings.html_render_format,
+        document=document,
+        png_options=_png_options(),
+    )
+    attachment = _render_payload(render_name, data_file=spool)
+    if render_cache.enabled():
+        render_cache.put(cache_key, payloads.read_payload(attachment), render_name)
+    return attachment, _render_note(render_name)
+
+
+_render_pool: render_pool.RenderPool | None = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool() -> render_pool.RenderPool:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = render_pool.RenderPool(
+                settings.html_render_processes,
+                settings.html_render_timeout_seconds,
+                settings.html_render_memory_mb * 1024 * 1024,
+            )
+        return _render_pool
+
+
+def shutdown_render_pool(wait: bool = True) -> None:
+    """Stop the render workers, letting queued renders finish if ``wait``."""
+    global _render_pool
+    with _render_pool_lock:
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait)
+
+
+def _cache_render(cache_key: str, job: Future[render_pool.RenderResult]) -> None:
+    if not job.cancelled() and job.exception() is None:
+        render_cache.put(cache_key, *job.result())
+
+
+def _start_render(
+    document: HtmlDocument, inline_parts: list[dict[str, Any]], cache_key: str
+) -> Future[render_pool.RenderResult]:
+    """Submit the render to the worker processes.
+
+    Only the inline parts the HTML references are read, as they have to be
+    copied into the worker.  The finished render is cached under
+    ``cache_key`` even if the issue is never created, so a retry reuses it.
+    """
+    parts = [
+        {
+            "filename": part.get("filename"),
+            "mime_type": part.get("mime_type"),
+            "content_id": part["content_id"],
+            "data_bytes": payloads.read_payload(part),
+        }
+        for part in inline_parts
+        if part.get("content_id") in document.cid_refs
+    ]
+    job = _get_render_pool().submit(
+        document.html, parts, settings.html_render_format, _png_options()
+    )
+    job.add_done_callback(partial(_cache_render, cache_key))
+    return job
+
+
+def _begin_render(
+    document: HtmlDocument,
+    inline_parts: list[dict[str, Any]],
+    attachments: list[dict[str, Any]],
+) -> tuple[str | None, Future[render_pool.RenderResult] | None]:
+    """Start the full-fidelity render if enabled; return its note or pending job.
+
+    A cached render is appended to ``attachments`` straight away.  Otherwise,
+    with render processes configured the render runs while the issue is
+    created and is attached when it finishes; without them it is rendered
+    here and appended to ``attachments``.
+    """
+    if not settings.preserve_html_render:
+        return None, None
+    key = ""
+    if render_cache.enabled():
+        key = render_cache.cache_key(
+            document.html, inline_parts, settings.html_render_format, _png_options()
+        )
+    cached = render_cache.get(key)
+    if cached is not None:
+        data, render_name = cached
+        attachments.append(_render_payload(render_name, data_bytes=data))
+        return _render_note(render_name), None
+    if settings.html_render_processes > 0:
+        return None, _start_render(document, inline_parts, key)
+    render_attachment, note = _render_attachment(document, inline_parts, key)
+    attachments.append(render_attachment)
+    return note, None
+
+
+@dataclass
+class _Issue:
+    """A created issue and what its description was built from."""
+
+    key: str
+    tree: BeautifulSoup
+    inline_map: dict[str, str]
+    results: dict[str, str]
+
+
+def _attach_render(issue: _Issue, render: render_pool.RenderResult) -> None:
+    """Upload a finished render and add its note to the issue description."""
+    data, render_name = render
+    results, id_map = jira_client.upload_attachments(
+        issue.key, [_render_payload(render_name, data_bytes=data)]
+    )
+    if results.get(render_name) != "uploaded":
+        logger.warning("Rendering for %s was not attached: %s", issue.key, results)
+        return
+    adf = _description(issue.tree, {**issue.inline_map, **id_map}, _render_note(render_name))
+    jira_client.update_issue_description(
+        issue.key, jira_client.build_adf_with_attachment_list(adf, {**issue.results, **results})
+    )
+
+
+def _description(
+    tree: BeautifulSoup, inline_map: dict[str, str], note: str | None
+) -> dict[str, Any]:
+    adf = build_adf_from_tree(tree, inline_map)
+    return prepend_note(adf, note) if note else adf
+
+
+def _hand_off_render(
+    issue: _Issue, render_job: Future[render_pool.RenderResult] | None
+) -> None:
+    """Attach the pending render to ``issue`` once it finishes."""
+    if render_job is not None:
+        _get_render_pool().when_done(render_job, partial(_attach_render, issue))
+
+
+def _create_issue(
+    msg: Mapping[str, Any],
+    tree: BeautifulSoup,
+    attachments: list[dict[str, Any]],
+    note: str | None,
+    client: str,
+    issue_type: str,
+) -> _Issue | None:
+    """Create the Jira issue, upload attachments and settle its description.
+
+    The rich description needs the IDs Jira assigns to uploaded attachments.
+    With ``JIRA_SINGLE_PASS_DESCRIPTION`` an issue that will get attachments
+    is therefore created with a plain-text body and the full ADF is built and
+    written exactly once, after the uploads.  Otherwise the issue is created
+    with the full ADF, which is only rebuilt if uploads changed it.
+    """
+    inline_map = msg.get("inline_map", {})
+    single_pass = (
+        settings.jira_single_pass_description
+        and settings.attachment_upload_enabled
+        and bool(attachments)
+    )
+    if single_pass:
+        initial_adf = jira_client.build_adf(msg.get("body_text", ""))
+    else:
+        initial_adf = _description(tree, inline_map, note)
+
+    key = jira_client.create_ticket(
+        msg.get("subject", "(No Subject)"),
+        initial_adf,
+        client,
+        issue_type=issue_type,
+        labels=build_labels(sanitize_msg_id(msg.get("message_id", "") or "")),
+    )
+    if not key:
+        return None
+
+    results, id_map = jira_client.upload_attachments(key, attachments)
+    final_adf = initial_adf
+    if single_pass or id_map:
+        final_adf = _description(tree, {**inline_map, **id_map}, note)
+    final_adf = jira_client.build_adf_with_attachment_list(final_adf, results)
+    if final_adf != initial_adf:
+        jira_client.update_issue_description(key, final_adf)
+    return _Issue(key, tree, {**inline_map, **id_map}, results)
+
+
+def _screen_sender(message_id: str) -> str | None:
+    """Return the sender address if the message should be fetched in full.
+
+    Only the From, Subject and Message-ID headers are requested, so messages
+    from senders outside the allow-list are dropped without downloading their
+    body or attachments and without touching Firestore.
+    """
+    meta = gmail_client.get_message_metadata(message_id)
+    if not meta:
+        logger.warning("No metadata for message %s; skipping", message_id)
+        return None
+    sender_full = meta.get("from", "")
+    sender_addr = parseaddr(sender_full)[1].lower()
+    if not is_sender_allowed(sender_addr, sender_full):
+        return None
+    return sender_addr
+
+
+def _flush_state(state: firestore_state.StateWriter, message_id: str) -> None:
+    if not state.flush():
+        # The claim stays held and the marker write is retried with it.
+        logger.error("Failed to record message %s as processed", message_id)
+
+
+def process_message(
+    message_id: str, writer: firestore_state.StateWriter | None = None
+) -> None:
+    """Turn one Gmail message into a Jira issue.
+
+    The processed marker goes through ``writer`` when one is given (the
+    caller flushes it), otherwise it is committed before returning.
+    """
+    sender_addr = _screen_sender(message_id)
+    if sender_addr is None:
+        return
+    state = writer if writer is not None else firestore_state.StateWriter()
     if not firestore_state.claim_message(message_id):
         logger.info("Message %s already processed", message_id)
         return
 
+    msg: dict[str, Any] = {}
+    attachments: list[dict[str, Any]] = []
+    render_job: Future[render_pool.RenderResult] | None = None
     try:
         msg = gmail_client.get_message(message_id)
-        sender_full = msg.get("from", "")
-        sender_addr = parseaddr(sender_full)[1].lower()
-        if not is_sender_allowed(sender_addr, sender_full):
+        if not msg:
             firestore_state.unclaim_message(message_id)
             return
 
-        issue_type, client = classify_client_and_issue(msg, sender_addr)
-
-        html = msg.get("body_html", msg.get("body_text", ""))
-        inline_map = msg.get("inline_map", {})
-        adf = build_adf_from_html(html, inline_map)
+        classification = classify_client_and_issue(msg, sender_addr)
 
+        document = _message_document(msg)
         attachments = list(msg.get("attachments", []))
-        inline_parts = msg.get("inline_parts", [])
-
-        note: str | None = None
-        if settings.preserve_html_render:
-            render_bytes, render_name = render_html(
-                html, inline_parts, settings.html_render_format
-            )
-            attachments.append(
-                {
-                    "filename": render_name,
-                    "mime_type": "application/pdf"
-                    if settings.html_render_format == "pdf"
-                    else "image/png",
-                    "data_bytes": render_bytes,
-                    "is_inline": False,
-                    "content_id": None,
-                }
-            )
-            note = f"Full-fidelity email rendering attached: {render_name}"
-            adf = prepend_note(adf, note)
-
-        sanitized_msg_id = sanitize_msg_id(msg.get("message_id", "") or "")
-        labels = build_labels(sanitized_msg_id)
-
-        key = jira_client.create_ticket(
-            msg.get("subject", "(No Subject)"),
-            adf,
-            client,
-            issue_type=issue_type,
-            labels=labels,
+        note, render_job = _begin_render(document, msg.get("inline_parts", []), attachments)
+
+        issue = _create_issue(
+            msg,
+            document.soup,
+            attachments,
+            note,
+            classification.client,
+            classification.issue_type,
         )
-
-        if key:
-            results, id_map = jira_client.upload_attachments(key, attachments)
-            merged_map = {**inline_map, **id_map}
-            final_adf = build_adf_from_html(html, merged_map)
-            if note:
-                final_adf = prepend_note(final_adf, note)
-            final_adf = jira_client.build_adf_with_attachment_list(final_adf, results)
-            if final_adf != adf:
-                jira_client.update_issue_description(key, final_adf)
-            firestore_state.mark_processed(message_id)
+        if issue:
+            state.mark_processed(message_id)
+            classifier.learn(classification)
+            _hand_off_render(issue, render_job)
+            render_job = None
         else:
-            logger.error(
-                "Failed to create Jira ticket for message %s; response: %s",
-                message_id,
-                key,
-            )
+            logger.error("Failed to create Jira ticket for message %s", message_id)
             firestore_state.unclaim_message(message_id)
     except Exception:
         firestore_state.unclaim_message(message_id)
         raise
+    finally:
+        if render_job is not None:
+            render_job.cancel()
+        payloads.close_payloads(attachments or msg.get("attachments", []))
+        if writer is None:
+            _flush_state(state, message_id)
 
 
 @app.post("/pubsub")
@@ -191,6 +705,10 @@ def pubsub_handler() -> tuple[str, int]:
     if history_id is None:
         return "", 204
 
+    if settings.pubsub_async_mode:
+        enqueue_history(history_id)
+        return "", 204
+
     last_history_id = firestore_state.get_last_history_id() or 0
     if history_id <= last_history_id:
         logger.info("Received stale historyId %s", history_id)
@@ -0,0 +1,222 @@
+"""Cache of GPT classifications keyed by a normalized content hash.
+
+Forwarded threads, automated alerts and Pub/Sub redeliveries often carry the
+same subject and body, so :func:`gaij.gpt_agent.gpt_classify_issue` looks the
+classification up here before calling OpenAI.  Keys hash the model together
+with the subject and body after whitespace, case and ``Re:``/``Fwd:``
+prefixes are normalized.
+
+An in-process LRU with a TTL is always consulted first.  Behind it,
+``CLASSIFICATION_CACHE_BACKEND`` selects a shared tier: ``disk`` (a SQLite
+file shared by the workers on a host), ``firestore`` (shared by every
+instance) or ``memory`` (none).  ``none`` disables caching altogether.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import UTC, datetime
+from typing import Any, Protocol
+
+from . import firestore_state
+from .logger_setup import logger
+from .settings import settings
+
+_WS_RE = re.compile(r"\s+")
+_SUBJECT_PREFIX_RE = re.compile(r"^(?:\s*(?:re|fwd?|aw|wg)\s*(?:\[\d+\])?\s*:)+", re.IGNORECASE)
+
+_DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL
+)
+"""
+
+
+def _normalize(text: str) -> str:
+    return _WS_RE.sub(" ", text or "").strip().casefold()
+
+
+def cache_key(subject: str, body: str, model: str) -> str:
+    """Return the cache key for classifying ``subject``/``body`` with ``model``."""
+    subject = _SUBJECT_PREFIX_RE.sub("", subject or "")
+    material = "\0".join((model, _normalize(subject), _normalize(body)))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _Backend(Protocol):
+    def get(self, key: str) -> dict[str, Any] | None: ...
+
+    def put(self, key: str, value: dict[str, Any], ttl: float) -> None: ...
+
+
+class MemoryCache:
+    """Thread-safe size-bounded LRU whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """SQLite-backed LRU shared by all processes on a host."""
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_DISK_SCHEMA)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value FROM classifications WHERE key = ? AND expires_at >= ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE classifications SET used_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0])  # type: ignore[no-any-return]
+
+    def put(self, key: str, value: dict[str, Any], ttl: float) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications (key, value, expires_at, used_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._conn.execute("DELETE FROM classifications WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM classifications WHERE key IN ("
+                "SELECT key FROM classifications ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+class FirestoreCache:
+    """Shared tier stored through :mod:`gaij.firestore_state`."""
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        return firestore_state.get_cached_classification(key)
+
+    def put(self, key: str, value: dict[str, Any], ttl: float) -> None:
+        expire_at = datetime.fromtimestamp(time.time() + ttl, UTC)
+        firestore_state.set_cached_classification(key, value, expire_at)
+
+
+_memory: MemoryCache | None = None
+_backend: _Backend | None = None
+_init_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "memory_hits": 0, "backend_hits": 0, "stores": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(*names: str) -> None:
+    with _stats_lock:
+        for name in names:
+            _stats[name] += 1
+
+
+def _tiers() -> tuple[MemoryCache, _Backend | None]:
+    global _memory, _backend
+    with _init_lock:
+        if _memory is None:
+            _memory = MemoryCache(settings.classification_cache_max_entries)
+            kind = settings.classification_cache_backend
+            if kind == "disk":
+                _backend = DiskCache(
+                    settings.classification_cache_path, settings.classification_cache_max_entries
+                )
+            elif kind == "firestore":
+                _backend = FirestoreCache()
+            elif kind != "memory":
+                logger.warning("Unknown CLASSIFICATION_CACHE_BACKEND %r; using memory", kind)
+        return _memory, _backend
+
+
+def enabled() -> bool:
+    return settings.classification_cache_backend != "none"
+
+
+def get(key: str) -> dict[str, Any] | None:
+    """Return a copy of the cached classification for ``key``, if any."""
+    if not enabled():
+        return None
+    memory, backend = _tiers()
+    value = memory.get(key)
+    if value is not None:
+        _count("hits", "memory_hits")
+        return dict(value)
+    if backend is not None:
+        try:
+            value = backend.get(key)
+        except Exception as exc:
+            logger.warning("Classification cache lookup failed: %s", exc)
+            value = None
+        if value is not None:
+            memory.put(key, value, settings.classification_cache_ttl_seconds)
+            _count("hits", "backend_hits")
+            return dict(value)
+    _count("misses")
+    return None
+
+
+def put(key: str, value: dict[str, Any]) -> None:
+    """Store ``value`` in every configured tier."""
+    if not enabled():
+        return
+    memory, backend = _tiers()
+    ttl = settings.classification_cache_ttl_seconds
+    memory.put(key, dict(value), ttl)
+    if backend is not None:
+        try:
+            backend.put(key, value, ttl)
+        except Exception as exc:
+            logger.warning("Classification cache store failed: %s", exc)
+    _count("stores")
+
+
+def stats() -> dict[str, float]:
+    """Return hit/miss counters plus the hit ratio and in-memory size."""
+    with _stats_lock:
+        result: dict[str, float] = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_ratio"] = result["hits"] / lookups if lookups else 0.0
+    result["memory_entries"] = len(_memory) if _memory is not None else 0
+    return result
@@ -0,0 +1,368 @@
+"""Tiered e-mail classification: rules, a local model, then GPT.
+
+Each field (``issueType`` and ``client``) is decided by the first tier that is
+confident about it:
+
+1. **rules**: ``DOMAIN_TO_CLIENT_JSON`` plus the regular expressions in
+   ``CLASSIFIER_RULES_JSON``, matched against the sender domain, sender
+   address or subject.  Rules are always trusted.
+2. **model**: a naive-Bayes model per field (disabled unless
+   ``CLASSIFIER_MODEL_ENABLED``), trained incrementally from the tickets this
+   service creates and persisted in SQLite at ``CLASSIFIER_MODEL_PATH``.
+   Naive-Bayes posteriors are badly overconfident, so they are not trusted
+   on their own: before each training example is learned the model predicts
+   it, and a field is only handed to the model once those held-out
+   predictions at ``CLASSIFIER_MIN_CONFIDENCE`` were right at least that
+   often.  It is also ignored until it has seen
+   ``CLASSIFIER_MIN_TRAINING_EXAMPLES`` tickets, and one in every
+   ``_AUDIT_INTERVAL`` decisions it would make is still sent to GPT so that
+   the accuracy record keeps up with new mail.
+3. **gpt**: :func:`gaij.gpt_agent.gpt_classify_issue`, called only when a
+   field is still undecided.
+
+:func:`tier_report` counts which tier settled each field and how many GPT
+calls were avoided.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import gpt_agent
+from .logger_setup import logger
+from .settings import settings
+
+FIELDS = ("issueType", "client")
+DEFAULTS = {"issueType": "Task", "client": "N/A"}
+_RULE_TARGETS = ("domain", "sender", "subject")
+
+_TOKEN_RE = re.compile(r"[^\W\d_]{2,}")
+# Only the start of the body is used; long threads add noise, not signal.
+_MAX_BODY_TOKENS = 300
+# Held-out predictions needed before a field's accuracy is trusted.
+_MIN_CHECKS = 20
+_AUDIT_INTERVAL = 20
+
+_MODEL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS label_docs (
+    field TEXT NOT NULL,
+    label TEXT NOT NULL,
+    docs INTEGER NOT NULL,
+    PRIMARY KEY (field, label)
+);
+CREATE TABLE IF NOT EXISTS token_counts (
+    field TEXT NOT NULL,
+    label TEXT NOT NULL,
+    token TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (field, label, token)
+);
+CREATE TABLE IF NOT EXISTS model_checks (
+    field TEXT PRIMARY KEY,
+    checked INTEGER NOT NULL,
+    correct INTEGER NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class Decision:
+    value: str
+    confidence: float
+    tier: str
+
+
+@dataclass
+class Classification:
+    """Outcome of :func:`classify` together with what it was based on."""
+
+    decisions: dict[str, Decision]
+    tokens: list[str] = field(default_factory=list, repr=False)
+
+    @property
+    def issue_type(self) -> str:
+        return self.decisions["issueType"].value
+
+    @property
+    def client(self) -> str:
+        return self.decisions["client"].value
+
+
+@dataclass(frozen=True)
+class Rule:
+    field: str
+    target: str
+    pattern: re.Pattern[str]
+    value: str
+
+
+def compile_rules(
+    raw_rules: list[dict[str, Any]], domain_map: dict[str, str]
+) -> list[Rule]:
+    """Compile domain mappings and JSON rules, skipping malformed entries.
+
+    Mapped domains must equal the sender domain; subdomains do not match.
+    """
+    rules = [
+        Rule("client", "domain", re.compile(rf"\A{re.escape(domain.lower())}\Z"), client)
+        for domain, client in domain_map.items()
+    ]
+    for raw in raw_rules:
+        try:
+            rule = Rule(
+                field=str(raw["field"]),
+                target=str(raw.get("match", "subject")),
+                pattern=re.compile(str(raw["pattern"]), re.IGNORECASE),
+                value=str(raw["value"]),
+            )
+        except (KeyError, re.error) as exc:
+            logger.error("Ignoring invalid classifier rule %r: %s", raw, exc)
+            continue
+        if rule.field not in FIELDS or rule.target not in _RULE_TARGETS:
+            logger.error("Ignoring classifier rule with unknown field/match: %r", raw)
+            continue
+        rules.append(rule)
+    return rules
+
+
+def tokenize(subject: str, body: str, sender_addr: str) -> list[str]:
+    domain = sender_addr.rsplit("@", 1)[-1] if "@" in sender_addr else ""
+    tokens = [f"domain:{domain}"] if domain else []
+    tokens.extend(f"subj:{t}" for t in _TOKEN_RE.findall(subject.casefold()))
+    tokens.extend(_TOKEN_RE.findall(body.casefold())[:_MAX_BODY_TOKENS])
+    return tokens
+
+
+class NaiveBayesModel:
+    """Incrementally trained naive Bayes with add-one smoothing.
+
+    Each token counts once per e-mail, so a word repeated throughout a thread
+    does not multiply its evidence.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_MODEL_SCHEMA)
+        self._docs: dict[str, Counter[str]] = {f: Counter() for f in FIELDS}
+        self._counts: dict[tuple[str, str], Counter[str]] = {}
+        self._totals: Counter[tuple[str, str]] = Counter()
+        self._vocab: dict[str, set[str]] = {f: set() for f in FIELDS}
+        for fld, label, docs in self._conn.execute("SELECT field, label, docs FROM label_docs"):
+            self._docs.setdefault(fld, Counter())[label] = docs
+        for fld, label, token, count in self._conn.execute(
+            "SELECT field, label, token, count FROM token_counts"
+        ):
+            self._add(fld, label, token, count)
+        self._checks: dict[str, tuple[int, int]] = {
+            fld: (checked, correct)
+            for fld, checked, correct in self._conn.execute(
+                "SELECT field, checked, correct FROM model_checks"
+            )
+        }
+
+    def _add(self, fld: str, label: str, token: str, count: int) -> None:
+        self._counts.setdefault((fld, label), Counter())[token] += count
+        self._totals[(fld, label)] += count
+        self._vocab.setdefault(fld, set()).add(token)
+
+    def examples(self, fld: str) -> int:
+        return sum(self._docs.get(fld, Counter()).values())
+
+    def accuracy(self, fld: str) -> tuple[int, float]:
+        """Return how many held-out predictions were checked and their accuracy."""
+        checked, correct = self._checks.get(fld, (0, 0))
+        return checked, correct / checked if checked else 0.0
+
+    def check(self, fld: str, label: str, tokens: list[str], threshold: float) -> None:
+        """Score a prediction made *before* learning ``label`` for these tokens.
+
+        Only predictions confident enough for the model tier to use count.
+        """
+        prediction = self.predict(fld, tokens)
+        if prediction is None or prediction[1] < threshold:
+            return
+        correct = int(prediction[0] == label)
+        with self._lock, self._conn:
+            checked_before, correct_before = self._checks.get(fld, (0, 0))
+            self._checks[fld] = (checked_before + 1, correct_before + correct)
+            self._conn.execute(
+                "INSERT INTO model_checks (field, checked, correct) VALUES (?, 1, ?) "
+                "ON CONFLICT(field) DO UPDATE SET checked = checked + 1, "
+                "correct = correct + excluded.correct",
+                (fld, correct),
+            )
+
+    def predict(self, fld: str, tokens: list[str]) -> tuple[str, float] | None:
+        """Return the most likely label and its posterior probability."""
+        unique = set(tokens)
+        with self._lock:
+            docs = self._docs.get(fld)
+            if not docs:
+                return None
+            total_docs = sum(docs.values())
+            vocab = len(self._vocab.get(fld, ())) + 1
+            scores = {}
+            for label, label_docs in docs.items():
+                counts = self._counts.get((fld, label), Counter())
+                denom = math.log(self._totals[(fld, label)] + vocab)
+                scores[label] = math.log(label_docs / total_docs) + sum(
+                    math.log(counts[t] + 1) - denom for t in unique
+                )
+        best = max(scores, key=scores.__getitem__)
+        norm = math.fsum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+    def learn(self, fld: str, label: str, tokens: list[str]) -> None:
+        counts = Counter(set(tokens))
+        with self._lock, self._conn:
+            self._docs.setdefault(fld, Counter())[label] += 1
+            for token, count in counts.items():
+                self._add(fld, label, token, count)
+            self._conn.execute(
+                "INSERT INTO label_docs (field, label, docs) VALUES (?, ?, 1) "
+                "ON CONFLICT(field, label) DO UPDATE SET docs = docs + 1",
+                (fld, label),
+            )
+            self._conn.executemany(
+                "INSERT INTO token_counts (field, label, token, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(field, label, token) DO UPDATE SET count = count + excluded.count",
+                [(fld, label, token, count) for token, count in counts.items()],
+            )
+
+
+_rules: list[Rule] | None = None
+_model: NaiveBayesModel | None = None
+_init_lock = threading.Lock()
+_report: Counter[str] = Counter()
+_report_lock = threading.Lock()
+_model_decisions: Counter[str] = Counter()
+
+
+def _get_rules() -> list[Rule]:
+    global _rules
+    with _init_lock:
+        if _rules is None:
+            _rules = compile_rules(settings.classifier_rules_json, settings.domain_to_client_json)
+        return _rules
+
+
+def _get_model() -> NaiveBayesModel | None:
+    global _model
+    if not settings.classifier_model_enabled:
+        return None
+    with _init_lock:
+        if _model is None:
+            _model = NaiveBayesModel(settings.classifier_model_path)
+        return _model
+
+
+def _rules_tier(subject: str, sender_addr: str) -> dict[str, Decision]:
+    targets = {
+        "domain": sender_addr.rsplit("@", 1)[-1].lower() if "@" in sender_addr else "",
+        "sender": sender_addr,
+        "subject": subject,
+    }
+    decided: dict[str, Decision] = {}
+    for rule in _get_rules():
+        if rule.field not in decided and rule.pattern.search(targets[rule.target]):
+            decided[rule.field] = Decision(rule.value, 1.0, "rules")
+    return decided
+
+
+def _model_tier(tokens: list[str], pending: list[str]) -> dict[str, Decision]:
+    model = _get_model()
+    if model is None:
+        return {}
+    threshold = settings.classifier_min_confidence
+    decided = {}
+    for fld in pending:
+        checked, accuracy = model.accuracy(fld)
+        if (
+            model.examples(fld) < settings.classifier_min_training_examples
+            or checked < _MIN_CHECKS
+            or accuracy < threshold
+        ):
+            continue
+        prediction = model.predict(fld, tokens)
+        if prediction and prediction[1] >= threshold and not _audit(fld):
+            decided[fld] = Decision(prediction[0], prediction[1], "model")
+    return decided
+
+
+def _audit(fld: str) -> bool:
+    """Return True for the decisions that GPT should make in the model's place."""
+    with _report_lock:
+        _model_decisions[fld] += 1
+        return _model_decisions[fld] % _AUDIT_INTERVAL == 0
+
+
+def _gpt_tier(subject: str, body: str, pending: list[str]) -> dict[str, Decision]:
+    result = gpt_agent.gpt_classify_issue(subject, body) or {}
+    decided = {}
+    for fld in pending:
+        value = result.get(fld)
+        if value:
+            decided[fld] = Decision(str(value), 0.0, "gpt")
+        else:
+            decided[fld] = Decision(DEFAULTS[fld], 0.0, "default")
+    return decided
+
+
+def classify(subject: str, body: str, sender_addr: str) -> Classification:
+    """Classify an e-mail, calling GPT only for fields no local tier settled."""
+    tokens = tokenize(subject, body, sender_addr)
+    decisions = _rules_tier(subject, sender_addr)
+    pending = [f for f in FIELDS if f not in decisions]
+    if pending:
+        decisions.update(_model_tier(tokens, pending))
+        pending = [f for f in FIELDS if f not in decisions]
+    if pending:
+        decisions.update(_gpt_tier(subject, body, pending))
+    with _report_lock:
+        _report["messages"] += 1
+        _report["gpt_calls" if pending else "gpt_calls_avoided"] += 1
+        for fld, decision in decisions.items():
+            _report[f"{fld}.{decision.tier}"] += 1
+    logger.info(
+        "Classified as %s",
+        {f: (d.value, d.tier, round(d.confidence, 3)) for f, d in decisions.items()},
+    )
+    return Classification(decisions, tokens)
+
+
+def learn(classification: Classification) -> None:
+    """Train the local model on a ticket that was actually created.
+
+    Fields the model decided itself are skipped so it never reinforces its
+    own guesses; defaults used after a failed GPT call are skipped too.  The
+    rest are first predicted by the model to keep its accuracy record.
+    """
+    model = _get_model()
+    if model is None:
+        return
+    for fld, decision in classification.decisions.items():
+        if decision.tier in ("rules", "gpt"):
+            try:
+                model.check(
+                    fld, decision.value, classification.tokens, settings.classifier_min_confidence
+                )
+                model.learn(fld, decision.value, classification.tokens)
+            except sqlite3.Error as exc:
+                logger.warning("Failed to update classifier model: %s", exc)
+
+
+def tier_report() -> dict[str, float]:
+    """Return per-tier decision counts and the share of GPT calls avoided."""
+    with _report_lock:
+        report: dict[str, float] = dict(_report)
+    messages = report.get("messages", 0)
+    report["gpt_avoided_ratio"] = report.get("gpt_calls_avoided", 0) / messages if messages else 0.0
+    return report
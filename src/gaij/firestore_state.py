@@ -1,3 +1,10 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
 from typing import Any, Optional
 
 from google.api_core import exceptions
@@ -23,25 +30,61 @@ def _get_collection() -> Any:
         _collection = _client.collection(COLLECTION)
     return _collection
 
-_MAX_STORED_IDS = 5000
+
+def _get_client() -> Any:
+    _get_collection()
+    return _client
+
+# Processed message IDs seen by this process.  Markers are never removed
+# before their retention expires, so a hit needs no Firestore read.
+_processed_cache: OrderedDict[str, None] = OrderedDict()
+_processed_cache_lock = threading.Lock()
+# IDs from the pre-marker ``processed`` array document, loaded once.
+_legacy_ids: frozenset[str] | None = None
+
+# Identifies this process as the owner of the claims it holds.
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# Claims held by this process: message ID -> update time of our last write.
+_held: dict[str, Any] = {}
+_held_lock = threading.Lock()
+# Held claims whose processed marker failed to commit; the renewer retries
+# them, and the claim is kept meanwhile so the message is not filed again.
+_unwritten: set[str] = set()
+# Serializes lease renewals with the final write for the same message.
+_renew_lock = threading.Lock()
+_renewer: threading.Thread | None = None
+
+# Firestore's limit on writes per batch.
+_BATCH_LIMIT = 500
+# Read-and-write rounds when concurrent writers race to advance the checkpoint.
+_CHECKPOINT_ATTEMPTS = 5
 
 
 def _processed_doc() -> Any:
+    """Legacy single document holding a capped array of processed IDs."""
     return _get_collection().document("processed")
 
 
-def _lock_doc(message_id: str) -> Any:
-    return _get_collection().document("locks").collection("messages").document(message_id)
+def _marker_doc(message_id: str) -> Any:
+    return _get_collection().document("messages").collection("ids").document(message_id)
 
 
 def _runtime_doc() -> Any:
     return _get_collection().document("runtime")
 
 
+def _history_cursor_doc() -> Any:
+    return _get_collection().document("history_cursor")
+
+
 def _config_doc() -> Any:
     return _get_collection().document("config").collection("watch").document("current")
 
 
+def _classification_doc(key: str) -> Any:
+    return _get_collection().document("cache").collection("classifications").document(key)
+
+
 def get_last_history_id() -> int | None:
     try:
         doc = _runtime_doc().get()
@@ -57,54 +100,462 @@ def get_last_history_id() -> int | None:
     return None
 
 
-def set_last_history_id(value: int) -> None:
+def _checkpoint_fields(value: int) -> dict[str, Any]:
+    return {"last_history_id": int(value), "updated_at": datetime.now(UTC)}
+
+
+def _checkpoint_write(value: int) -> tuple[Any, dict[str, Any], Any] | None:
+    """Return the write that raises the checkpoint to ``value``, if it is lower.
+
+    The write is a ``create`` (option ``None``) or an update guarded by the
+    update time read here, so a concurrent advance makes it fail instead of
+    being overwritten.
+    """
+    ref = _runtime_doc()
+    doc = ref.get()
+    if not doc.exists:
+        return ref, _checkpoint_fields(value), None
+    try:
+        current = int(doc.to_dict().get("last_history_id"))
+    except (TypeError, ValueError):
+        current = None
+    if current is not None and current >= value:
+        return None
+    return ref, _checkpoint_fields(value), _precondition(doc.update_time)
+
+
+def _advance_checkpoint(value: int) -> bool:
+    """Raise ``last_history_id`` to ``value``; return ``False`` on failure."""
     try:
-        _runtime_doc().set({"last_history_id": int(value)})
+        for _ in range(_CHECKPOINT_ATTEMPTS):
+            write = _checkpoint_write(value)
+            if write is None:
+                return True
+            ref, data, option = write
+            try:
+                if option is None:
+                    ref.create(data)
+                else:
+                    ref.update(data, option=option)
+                return True
+            except (exceptions.FailedPrecondition, exceptions.AlreadyExists, exceptions.NotFound):
+                continue  # another writer moved the checkpoint; read it again
+        logger.error("Gave up advancing last_history_id to %s under contention", value)
     except exceptions.GoogleAPICallError as exc:
         logger.error("Failed to set last_history_id: %s", exc)
+    return False
+
+
+def set_last_history_id(value: int) -> None:
+    """Advance the checkpoint to ``value``; it is never moved backwards.
+
+    Ranges can finish out of order, so a range that completes after a later
+    one must not rewind the checkpoint over history that was processed.
+    """
+    _advance_checkpoint(value)
+
+
+def get_checkpoint_time() -> datetime | None:
+    """Return when ``last_history_id`` was last advanced, if recorded."""
+    try:
+        doc = _runtime_doc().get()
+    except exceptions.GoogleAPICallError as exc:
+        logger.error("Failed to fetch checkpoint time: %s", exc)
+        return None
+    value = doc.to_dict().get("updated_at") if doc.exists else None
+    return value if isinstance(value, datetime) else None
+
+
+def get_history_cursor(start_history_id: int) -> str | None:
+    """Return the page token a failed listing from ``start_history_id`` stopped at."""
+    try:
+        doc = _history_cursor_doc().get()
+    except exceptions.GoogleAPICallError as exc:
+        logger.error("Failed to fetch history cursor: %s", exc)
+        return None
+    data = doc.to_dict() if doc.exists else {}
+    if data.get("start_history_id") != int(start_history_id):
+        return None
+    token = data.get("page_token")
+    return str(token) if token else None
+
+
+def set_history_cursor(start_history_id: int, page_token: str | None) -> None:
+    """Record where to resume listing from ``start_history_id``; ``None`` clears it."""
+    try:
+        _history_cursor_doc().set(
+            {"start_history_id": int(start_history_id), "page_token": page_token}
+        )
+    except exceptions.GoogleAPICallError as exc:
+        logger.error("Failed to set history cursor: %s", exc)
+
+
+def _remember_processed(message_id: str) -> None:
+    with _processed_cache_lock:
+        _processed_cache[message_id] = None
+        _processed_cache.move_to_end(message_id)
+        while len(_processed_cache) > max(1, settings.processed_cache_size):
+            _processed_cache.popitem(last=False)
+
+
+def _known_processed(message_id: str) -> bool:
+    with _processed_cache_lock:
+        if message_id in _processed_cache:
+            _processed_cache.move_to_end(message_id)
+            return True
+    return False
+
+
+def _is_legacy_processed(message_id: str) -> bool:
+    global _legacy_ids
+    if _legacy_ids is None:
+        doc = _processed_doc().get()
+        _legacy_ids = frozenset(doc.to_dict().get("message_ids", []) if doc.exists else ())
+    return message_id in _legacy_ids
+
+
+def _expire_at() -> datetime:
+    return datetime.now(UTC) + timedelta(days=settings.processed_retention_days)
+
+
+def _marker_is_live(data: dict[str, Any]) -> bool:
+    expire_at = data.get("expire_at")
+    return expire_at is None or expire_at >= datetime.now(UTC)
+
+
+def _lease_fields() -> dict[str, Any]:
+    return {
+        "state": "claimed",
+        "owner": OWNER_ID,
+        "lease_until": datetime.now(UTC) + timedelta(seconds=settings.claim_lease_seconds),
+    }
+
+
+def _precondition(update_time: Any) -> Any:
+    return firestore.Client.write_option(last_update_time=update_time)
+
+
+def _hold(message_id: str, update_time: Any) -> None:
+    global _renewer
+    with _held_lock:
+        _held[message_id] = update_time
+        if _renewer is None:
+            _renewer = threading.Thread(
+                target=_renew_loop, name="gaij-lease-renewer", daemon=True
+            )
+            _renewer.start()
+
+
+def _steal_expired(doc_ref: Any, message_id: str) -> Any | None:
+    """Take over an expired claim; return the write result or ``None``."""
+    snapshot = doc_ref.get()
+    if not snapshot.exists:
+        return None
+    data = snapshot.to_dict()
+    if data.get("processed"):
+        _remember_processed(message_id)
+        return None
+    lease_until = data.get("lease_until")
+    if lease_until is not None and lease_until >= datetime.now(UTC):
+        return None
+    try:
+        result = doc_ref.update(_lease_fields(), option=_precondition(snapshot.update_time))
+    except (exceptions.FailedPrecondition, exceptions.NotFound):
+        return None
+    logger.warning("Took over expired claim on %s from %s", message_id, data.get("owner"))
+    return result
 
 
 def claim_message(message_id: str) -> bool:
-    if is_processed(message_id):
+    """Claim a message with a lease; ``False`` if processed or held elsewhere.
+
+    Claims and processed markers share the ``messages/ids/{id}`` document, so
+    the common case is a single ``create``.  Only when the document exists is
+    it read, to see whether it is processed or holds an expired lease that
+    may be taken over (guarded by its update time).  Held leases are renewed
+    in the background until :func:`mark_processed` or :func:`unclaim_message`.
+    """
+    if _known_processed(message_id):
         return False
     try:
-        _lock_doc(message_id).create({"claimed": True})
-        return True
-    except exceptions.AlreadyExists:
-        return False
+        if _is_legacy_processed(message_id):
+            _remember_processed(message_id)
+            return False
+        doc_ref = _marker_doc(message_id)
+        try:
+            result = doc_ref.create({**_lease_fields(), "claimed_at": datetime.now(UTC)})
+        except exceptions.AlreadyExists:
+            result = _steal_expired(doc_ref, message_id)
+            if result is None:
+                return False
     except exceptions.GoogleAPICallError as exc:
         logger.error("Failed to claim message: %s", exc)
         return False
+    _hold(message_id, result.update_time)
+    return True
 
 
 def unclaim_message(message_id: str) -> None:
-    try:
-        _lock_doc(message_id).delete()
-    except exceptions.GoogleAPICallError as exc:
-        logger.error("Failed to unclaim message: %s", exc)
+    """Drop this process's claim so the message can be retried.
+
+    Nothing is deleted if the lease was lost, since another worker owns it.
+    """
+    with _renew_lock:
+        with _held_lock:
+            update_time = _held.pop(message_id, None)
+        if update_time is None:
+            return
+        try:
+            _marker_doc(message_id).delete(option=_precondition(update_time))
+        except exceptions.FailedPrecondition:
+            logger.warning("Claim on %s was taken over; leaving it", message_id)
+        except exceptions.GoogleAPICallError as exc:
+            logger.error("Failed to unclaim message: %s", exc)
+
+
+def renew_leases() -> None:
+    """Extend the lease on every claim this process holds."""
+    with _held_lock:
+        held = list(_held.items())
+    for message_id, update_time in held:
+        with _renew_lock:
+            with _held_lock:
+                if _held.get(message_id) != update_time:
+                    continue
+            try:
+                result = _marker_doc(message_id).update(
+                    _lease_fields(), option=_precondition(update_time)
+                )
+            except (exceptions.FailedPrecondition, exceptions.NotFound):
+                logger.warning("Lost the claim on message %s", message_id)
+                with _held_lock:
+                    _held.pop(message_id, None)
+                continue
+            except exceptions.GoogleAPICallError as exc:
+                logger.error("Failed to renew claim on %s: %s", message_id, exc)
+                continue
+            with _held_lock:
+                if message_id in _held:
+                    _held[message_id] = result.update_time
+    _retry_unwritten()
+
+
+def _retry_unwritten() -> None:
+    with _held_lock:
+        pending = list(_unwritten)
+    for message_id in pending:
+        with _renew_lock:
+            with _held_lock:
+                update_time = _held.get(message_id)
+            lost = update_time is None
+            _settle({message_id: _LOST if lost else _write_marker(message_id, update_time)})
+
+
+def _renew_loop() -> None:
+    global _renewer
+    while True:
+        time.sleep(max(1.0, settings.claim_lease_seconds / 3))
+        renew_leases()
+        with _held_lock:
+            if not _held:
+                _renewer = None
+                return
 
 
 def is_processed(message_id: str) -> bool:
+    """Return ``True`` if the message has a live processed marker.
+
+    Positive answers are cached in-process, so re-checks of recent messages
+    (redeliveries, overlapping history ranges) cost no Firestore read.
+    """
+    if _known_processed(message_id):
+        return True
     try:
-        doc = _processed_doc().get()
-        ids = doc.to_dict().get("message_ids", []) if doc.exists else []
-        return message_id in ids
+        doc = _marker_doc(message_id).get()
+        data = doc.to_dict() if doc.exists else {}
+        processed = bool(data.get("processed")) and _marker_is_live(data)
+        if not processed:
+            processed = _is_legacy_processed(message_id)
     except exceptions.GoogleAPICallError as exc:
         logger.error("Failed to check processed message: %s", exc)
         return False
+    if processed:
+        _remember_processed(message_id)
+    return processed
+
+
+def _processed_fields() -> dict[str, Any]:
+    return {
+        "state": "processed",
+        "processed": True,
+        "owner": OWNER_ID,
+        "processed_at": datetime.now(UTC),
+        "expire_at": _expire_at(),
+    }
+
+
+_WRITTEN, _LOST, _FAILED = "written", "lost", "failed"
+
+
+def _write_marker(message_id: str, update_time: Any) -> str:
+    """Write one processed marker over the held lease; return the outcome."""
+    try:
+        _marker_doc(message_id).update(_processed_fields(), option=_precondition(update_time))
+    except (exceptions.FailedPrecondition, exceptions.NotFound):
+        logger.warning("Lost the claim on message %s", message_id)
+        return _LOST
+    except exceptions.GoogleAPICallError as exc:
+        logger.error("Failed to mark processed message %s: %s", message_id, exc)
+        return _FAILED
+    return _WRITTEN
+
+
+def _settle(outcomes: dict[str, str]) -> None:
+    """Release written and lost claims; keep failed ones held for a retry."""
+    with _held_lock:
+        for message_id, outcome in outcomes.items():
+            if outcome == _FAILED:
+                _unwritten.add(message_id)
+            else:
+                _unwritten.discard(message_id)
+                _held.pop(message_id, None)
+    for message_id, outcome in outcomes.items():
+        if outcome == _WRITTEN:
+            _remember_processed(message_id)
 
 
 def mark_processed(message_id: str) -> None:
+    """Turn the message's claim into its processed marker.
+
+    The write is guarded by the update time of the held lease, so nothing is
+    written if the claim was lost or was never held.  If the write fails,
+    the claim stays held and the lease renewer retries it.  ``expire_at`` is
+    meant for a Firestore TTL policy, which replaces the old fixed cap on the
+    number of remembered IDs.
+    """
+    with _renew_lock:
+        with _held_lock:
+            update_time = _held.get(message_id)
+        if update_time is None:
+            logger.warning("No claim held on %s; not marking it processed", message_id)
+            return
+        _settle({message_id: _write_marker(message_id, update_time)})
+
+
+class StateWriter:
+    """Buffer end-of-message and end-of-range writes for batched commits.
+
+    Processed markers and the history checkpoint are collected and written by
+    :meth:`flush` in Firestore write batches of up to 500 writes.  The
+    checkpoint goes into the last batch, so it is never committed ahead of
+    the markers for the messages it covers.  Leases on buffered messages keep
+    being renewed until the flush.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._processed: list[str] = []
+        self._history_id: int | None = None
+
+    def mark_processed(self, message_id: str) -> None:
+        with self._lock:
+            self._processed.append(message_id)
+
+    def set_last_history_id(self, value: int) -> None:
+        with self._lock:
+            self._history_id = int(value)
+
+    def flush(self) -> bool:
+        """Commit everything buffered; return ``False`` if a commit failed.
+
+        Markers are written over the lease this process holds, and markers
+        of messages whose lease was lost are dropped.  When a commit fails,
+        the claims stay held and the lease renewer retries their markers, so
+        the messages cannot be claimed and filed again in the meantime.  The
+        checkpoint is written only if every marker before it was.
+        """
+        with self._lock:
+            processed, self._processed = self._processed, []
+            history_id, self._history_id = self._history_id, None
+        if not processed and history_id is None:
+            return True
+        with _renew_lock:
+            with _held_lock:
+                leases = {mid: _held.get(mid) for mid in processed}
+            outcomes, checkpoint_written = _write_state(leases, history_id)
+            _settle(outcomes)
+        return checkpoint_written and _FAILED not in outcomes.values()
+
+
+def _write_state(
+    leases: dict[str, Any], checkpoint: int | None
+) -> tuple[dict[str, str], bool]:
+    """Commit markers in batches with the checkpoint in the last one.
+
+    Returns each message's outcome and whether the checkpoint was written.
+    """
+    outcomes = {mid: _LOST for mid, update_time in leases.items() if update_time is None}
+    for message_id in outcomes:
+        logger.warning("No claim held on %s; not marking it processed", message_id)
+    held = [(mid, t) for mid, t in leases.items() if t is not None]
+    checkpoint_written = checkpoint is None
+    for offset in range(0, max(1, len(held)), _BATCH_LIMIT):
+        last = offset + _BATCH_LIMIT >= len(held)
+        ok = _FAILED not in outcomes.values()
+        written, done = _commit_markers(
+            held[offset : offset + _BATCH_LIMIT], checkpoint if last and ok else None
+        )
+        outcomes.update(written)
+        checkpoint_written = checkpoint_written or done
+    return outcomes, checkpoint_written
+
+
+def _commit_markers(
+    leases: list[tuple[str, Any]], checkpoint: int | None
+) -> tuple[dict[str, str], bool]:
+    """Commit one batch of markers, plus the checkpoint if given.
+
+    Returns each message's outcome and whether the checkpoint is at least
+    ``checkpoint``.  A batch rejected by a precondition (a lost lease, or a
+    checkpoint advanced meanwhile) is redone one write at a time.
+    """
+    batch = _get_client().batch()
+    for message_id, update_time in leases:
+        batch.update(
+            _marker_doc(message_id), _processed_fields(), option=_precondition(update_time)
+        )
     try:
-        doc_ref = _processed_doc()
-        doc = doc_ref.get()
-        ids = doc.to_dict().get("message_ids", []) if doc.exists else []
-        ids.append(message_id)
-        if len(ids) > _MAX_STORED_IDS:
-            ids = ids[-_MAX_STORED_IDS:]
-        doc_ref.set({"message_ids": ids})
+        staged = checkpoint is not None and _stage_checkpoint(batch, checkpoint)
+        if leases or staged:
+            batch.commit()
+    except (exceptions.FailedPrecondition, exceptions.NotFound, exceptions.AlreadyExists):
+        return _write_one_by_one(leases, checkpoint)
     except exceptions.GoogleAPICallError as exc:
-        logger.error("Failed to mark processed message: %s", exc)
+        logger.error("Failed to commit %d state writes: %s", len(leases) + 1, exc)
+        return dict.fromkeys((mid for mid, _ in leases), _FAILED), False
+    return dict.fromkeys((mid for mid, _ in leases), _WRITTEN), checkpoint is not None
+
+
+def _write_one_by_one(
+    leases: list[tuple[str, Any]], checkpoint: int | None
+) -> tuple[dict[str, str], bool]:
+    outcomes = {mid: _write_marker(mid, t) for mid, t in leases}
+    if checkpoint is None or _FAILED in outcomes.values():
+        return outcomes, False
+    return outcomes, _advance_checkpoint(checkpoint)
+
+
+def _stage_checkpoint(batch: Any, value: int) -> bool:
+    """Add the write raising the checkpoint to ``value`` to ``batch``, if needed."""
+    write = _checkpoint_write(value)
+    if write is None:
+        return False
+    ref, data, option = write
+    if option is None:
+        batch.create(ref, data)
+    else:
+        batch.update(ref, data, option=option)
+    return True
 
 
 def get_watch() -> dict[str, Any] | None:
@@ -121,3 +572,31 @@ def set_watch(history_id: int, expiration: int) -> None:
         _config_doc().set({"historyId": int(history_id), "expiration": int(expiration)})
     except exceptions.GoogleAPICallError as exc:
         logger.error("Failed to set watch config: %s", exc)
+
+
+def get_cached_classification(key: str) -> dict[str, Any] | None:
+    """Return an unexpired cached GPT classification, if one is stored.
+
+    Expired documents are ignored here; a Firestore TTL policy on
+    ``expire_at`` removes them eventually.
+    """
+    try:
+        doc = _classification_doc(key).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        expire_at = data.get("expire_at")
+        if expire_at is not None and expire_at < datetime.now(UTC):
+            return None
+        value = data.get("value")
+        return value if isinstance(value, dict) else None
+    except exceptions.GoogleAPICallError as exc:
+        logger.error("Failed to read cached classification: %s", exc)
+        return None
+
+
+def set_cached_classification(key: str, value: dict[str, Any], expire_at: datetime) -> None:
+    try:
+        _classification_doc(key).set({"value": value, "expire_at": expire_at})
+    except exceptions.GoogleAPICallError as exc:
+        logger.error("Failed to store cached classification: %s", exc)
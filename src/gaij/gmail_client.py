@@ -1,58 +1,178 @@
 import base64
+import io
 import json
+import math
 import os
 import re
-from collections.abc import Iterable
-from typing import Any, cast
-
-from bs4 import BeautifulSoup
-from bs4.element import Tag
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import IO, Any
+
+import google_auth_httplib2
+import httplib2
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from . import payloads
+from .html_document import HtmlDocument
 from .logger_setup import logger
 from .settings import settings
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 TOKEN_PATH = settings.gmail_token_file_path
+# Gmail accepts up to 100 calls per batch but recommends staying at 50.
+_GMAIL_BATCH_LIMIT = 50
+_METADATA_HEADERS = ["From", "Subject", "Message-ID"]
+# Partial responses: drop snippet, sizeEstimate, internalDate and friends.
+_METADATA_FIELDS = "id,labelIds,payload/headers"
+_FULL_FIELDS = "id,threadId,labelIds,payload"
+# Inline image types the PDF render embeds (see pdf_images).
+_RENDERED_IMAGE_TYPES = frozenset({"image/jpeg", "image/png"})
+
+# Raw message responses fetched ahead of use by prefetch_messages, keyed by
+# (format, message ID) and consumed by the first matching get_message* call.
+_prefetched: OrderedDict[tuple[str, str], dict[str, Any]] = OrderedDict()
+_prefetched_lock = threading.Lock()
+_PREFETCH_MAX_ENTRIES = 4 * _GMAIL_BATCH_LIMIT
+
+
+class _ServiceHolder:
+    """Keeps a thread's service checked out until the thread exits."""
+
+    def __init__(self, service: Any) -> None:
+        self.service = service
+
+
+class ServicePool:
+    """Gmail API clients handed out one per thread.
+
+    httplib2 transports are not thread-safe, so every thread gets its own
+    service object.  When a thread exits, its service returns to an idle list
+    for the next thread instead of being rebuilt.  All services share one
+    ``Credentials`` object, which is refreshed under a lock so an expired
+    token is refreshed once rather than by every thread.
+    """
+
+    def __init__(self, credentials: Any) -> None:
+        self.credentials = credentials
+        self._local = threading.local()
+        self._idle: list[Any] = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats: dict[str, float] = {
+            "built": 0,
+            "checkouts": 0,
+            "in_use": 0,
+            "refreshes": 0,
+            "refresh_wait_ms": 0.0,
+            "refresh_wait_max_ms": 0.0,
+        }
+
+    def get(self) -> Any:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._checkout()
+            self._local.holder = holder
+        self._ensure_fresh()
+        return holder.service
+
+    def _checkout(self) -> _ServiceHolder:
+        with self._lock:
+            service = self._idle.pop() if self._idle else None
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            if service is None:
+                self._stats["built"] += 1
+        if service is None:
+            service = build("gmail", "v1", credentials=self.credentials)
+        holder = _ServiceHolder(service)
+        # Thread-local values are dropped when their thread exits.
+        weakref.finalize(holder, self._release, service)
+        return holder
+
+    def _release(self, service: Any) -> None:
+        with self._lock:
+            self._stats["in_use"] -= 1
+            self._idle.append(service)
+
+    def _ensure_fresh(self) -> None:
+        if self.credentials.valid:
+            return
+        started = time.perf_counter()
+        with self._refresh_lock:
+            waited = (time.perf_counter() - started) * 1000
+            # Another thread may have refreshed while this one waited.
+            if not self.credentials.valid:
+                self.credentials.refresh(google_auth_httplib2.Request(httplib2.Http()))
+                self._stats["refreshes"] += 1
+        with self._lock:
+            self._stats["refresh_wait_ms"] += waited
+            self._stats["refresh_wait_max_ms"] = max(self._stats["refresh_wait_max_ms"], waited)
 
-_service: Any | None = None
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            result = dict(self._stats)
+        result["idle"] = len(self._idle)
+        return result
 
 
-def get_gmail_service() -> Any:
-    global _service
-    if _service is not None:
-        return _service
+_pool: ServicePool | None = None
+_pool_lock = threading.Lock()
+
 
+def _load_credentials() -> Any:
     if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)  # type: ignore[no-untyped-call]
-    else:
-        token_json = os.environ.get("GMAIL_TOKEN_FILE", "").strip()
-        if token_json.startswith("{"):
-            try:
-                creds = Credentials.from_authorized_user_info(json.loads(token_json), SCOPES)  # type: ignore[no-untyped-call]
-            except json.JSONDecodeError as err:
-                logger.error("Failed to parse JSON from GMAIL_TOKEN_FILE")
-                raise FileNotFoundError("Invalid GMAIL_TOKEN_FILE content") from err
-        else:
-            logger.error(
-                "Gmail token not found. Checked path %s and GMAIL_TOKEN_FILE env.",
-                TOKEN_PATH,
-            )
-            raise FileNotFoundError(TOKEN_PATH)
-    _service = build("gmail", "v1", credentials=creds)
-    return _service
+        return Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)  # type: ignore[no-untyped-call]
+    token_json = os.environ.get("GMAIL_TOKEN_FILE", "").strip()
+    if token_json.startswith("{"):
+        try:
+            return Credentials.from_authorized_user_info(json.loads(token_json), SCOPES)  # type: ignore[no-untyped-call]
+        except json.JSONDecodeError as err:
+            logger.error("Failed to parse JSON from GMAIL_TOKEN_FILE")
+            raise FileNotFoundError("Invalid GMAIL_TOKEN_FILE content") from err
+    logger.error(
+        "Gmail token not found. Checked path %s and GMAIL_TOKEN_FILE env.",
+        TOKEN_PATH,
+    )
+    raise FileNotFoundError(TOKEN_PATH)
+
+
+def _get_pool() -> ServicePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ServicePool(_load_credentials())
+        return _pool
 
 
-def extract_body(payload: dict[str, Any]) -> str:
-    """Recursively extracts email body text from payload."""
+def get_gmail_service() -> Any:
+    """Return the calling thread's Gmail service."""
+    return _get_pool().get()
+
+
+def service_pool_stats() -> dict[str, float]:
+    """Return service pool usage and token refresh wait times."""
+    return _pool.stats() if _pool is not None else {}
+
+
+def extract_body(payload: dict[str, Any], document: HtmlDocument | None = None) -> str:
+    """Recursively extracts email body text from payload.
+
+    ``document`` is the message's already parsed HTML body; it is reused
+    instead of parsing the same HTML part again.
+    """
     mime_type = payload.get("mimeType", "")
     body_data = payload.get("body", {}).get("data")
 
     if mime_type.startswith("multipart"):
         for part in payload.get("parts", []):
-            text = extract_body(part)
+            text = extract_body(part, document)
             if text:
                 return text
     elif body_data:
@@ -60,7 +180,9 @@ def extract_body(payload: dict[str, Any]) -> str:
         if mime_type == "text/plain":
             return decoded.strip()
         if mime_type == "text/html":
-            return BeautifulSoup(decoded, "html.parser").get_text().strip()
+            if document is None or document.html != decoded:
+                document = HtmlDocument(decoded)
+            return document.text
     return ""
 
 
@@ -105,19 +227,49 @@ def _normalize_filename(name: str, index: int, mime_type: str) -> str:
     return name
 
 
-def _collect_all_parts(message_json: dict[str, Any]) -> tuple[str, list[dict[str, Any]]]:
+def _embedded_in_render(mime_type: str, size: int) -> bool:
+    return (
+        settings.preserve_html_render
+        and settings.html_render_format == "pdf"
+        and mime_type in _RENDERED_IMAGE_TYPES
+        and size <= settings.jira_max_attachment_bytes
+    )
+
+
+def _rejected_before_download(mime_type: str, size: int, is_inline: bool) -> bool:
+    """Return ``True`` if the Jira upload would skip this part anyway.
+
+    Mirrors ``jira_client._attachment_skip_reason`` using only the part
+    metadata (``body.size`` and ``mimeType``) so rejected parts are never
+    fetched or decoded.  The upload step still reports the skip status.
+    Inline JPEG and PNG images are still fetched when the PDF render will
+    embed them.
+    """
+    if is_inline and _embedded_in_render(mime_type, size):
+        return False
+    if not settings.attachment_upload_enabled:
+        return True
+    if is_inline and not settings.attach_inline_images:
+        return True
+    if size > settings.jira_max_attachment_bytes:
+        return True
+    allowed = settings.attachment_allowed_mime_json
+    return bool(allowed) and mime_type not in allowed
+
+
+def _collect_all_parts(
+    message_json: dict[str, Any], document: HtmlDocument | None = None
+) -> tuple[str, list[dict[str, Any]]]:
     """Return the HTML body and all attachment parts."""
     payload = message_json.get("payload", {})
-    html_body = _extract_html(payload)
-    cid_refs: set[str] = set()
-    if html_body:
-        soup = BeautifulSoup(html_body, "html.parser")
-        for tag in cast("Iterable[Tag]", soup.find_all(src=True)):
-            src_attr = tag.get("src")
-            if isinstance(src_attr, str) and src_attr.startswith("cid:"):
-                cid_refs.add(src_attr[4:])
+    if document is None:
+        document = HtmlDocument(_extract_html(payload))
+    html_body = document.html
+    cid_refs = document.cid_refs if html_body else frozenset()
 
     attachments: list[dict[str, Any]] = []
+    # (index into ``attachments``, attachment ID, reported size) still to fetch.
+    pending: list[tuple[int, str, int]] = []
 
     def walk(part: dict[str, Any]) -> None:
         mime_type = part.get("mimeType", "application/octet-stream")
@@ -126,12 +278,6 @@ def _collect_all_parts(message_json: dict[str, Any]) -> tuple[str, list[dict[str
         attachment_id = body.get("attachmentId")
         headers = {h.get("name", "").lower(): h.get("value", "") for h in part.get("headers", [])}
         if attachment_id or filename:
-            if attachment_id:
-                data_bytes = download_attachment(message_json.get("id", ""), attachment_id)
-            else:
-                data = body.get("data")
-                data_bytes = base64.urlsafe_b64decode(data) if data else b""
-
             cid = headers.get("content-id")
             if cid:
                 cid = cid.strip("<>")
@@ -140,12 +286,21 @@ def _collect_all_parts(message_json: dict[str, Any]) -> tuple[str, list[dict[str
                 (cid and cid in cid_refs) or ("inline" in content_disp.lower())
             )
 
+            size = int(body.get("size") or 0)
+            data_bytes = b""
+            if not _rejected_before_download(mime_type, size, is_inline):
+                if attachment_id:
+                    pending.append((len(attachments), attachment_id, size))
+                elif body.get("data"):
+                    data_bytes = base64.urlsafe_b64decode(body["data"])
+
             norm_name = _normalize_filename(filename, len(attachments), mime_type)
             attachments.append(
                 {
                     "filename": norm_name,
                     "mime_type": mime_type,
                     "data_bytes": data_bytes,
+                    "size": size or len(data_bytes),
                     "is_inline": is_inline,
                     "content_id": cid,
                 }
@@ -155,31 +310,134 @@ def _collect_all_parts(message_json: dict[str, Any]) -> tuple[str, list[dict[str
             walk(sub)
 
     walk(payload)
+    downloaded = download_attachments(
+        message_json.get("id", ""),
+        [aid for _, aid, _ in pending],
+        [size for _, _, size in pending],
+    )
+    for (index, _, _), data_file in zip(pending, downloaded, strict=True):
+        part = attachments[index]
+        del part["data_bytes"]
+        part["data_file"] = data_file
+        part["size"] = payloads.payload_size(part)
     return html_body or "", attachments
 
 
-def download_attachment(message_id: str, attachment_id: str) -> bytes:
-    """Download a single attachment's bytes from Gmail."""
+def _attachment_request(service: Any, message_id: str, attachment_id: str) -> Any:
+    return (
+        service.users()
+        .messages()
+        .attachments()
+        .get(
+            userId=settings.gmail_user_id,
+            messageId=message_id,
+            id=attachment_id,
+        )
+    )
+
+
+def _spool_attachment(resp: dict[str, Any]) -> IO[bytes]:
+    return payloads.spool_base64url(
+        resp.get("data") or "",
+        settings.attachment_spool_bytes,
+        settings.attachment_spool_dir,
+    )
+
+
+def _fetch_attachment(message_id: str, attachment_id: str) -> IO[bytes]:
+    """Download one attachment into a spooled file (empty on failure)."""
     service = get_gmail_service()
     try:
-        resp = (
-            service.users()
-            .messages()
-            .attachments()
-            .get(
-                userId=settings.gmail_user_id,
-                messageId=message_id,
-                id=attachment_id,
-            )
-            .execute()
-        )
-        data = resp.get("data")
-        return base64.urlsafe_b64decode(data) if data else b""
+        resp = _attachment_request(service, message_id, attachment_id).execute()
+        return _spool_attachment(resp)
     except HttpError as err:
         logger.error("Gmail API error fetching attachment %s: %s", attachment_id, err)
     except Exception as err:  # pragma: no cover - defensive
         logger.error("Unexpected error fetching attachment %s: %s", attachment_id, err)
-    return b""
+    return io.BytesIO()
+
+
+def download_attachment(message_id: str, attachment_id: str) -> bytes:
+    """Download a single attachment's bytes from Gmail."""
+    with _fetch_attachment(message_id, attachment_id) as data_file:
+        return data_file.read()
+
+
+def _batch_chunks(sizes: list[int]) -> Iterator[range]:
+    """Split item indices into Gmail batches bounded by count and total bytes."""
+    start, total = 0, 0
+    for index, size in enumerate(sizes):
+        full = index - start >= _GMAIL_BATCH_LIMIT or total + size > settings.gmail_batch_max_bytes
+        if index > start and full:
+            yield range(start, index)
+            start, total = index, 0
+        total += size
+    if start < len(sizes):
+        yield range(start, len(sizes))
+
+
+def _download_attachments_batch(
+    service: Any, message_id: str, attachment_ids: list[str], sizes: list[int]
+) -> list[IO[bytes]]:
+    """Fetch attachments through Gmail batch requests, one HTTP call per chunk.
+
+    Chunks are capped by ``GMAIL_BATCH_MAX_BYTES`` because a batch response
+    arrives as a single HTTP body that is held in memory while it is split.
+    """
+    results: list[IO[bytes]] = [io.BytesIO() for _ in attachment_ids]
+
+    def callback(request_id: str, response: Any, exception: Exception | None) -> None:
+        index = int(request_id)
+        if exception is not None:
+            logger.error(
+                "Gmail API error fetching attachment %s: %s", attachment_ids[index], exception
+            )
+            return
+        results[index] = _spool_attachment(response)
+
+    try:
+        for chunk in _batch_chunks(sizes):
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(
+                    _attachment_request(service, message_id, attachment_ids[index]),
+                    request_id=str(index),
+                )
+            batch.execute()
+    except Exception:
+        payloads.close_payloads({"data_file": f} for f in results)
+        raise
+    return results
+
+
+def download_attachments(
+    message_id: str, attachment_ids: list[str], sizes: list[int] | None = None
+) -> list[IO[bytes]]:
+    """Download several attachments into spooled files, preserving order.
+
+    Uses Gmail batch requests when the service supports them and falls back
+    to a bounded thread pool of individual requests, each worker using its
+    own thread's service.  Failed downloads yield an empty file, mirroring
+    the ``b""`` of :func:`download_attachment`.  ``sizes`` (the parts'
+    ``body.size``) is used to bound batch memory.
+    """
+    if len(attachment_ids) <= 1:
+        return [_fetch_attachment(message_id, aid) for aid in attachment_ids]
+
+    if settings.gmail_batch_downloads:
+        # Only this thread uses this service; workers below fetch their own.
+        service = get_gmail_service()
+        if hasattr(service, "new_batch_http_request"):
+            try:
+                return _download_attachments_batch(
+                    service, message_id, attachment_ids, sizes or [0] * len(attachment_ids)
+                )
+            except Exception as err:
+                logger.warning("Gmail batch download failed; retrying individually: %s", err)
+
+    workers = max(1, min(settings.gmail_download_concurrency, len(attachment_ids)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gaij-dl") as pool:
+        return list(pool.map(lambda aid: _fetch_attachment(message_id, aid), attachment_ids))
 
 
 def extract_html_and_inline_parts(message_json: dict[str, Any]) -> tuple[str, list[dict[str, Any]]]:
@@ -199,83 +457,306 @@ def extract_attachments(message_json: dict[str, Any]) -> list[dict[str, Any]]:
     return [a for a in attachments if not a["is_inline"]]
 
 
+class HistoryGapError(Exception):
+    """The start history ID is older than the history Gmail keeps."""
+
+
+def _history_page(
+    service: Any, start_history_id: int, label_id: str, page_token: str | None
+) -> dict[str, Any]:
+    req: dict[str, Any] = {
+        "userId": settings.gmail_user_id,
+        "startHistoryId": start_history_id,
+        "historyTypes": ["messageAdded"],
+        "labelId": label_id,
+    }
+    if page_token:
+        req["pageToken"] = page_token
+    return service.users().history().list(**req).execute()  # type: ignore[no-any-return]
+
+
+def _new_page_ids(
+    history: list[dict[str, Any]], end_history_id: int, seen: set[str]
+) -> tuple[list[str], bool]:
+    """Return unseen message IDs and whether a record past the end was hit."""
+    ids: list[str] = []
+    for record in history:
+        if int(record.get("id", 0)) > end_history_id:
+            return ids, True
+        for added in record.get("messagesAdded", []):
+            mid = added.get("message", {}).get("id")
+            if mid and mid not in seen:
+                seen.add(mid)
+                ids.append(mid)
+    return ids, False
+
+
+def _list_history_page(
+    service: Any, start_history_id: int, end_history_id: int, label_id: str, page_token: str | None
+) -> tuple[dict[str, Any], str | None] | None:
+    """Return a history page and the token that listed it, or ``None`` on error."""
+    try:
+        return _history_page(service, start_history_id, label_id, page_token), page_token
+    except HttpError as err:
+        if page_token and err.resp.status == 400:
+            logger.warning(
+                "History page token for %s rejected; listing from the start", start_history_id
+            )
+            return _list_history_page(service, start_history_id, end_history_id, label_id, None)
+        if err.resp.status == 404:
+            raise HistoryGapError(start_history_id) from err
+        logger.error(
+            "Gmail API error listing history %s-%s: %s", start_history_id, end_history_id, err
+        )
+    except Exception as err:  # pragma: no cover - generic safeguard
+        logger.error(
+            "Unexpected error listing history %s-%s: %s", start_history_id, end_history_id, err
+        )
+    return None
+
+
 def list_new_message_ids_since(
     start_history_id: int,
     end_history_id: int,
     *,
+    label_id: str | None = None,
+    page_token: str | None = None,
+    on_page: Callable[[str | None, list[str]], None] | None = None,
     _max_pages: int = 1000,
 ) -> Iterable[str]:
-    """Yield message IDs added between history IDs without storing them all."""
+    """Yield message IDs added to the watched label between two history IDs.
+
+    Raises :class:`HistoryGapError` when Gmail no longer has history from
+    ``start_history_id``.  IDs are filtered by label on the server and
+    yielded once each, and
+    paging stops at the first record past ``end_history_id`` since later
+    records belong to the next push.  ``on_page(token, ids)`` is called
+    before a page's IDs are yielded with the token that lists that page
+    (``None`` for the first), so a caller can resume a failed range from it
+    through ``page_token``.  A token Gmail no longer accepts restarts the
+    listing from ``start_history_id``.
+    """
+    service = get_gmail_service()
+    label = label_id or settings.gmail_watch_label
+    seen: set[str] = set()
+    for _ in range(_max_pages):
+        page = _list_history_page(service, start_history_id, end_history_id, label, page_token)
+        if page is None:
+            return
+        resp, page_token = page
+        ids, past_end = _new_page_ids(resp.get("history", []), end_history_id, seen)
+        if on_page is not None and ids:
+            on_page(page_token, ids)
+        yield from ids
+        page_token = resp.get("nextPageToken")
+        if past_end or not page_token:
+            return
+    logger.error(  # pragma: no cover - defensive safeguard
+        "Exceeded %d pages listing Gmail history %s-%s",
+        _max_pages,
+        start_history_id,
+        end_history_id,
+    )
+
+
+def _list_message_ids(query: str, label_id: str) -> list[str]:
     service = get_gmail_service()
-    user_id = settings.gmail_user_id
+    ids: list[str] = []
     page_token = None
-    pages = 0
-    while pages < _max_pages:
-        req = {
-            "userId": user_id,
-            "startHistoryId": start_history_id,
-            "historyTypes": ["messageAdded"],
+    while True:
+        req: dict[str, Any] = {
+            "userId": settings.gmail_user_id,
+            "q": query,
+            "labelIds": [label_id],
+            "maxResults": 500,
+            "fields": "messages/id,nextPageToken",
         }
         if page_token:
             req["pageToken"] = page_token
-        try:
-            resp = service.users().history().list(**req).execute()
-        except HttpError as err:
-            logger.error(
-                "Gmail API error listing history %s-%s: %s",
-                start_history_id,
-                end_history_id,
-                err,
-            )
-            return
-        except Exception as err:  # pragma: no cover - generic safeguard
-            logger.error(
-                "Unexpected error listing history %s-%s: %s",
-                start_history_id,
-                end_history_id,
-                err,
-            )
-            return
-        for history in resp.get("history", []):
-            for added in history.get("messagesAdded", []):
-                mid = added.get("message", {}).get("id")
-                if mid:
-                    yield mid
+        resp = service.users().messages().list(**req).execute()
+        ids.extend(m["id"] for m in resp.get("messages", []))
         page_token = resp.get("nextPageToken")
         if not page_token:
-            break
-        pages += 1
-    else:  # pragma: no cover - defensive safeguard
-        logger.error(
-            "Exceeded %d pages listing Gmail history %s-%s",
-            _max_pages,
-            start_history_id,
-            end_history_id,
+            return ids
+
+
+def scan_message_ids(
+    after: datetime, before: datetime, *, label_id: str | None = None, slices: int = 4
+) -> Iterator[str]:
+    """Yield IDs of messages in the label received between two times.
+
+    Used when history is unavailable.  The window is split into ``slices``
+    time ranges that are paged through ``messages.list`` in parallel, each on
+    its worker thread's own service; each ID is yielded once, as soon as its
+    slice is complete.  API errors propagate.
+    """
+    label = label_id or settings.gmail_watch_label
+    start, end = math.floor(after.timestamp()), math.ceil(before.timestamp())
+    step = max(1, math.ceil((end - start) / max(1, slices)))
+    # Neighbouring slices overlap by a second so no boundary is missed.
+    queries = [f"after:{lo - 1} before:{min(lo + step, end) + 1}" for lo in range(start, end, step)]
+    if not queries:
+        return
+    seen: set[str] = set()
+    with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="gaij-scan") as pool:
+        futures = [pool.submit(_list_message_ids, q, label) for q in queries]
+        for future in as_completed(futures):
+            for mid in future.result():
+                if mid not in seen:
+                    seen.add(mid)
+                    yield mid
+
+
+def _metadata_request(service: Any, message_id: str) -> Any:
+    return (
+        service.users()
+        .messages()
+        .get(
+            userId=settings.gmail_user_id,
+            id=message_id,
+            format="metadata",
+            metadataHeaders=_METADATA_HEADERS,
+            fields=_METADATA_FIELDS,
         )
+    )
+
+
+def _parse_metadata(msg: dict[str, Any]) -> dict[str, Any]:
+    headers = extract_headers(msg.get("payload", {}).get("headers", []))
+    return {
+        "id": msg.get("id", ""),
+        "from": headers["From"],
+        "subject": headers["Subject"],
+        "message_id": headers["Message-ID"],
+        "label_ids": msg.get("labelIds", []),
+    }
+
+
+def _message_request(service: Any, message_id: str, format: str) -> Any:
+    if format == "metadata":
+        return _metadata_request(service, message_id)
+    return (
+        service.users()
+        .messages()
+        .get(userId=settings.gmail_user_id, id=message_id, format=format, fields=_FULL_FIELDS)
+    )
+
+
+def _fetch_raw_batch(message_ids: list[str], format: str) -> dict[str, dict[str, Any]]:
+    """Fetch raw messages with one batch HTTP request per chunk of 50.
+
+    Messages that fail individually are logged and left out of the result.
+    """
+    service = get_gmail_service()
+    results: dict[str, dict[str, Any]] = {}
+
+    def callback(request_id: str, response: Any, exception: Exception | None) -> None:
+        message_id = message_ids[int(request_id)]
+        if exception is not None:
+            logger.error("Gmail API error fetching message %s: %s", message_id, exception)
+            return
+        results[message_id] = response
+
+    for start in range(0, len(message_ids), _GMAIL_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(start, min(start + _GMAIL_BATCH_LIMIT, len(message_ids))):
+            batch.add(
+                _message_request(service, message_ids[index], format), request_id=str(index)
+            )
+        batch.execute()
+    return results
+
+
+def get_messages(message_ids: Iterable[str], format: str = "full") -> list[dict[str, Any]]:
+    """Return parsed messages for ``message_ids`` in order, fetched in batches.
+
+    Like :func:`get_message` (or :func:`get_message_metadata` for
+    ``format="metadata"``), a message that cannot be fetched yields ``{}``.
+    """
+    ids = list(message_ids)
+    try:
+        raw = _fetch_raw_batch(ids, format)
+    except HttpError as err:
+        logger.error("Gmail API error fetching %d messages: %s", len(ids), err)
+        raw = {}
+    parse = _parse_metadata if format == "metadata" else _parse_message
+    return [parse(raw[mid]) if mid in raw else {} for mid in ids]
+
+
+def _store_prefetched(format: str, raw: dict[str, dict[str, Any]]) -> None:
+    with _prefetched_lock:
+        for message_id, response in raw.items():
+            _prefetched[(format, message_id)] = response
+        while len(_prefetched) > _PREFETCH_MAX_ENTRIES:
+            _prefetched.popitem(last=False)
+
+
+def _take_prefetched(format: str, message_id: str) -> dict[str, Any] | None:
+    with _prefetched_lock:
+        return _prefetched.pop((format, message_id), None)
+
+
+def prefetch_messages(
+    message_ids: Iterable[str],
+    want_full: Callable[[dict[str, Any]], bool] = lambda meta: True,
+) -> None:
+    """Batch-fetch metadata, then full payloads, for upcoming messages.
+
+    Full payloads are fetched only for messages whose parsed metadata passes
+    ``want_full``.  The responses are kept (up to 200) for the next
+    :func:`get_message_metadata` and :func:`get_message` call for each ID;
+    attachments are still downloaded only when the message is parsed.
+    """
+    ids = list(dict.fromkeys(message_ids))
+    if not ids:
+        return
+    metadata = _fetch_raw_batch(ids, "metadata")
+    _store_prefetched("metadata", metadata)
+    full_ids = [mid for mid in ids if mid in metadata and want_full(_parse_metadata(metadata[mid]))]
+    if full_ids:
+        _store_prefetched("full", _fetch_raw_batch(full_ids, "full"))
+
+
+def get_message_metadata(message_id: str) -> dict[str, Any]:
+    """Return sender, subject and ``Message-ID`` only, or ``{}`` on error.
+
+    A ``format=metadata`` request restricted to three headers is a few
+    hundred bytes, so messages can be screened before their body and
+    attachments are downloaded.
+    """
+    prefetched = _take_prefetched("metadata", message_id)
+    if prefetched is not None:
+        return _parse_metadata(prefetched)
+    try:
+        msg = _metadata_request(get_gmail_service(), message_id).execute()
+    except HttpError as err:
+        logger.error("Gmail API error fetching metadata for %s: %s", message_id, err)
+        return {}
+    return _parse_metadata(msg)
 
 
 def get_message(message_id: str, format: str = "full") -> dict[str, Any]:
     """Return parsed details for a Gmail message including attachments."""
-    service = get_gmail_service()
-    user_id = settings.gmail_user_id
+    prefetched = _take_prefetched(format, message_id)
+    if prefetched is not None:
+        return _parse_message(prefetched)
     try:
-        msg = (
-            service.users()
-            .messages()
-            .get(userId=user_id, id=message_id, format=format)
-            .execute()
-        )
+        msg = _message_request(get_gmail_service(), message_id, format).execute()
     except HttpError as err:
         logger.error("Gmail API error fetching message %s: %s", message_id, err)
         return {}
     except Exception as err:  # pragma: no cover - generic safeguard
         logger.error("Unexpected error fetching message %s: %s", message_id, err)
         return {}
+    return _parse_message(msg)
+
 
+def _parse_message(msg: dict[str, Any]) -> dict[str, Any]:
     payload = msg.get("payload", {})
     headers = extract_headers(payload.get("headers", []))
-    body_text = extract_body(payload)
-    html_body, all_parts = _collect_all_parts(msg)
+    document = HtmlDocument(_extract_html(payload))
+    body_text = extract_body(payload, document)
+    html_body, all_parts = _collect_all_parts(msg, document)
     inline_parts = [a for a in all_parts if a["is_inline"]]
     attachments = [a for a in all_parts if not a["is_inline"]]
     all_attachments = attachments + inline_parts
@@ -292,6 +773,7 @@ def get_message(message_id: str, format: str = "full") -> dict[str, Any]:
         "message_id": headers.get("Message-ID", ""),
         "body_text": body_text,
         "body_html": html_body,
+        "html_document": document,
         "attachments": all_attachments,
         "inline_map": inline_map,
         "inline_parts": inline_parts,
@@ -13,7 +13,7 @@ def register_watch() -> dict[str, Any]:
     topic = settings.pubsub_topic
     body = {
         "topicName": f"projects/{project}/topics/{topic}",
-        "labelIds": ["INBOX"],
+        "labelIds": [settings.gmail_watch_label],
         "labelFilterAction": "include",
     }
     response = service.users().watch(userId=user, body=body).execute()
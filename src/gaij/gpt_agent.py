@@ -2,14 +2,21 @@
 """OpenAI-based classification helper."""
 
 import json
-from typing import Any, cast
+import re
+from typing import Any
 
-from openai import OpenAI
+from openai import BadRequestError, OpenAI
 
+from . import classification_cache
 from .logger_setup import logger
+from .prompt_builder import PROMPT_VERSION, build_prompt
 from .settings import settings
 
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
 _client: OpenAI | None = None
+# Cleared the first time the model rejects ``response_format``.
+_json_mode = True
 
 
 def _get_client() -> OpenAI:
@@ -20,28 +27,77 @@ def _get_client() -> OpenAI:
 
 
 def gpt_classify_issue(subject: str, body: str) -> dict[str, Any] | None:
-    prompt = f"""
-You are an assistant that classifies emails into JIRA tickets.
-Based on the following subject and body, return a JSON object with:
-- issueType: "Bug", "Task", or "Story"
-- client: Determine the client from Email body - email address or email body. Use the domain part (e.g., oetraining.com → OETraining). Match against this list of known clients: [Global, ALA, AOCDS, APA2118, AWPPW, AWU, BIU, BPSU, CARPDC, CarpentersUnion, CATS831, CFA, CFPA, CMPTCW, CMW, CSCRC, CUPE37, FLCRC, HBPOA, HNA, HOFSTRA, IATSE 887, IATSE 927, IATSE107, IATSE15, IATSE22, IATSE58, IATSE665, IBEW Local 303, IBEW105, IBEW124, IKORCC, IMWU, IUOE18, IUPATDC5, IW377, IWL118, IWL229, IWL29, IWL397, IWL433, IWL732, IWL8, KC249, LACPDU, LBPOA, LEEBA, LEO, Localhire, MCPB, MRCC, NCSRCC, New Payment, New_Grievances, NorCARPENTERS, NWCI, OETraining, OPCMIA528, OPEIU12, OPEIU174, OPEIU29, PNWSU, PNWProfiles, PSEofWA, QUADC, SEBA, SECRC, SEIU87, SWCarpenters, Teamsters264, Teamsters456, Teamsters728, Teamsters817, Teamsters988, TeamstersNAC, TEF, TWU577, TWU579, UA123, UA198, UA230, UA32, UA434, UA467, UA486, UA486School, UA525, UA550, UA798, UA8, USW1331, UWUA1-2, WSCarpenters, WSRJB, N/A, IBEW110, OPEIU8, Teamsters891, UCCWA, IATSE835, NWOBT, IBEW640, IBEW379, ILA2078, IATSE500, CUPE417], if not found - put "N/A"
+    """Classify an e-mail, reusing a cached result for identical content."""
+    key = classification_cache.cache_key(
+        subject, body, f"{settings.openai_model}:{PROMPT_VERSION}"
+    )
+    cached = classification_cache.get(key)
+    if cached is not None:
+        logger.info("GPT classification cache hit")
+        return cached
+    result = _classify_uncached(subject, body)
+    if result is not None:
+        classification_cache.put(key, result)
+    return result
+
+
+def _parse_json(content: str) -> dict[str, Any]:
+    """Parse the reply, tolerating prose or code fences around the object."""
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        match = _JSON_OBJECT_RE.search(content)
+        if not match:
+            raise
+        parsed = json.loads(match.group(0))
+    if not isinstance(parsed, dict):
+        raise ValueError("GPT reply is not a JSON object")
+    return parsed
+
 
-Email subject: {subject}
-Email body: {body}
+def _complete(messages: list[dict[str, str]]) -> Any:
+    """Call the chat API, in JSON mode unless the model has rejected it."""
+    global _json_mode
+    client = _get_client()
+    kwargs: dict[str, Any] = {
+        "model": settings.openai_model,
+        "messages": messages,
+        "temperature": 0.2,
+    }
+    if _json_mode:
+        try:
+            return client.chat.completions.create(
+                **kwargs, response_format={"type": "json_object"}
+            )
+        except BadRequestError as exc:
+            if "response_format" not in str(exc):
+                raise
+            logger.warning("Model %s rejects JSON mode; using plain replies", kwargs["model"])
+            _json_mode = False
+    return client.chat.completions.create(**kwargs)
 
-Respond only with a JSON object, nothing else.
-"""
 
+def _classify_uncached(subject: str, body: str) -> dict[str, Any] | None:
+    prompt = build_prompt(subject, body, settings.openai_body_token_budget)
+    logger.info(
+        "GPT prompt tokens: %d before compaction, %d after",
+        prompt.raw_tokens,
+        prompt.compact_tokens,
+    )
     try:
-        client = _get_client()
-        response = client.chat.completions.create(
-            model=settings.openai_model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-        )
+        response = _complete(prompt.messages)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            logger.info(
+                "GPT usage: %s prompt tokens (%s cached), %s completion tokens",
+                usage.prompt_tokens,
+                getattr(details, "cached_tokens", 0) if details else 0,
+                usage.completion_tokens,
+            )
         content = response.choices[0].message.content or "{}"
         logger.info("GPT Response: %s", content)
-        return cast(dict[str, Any], json.loads(content))
+        return _parse_json(content)
     except Exception as exc:  # pragma: no cover - network issues
         logger.error("GPT call or JSON parse failed: %s", exc)
         return None
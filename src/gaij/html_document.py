@@ -0,0 +1,69 @@
+"""A parsed e-mail HTML body shared by every step that needs it.
+
+Text extraction, ``cid:`` discovery, ADF conversion and rendering all used to
+parse the same HTML independently.  :class:`HtmlDocument` parses it once, on
+first use, and caches what each consumer derives from the tree.  The tree is
+treated as read-only so it can be reused safely.
+
+The standard library ``html.parser`` backend is always used: other parsers
+repair malformed markup differently, which would change the ADF sent to
+Jira depending on what happens to be installed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from functools import cached_property
+from typing import cast
+
+from bs4 import BeautifulSoup
+from bs4.element import NavigableString, Tag
+
+PARSER = "html.parser"
+
+
+class HtmlDocument:
+    """Lazily parsed HTML with cached derived views."""
+
+    def __init__(self, html: str, parser: str | None = None) -> None:
+        self.html = html or ""
+        self.parser = parser or PARSER
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        """The parsed tree; callers must not modify it."""
+        return BeautifulSoup(self.html, self.parser)
+
+    @cached_property
+    def text(self) -> str:
+        """Plain text of the body, as used for ``body_text``."""
+        return self.soup.get_text().strip()
+
+    @cached_property
+    def cid_refs(self) -> frozenset[str]:
+        """Content IDs referenced by ``src="cid:..."`` attributes."""
+        refs: set[str] = set()
+        for tag in cast("Iterable[Tag]", self.soup.find_all(src=True)):
+            src_attr = tag.get("src")
+            if isinstance(src_attr, str) and src_attr.startswith("cid:"):
+                refs.add(src_attr[4:])
+        return frozenset(refs)
+
+    @cached_property
+    def render_text(self) -> str:
+        """Text with one string per line and ``<br>`` kept as a line break."""
+        return "\n".join(self._render_strings())
+
+    def _render_strings(self) -> Iterator[str]:
+        types = self.soup.interesting_string_types or {NavigableString}
+        skip: Tag | None = None
+        for node in self.soup.descendants:
+            if skip is not None and skip in node.parents:
+                continue
+            skip = None
+            if isinstance(node, Tag):
+                if node.name == "br":
+                    skip = node
+                    yield "\n"
+            elif isinstance(node, NavigableString) and type(node) in types:
+                yield str(node)
@@ -2,95 +2,71 @@
 
 from __future__ import annotations
 
-import base64
-from typing import Any
+import io
+from collections.abc import Iterator
+from typing import IO, Any
 
-from bs4 import BeautifulSoup
-from bs4.element import NavigableString
+from .html_document import HtmlDocument
+from .payloads import open_payload
+from .pdf_images import PdfImage, load_image
+from .pdf_writer import write_text_pdf
+from .png_writer import PngOptions, write_text_png
 
 
-def _simple_pdf_bytes(text: str) -> bytes:
-    """Create a very small but valid PDF containing ``text``.
-
-    The implementation avoids external dependencies so it can run in the
-    constrained execution environment used for tests.  The generated PDF uses
-    a single page with the built-in Helvetica font.
+def _pdf_images(
+    inline_parts: list[dict[str, Any]], cid_refs: frozenset[str]
+) -> Iterator[PdfImage | str]:
+    """Yield referenced inline images, or the filename of any that cannot be embedded."""
+    for part in inline_parts:
+        if part.get("content_id") not in cid_refs:
+            continue
+        image = load_image(open_payload(part))
+        yield image or part.get("filename") or part["content_id"]
+
+
+def render_html_to(
+    sink: IO[bytes],
+    html: str,
+    inline_parts: list[dict[str, Any]],
+    fmt: str = "pdf",
+    document: HtmlDocument | None = None,
+    png_options: PngOptions | None = None,
+) -> str:
+    """Render HTML e-mail into ``sink`` and return the artifact's filename.
+
+    ``fmt`` supports ``"pdf"`` and ``"png"``.  PDF output is the e-mail's
+    text, wrapped and paginated, followed by the inline JPEG and PNG images
+    the HTML references, all written incrementally by :mod:`gaij.pdf_writer`.
+    PNG output is a compact preview of the same text drawn by
+    :mod:`gaij.png_writer` within the limits in ``png_options``; referenced
+    inline images are listed by name.  Pass the message's ``document`` to
+    reuse its parsed tree.
     """
 
-    # Escape characters that have a special meaning in PDF text objects.
-    esc = text.replace("\\", r"\\\\").replace("(", r"\\(").replace(")", r"\\)")
-
-    # PDF ``Tj`` shows text only on the current line.  To preserve line
-    # breaks from the input we split the text and move the cursor down after
-    # each line using ``Td`` before rendering the next one.
-    lines = esc.split("\n")
-    parts: list[str] = []
-    for i, line in enumerate(lines):
-        if i:
-            parts.append("0 -14 Td")  # Move to the next line.
-        parts.append(f"({line}) Tj")
-    content = "BT /F1 12 Tf 72 720 Td " + " ".join(parts) + " ET"
-
-    objects: list[str] = [
-        "<< /Type /Catalog /Pages 2 0 R >>",
-        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
-        (
-            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
-            "/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>"
-        ),
-        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
-        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    document = document or HtmlDocument(html)
+    if fmt != "png":
+        # Convert HTML to plain text for the PDF representation, preserving
+        # explicit line breaks to keep e-mail formatting readable.
+        write_text_pdf(sink, document.render_text, _pdf_images(inline_parts, document.cid_refs))
+        return "email-render.pdf"
+
+    images = [
+        f"[image: {part.get('filename') or part['content_id']}]"
+        for part in inline_parts
+        if part.get("content_id") in document.cid_refs
     ]
-
-    pdf = bytearray(b"%PDF-1.4\n")
-    offsets = [0]
-    for i, obj in enumerate(objects, start=1):
-        offsets.append(len(pdf))
-        pdf.extend(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace"))
-    xref = len(pdf)
-    pdf.extend(
-        f"xref\n0 {len(objects)+1}\n0000000000 65535 f \n".encode(
-            "latin-1", "replace"
-        )
-    )
-    for off in offsets[1:]:
-        pdf.extend(f"{off:010d} 00000 n \n".encode("latin-1", "replace"))
-    pdf.extend(b"trailer\n")
-    pdf.extend(
-        f"<< /Size {len(objects)+1} /Root 1 0 R >>\n".encode("latin-1", "replace")
-    )
-    pdf.extend(f"startxref\n{xref}\n%%EOF".encode("latin-1", "replace"))
-    return bytes(pdf)
+    write_text_png(sink, "\n".join([document.render_text, *images]), png_options)
+    return "email-render.png"
 
 
 def render_html(
-    html: str, inline_parts: list[dict[str, Any]], fmt: str = "pdf"
+    html: str,
+    inline_parts: list[dict[str, Any]],
+    fmt: str = "pdf",
+    document: HtmlDocument | None = None,
+    png_options: PngOptions | None = None,
 ) -> tuple[bytes, str]:
-    """Render HTML e-mail to PDF/PNG bytes embedding inline images.
-
-    ``fmt`` currently supports ``"pdf"`` and ``"png"`` (the latter remains a
-    lightweight placeholder).  Inline images referenced via ``cid:`` URLs are
-    replaced with base64 ``data:`` URIs so that the rendered output is
-    self-contained.
-    """
-
-    for part in inline_parts:
-        cid = part.get("content_id")
-        data = base64.b64encode(part.get("data_bytes", b""))
-        mime = part.get("mime_type", "application/octet-stream")
-        if cid:
-            html = html.replace(f"cid:{cid}", f"data:{mime};base64,{data.decode()}")
-
-    if fmt == "png":
-        filename = "email-render.png"
-        return b"PNGFAKE" + html.encode("utf-8"), filename
-
-    # Convert HTML to plain text for the minimal PDF representation.
-    soup = BeautifulSoup(html, "html.parser")
-    # Preserve explicit line breaks to keep e-mail formatting readable.
-    for br in soup.find_all("br"):
-        br.replace_with(NavigableString("\n"))
-    text = soup.get_text(separator="\n")
-    pdf_bytes = _simple_pdf_bytes(text)
-    filename = "email-render.pdf"
-    return pdf_bytes, filename
+    """Render HTML e-mail to PDF/PNG bytes; see :func:`render_html_to`."""
+    buffer = io.BytesIO()
+    name = render_html_to(buffer, html, inline_parts, fmt, document, png_options)
+    return buffer.getvalue(), name
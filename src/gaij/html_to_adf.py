@@ -5,6 +5,8 @@ from typing import Any
 from bs4 import BeautifulSoup, Tag
 from bs4.element import NavigableString
 
+from .html_document import HtmlDocument
+
 PLACEHOLDER_RE = re.compile(r"__INLINE_IMAGE__\[([^\]]+)\]__")
 
 
@@ -187,9 +189,20 @@ def _convert_element(elem: Any, inline_map: dict[str, str]) -> list[dict[str, An
     return _handle_paragraph(elem, inline_map)
 
 
+def parse_html(html: str) -> BeautifulSoup:
+    """Parse ``html`` once so several ADF documents can be built from it."""
+    return HtmlDocument(html).soup
+
+
 def build_adf_from_html(html: str, inline_map: dict[str, str] | None = None) -> dict[str, Any]:
+    return build_adf_from_tree(parse_html(html), inline_map)
+
+
+def build_adf_from_tree(
+    soup: BeautifulSoup, inline_map: dict[str, str] | None = None
+) -> dict[str, Any]:
+    """Build ADF from an already parsed tree; the tree is not modified."""
     inline_map = inline_map or {}
-    soup = BeautifulSoup(html or "", "html.parser")
     body: Iterable[Any] = soup.body.contents if soup.body else soup.contents
     content: list[dict[str, Any]] = []
     for elem in body:
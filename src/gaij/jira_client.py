@@ -1,9 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional
 
 import requests  # type: ignore[import-untyped]
-from requests.auth import HTTPBasicAuth  # type: ignore[import-untyped]
 
+from . import jira_http, payloads
 from .logger_setup import logger
+from .multipart import MultipartBody
 from .settings import settings
 
 CLIENT_FIELD_ID = settings.jira_client_field_id
@@ -23,7 +25,6 @@ def create_ticket(summary: str, adf_description: dict[str, Any], client: str, is
     if labels is None:
         labels = ["Billable"]
     url = f"{settings.jira_url}/rest/api/3/issue"
-    auth = HTTPBasicAuth(settings.jira_user, settings.jira_api_token)
     headers = {"Accept": "application/json", "Content-Type": "application/json"}
 
     fields = {
@@ -42,7 +43,7 @@ def create_ticket(summary: str, adf_description: dict[str, Any], client: str, is
     payload = {"fields": fields}
 
     try:
-        response = requests.post(url, auth=auth, headers=headers, json=payload, timeout=10)
+        response = jira_http.post(url, headers=headers, json=payload)
         if response.status_code == 201:
             key = response.json().get("key")
             logger.info("Jira ticket created: %s", key)
@@ -61,7 +62,7 @@ def create_jira_ticket(*args: Any, **kwargs: Any) -> str | None:
 def _attachment_skip_reason(
     att: dict[str, Any],
     name: str,
-    data: bytes,
+    size: int,
     mime: str,
     allowed: set[str],
     max_bytes: int,
@@ -70,7 +71,9 @@ def _attachment_skip_reason(
     if att.get("is_inline") and not settings.attach_inline_images:
         logger.info("Skipping inline attachment %s", name)
         return "skipped inline"
-    if len(data) > max_bytes:
+    # Parts skipped before download carry their Gmail-reported size instead.
+    size = size or int(att.get("size") or 0)
+    if size > max_bytes:
         logger.warning("Skipping oversize attachment %s", name)
         return "oversize"
     if allowed and mime not in allowed:
@@ -79,71 +82,122 @@ def _attachment_skip_reason(
     return None
 
 
-def _extract_attachment_id(resp: requests.Response) -> str | None:
-    """Best-effort extraction of the attachment ID from the response."""
+def _extract_attachment_ids(resp: requests.Response) -> list[str]:
+    """Best-effort extraction of attachment IDs, in upload order."""
     try:
         data = resp.json()
-        if isinstance(data, list) and data:
-            return str(data[0].get("id"))
+        if isinstance(data, list):
+            return [str(item.get("id")) for item in data]
     except Exception:  # pragma: no cover - best effort
-        return None
-    return None
+        return []
+    return []
 
 
-def _upload_one_attachment(
-    att: dict[str, Any],
+def _upload_group(
+    atts: list[dict[str, Any]],
     url: str,
-    auth: HTTPBasicAuth,
     headers: dict[str, str],
-    allowed: set[str],
-    max_bytes: int,
     issue_key: str,
-) -> tuple[str, str, str | None]:
-    """Return ``(filename, status, attachment_id)`` after attempting upload."""
-    name = att.get("filename", "attachment")
-    data = att.get("data_bytes", b"")
-    mime = att.get("mime_type", "application/octet-stream")
-
-    skip_reason = _attachment_skip_reason(att, name, data, mime, allowed, max_bytes)
-    if skip_reason:
-        return name, skip_reason, None
-
-    files = {"file": (name, data, mime)}
+) -> list[tuple[str, str | None]]:
+    """POST ``atts`` as one multipart request; return ``(status, id)`` per file.
+
+    Jira accepts several ``file`` fields per request and answers with the
+    created attachments in the same order.  A failed request fails every
+    file in it.
+    """
+    names = [att.get("filename", "attachment") for att in atts]
+    label = ", ".join(names)
+    body = MultipartBody(
+        [
+            (
+                name,
+                att.get("mime_type", "application/octet-stream"),
+                payloads.open_payload(att),
+                payloads.payload_size(att),
+            )
+            for name, att in zip(names, atts, strict=True)
+        ]
+    )
+    headers = {**headers, "Content-Type": body.content_type}
     try:
-        resp = requests.post(url, auth=auth, headers=headers, files=files, timeout=10)
+        resp = jira_http.post(url, headers=headers, data=body)
     except requests.RequestException as exc:
-        logger.error("Error uploading attachment %s: %s", name, exc)
-        return name, "error", None
+        logger.error("Error uploading attachment %s: %s", label, exc)
+        return [("error", None)] * len(atts)
 
     if resp.status_code in (200, 201):
-        attach_id = _extract_attachment_id(resp)
-        logger.info("Uploaded attachment %s to %s", name, issue_key)
-        return name, "uploaded", attach_id
+        ids = _extract_attachment_ids(resp)
+        logger.info("Uploaded attachment %s to %s", label, issue_key)
+        return [("uploaded", ids[i] if i < len(ids) else None) for i in range(len(atts))]
     logger.error(
-        "Failed to upload attachment %s: %s %s", name, resp.status_code, resp.text
+        "Failed to upload attachment %s: %s %s", label, resp.status_code, resp.text
     )
-    return name, f"failed {resp.status_code}", None
+    return [(f"failed {resp.status_code}", None)] * len(atts)
+
+
+def _send_attachments(
+    attachments: list[dict[str, Any]],
+    to_send: list[int],
+    url: str,
+    headers: dict[str, str],
+    issue_key: str,
+) -> dict[int, tuple[str, str | None]]:
+    """Upload ``attachments[i]`` for each ``i`` in ``to_send`` on a thread pool."""
+    size = max(1, settings.jira_upload_batch_size)
+    groups = [to_send[i : i + size] for i in range(0, len(to_send), size)]
+    if not groups:
+        return {}
+    outcomes: dict[int, tuple[str, str | None]] = {}
+    workers = max(1, min(settings.jira_upload_concurrency, len(groups)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gaij-up") as pool:
+        sent = pool.map(
+            lambda group: _upload_group([attachments[i] for i in group], url, headers, issue_key),
+            groups,
+        )
+        for group, group_outcomes in zip(groups, sent, strict=True):
+            outcomes.update(zip(group, group_outcomes, strict=True))
+    return outcomes
 
 
 def upload_attachments(
     issue_key: str, attachments: list[dict[str, Any]]
 ) -> tuple[dict[str, str], dict[str, str]]:
-    """Upload attachments and return status plus ``cid/filename → id`` map."""
+    """Upload attachments and return status plus ``cid/filename → id`` map.
+
+    Uploads run on up to ``JIRA_UPLOAD_CONCURRENCY`` threads; with
+    ``JIRA_UPLOAD_BATCH_SIZE`` above one, that many files share a request.
+    Results are reported in the order of ``attachments`` either way.
+    """
     results: dict[str, str] = {}
     id_map: dict[str, str] = {}
     if not settings.attachment_upload_enabled or not attachments:
         return results, id_map
 
     url = f"{settings.jira_url}/rest/api/3/issue/{issue_key}/attachments"
-    auth = HTTPBasicAuth(settings.jira_user, settings.jira_api_token)
     headers = {"X-Atlassian-Token": "no-check"}
     allowed = set(settings.attachment_allowed_mime_json)
     max_bytes = settings.jira_max_attachment_bytes
 
-    for att in attachments:
-        name, status, attach_id = _upload_one_attachment(
-            att, url, auth, headers, allowed, max_bytes, issue_key
+    outcomes: dict[int, tuple[str, str | None]] = {}
+    to_send: list[int] = []
+    for index, att in enumerate(attachments):
+        skip_reason = _attachment_skip_reason(
+            att,
+            att.get("filename", "attachment"),
+            payloads.payload_size(att),
+            att.get("mime_type", "application/octet-stream"),
+            allowed,
+            max_bytes,
         )
+        if skip_reason:
+            outcomes[index] = (skip_reason, None)
+        else:
+            to_send.append(index)
+    outcomes.update(_send_attachments(attachments, to_send, url, headers, issue_key))
+
+    for index, att in enumerate(attachments):
+        name = att.get("filename", "attachment")
+        status, attach_id = outcomes[index]
         results[name] = status
         if attach_id:
             key = att.get("content_id") or name
@@ -168,11 +222,10 @@ def build_adf_with_attachment_list(
 def update_issue_description(issue_key: str, adf_description: dict[str, Any]) -> None:
     """Update the Jira issue description with the provided ADF."""
     url = f"{settings.jira_url}/rest/api/3/issue/{issue_key}"
-    auth = HTTPBasicAuth(settings.jira_user, settings.jira_api_token)
     headers = {"Accept": "application/json", "Content-Type": "application/json"}
     payload = {"fields": {"description": adf_description}}
     try:
-        resp = requests.put(url, auth=auth, headers=headers, json=payload, timeout=10)
+        resp = jira_http.put(url, headers=headers, json=payload)
         if resp.status_code not in (200, 204):
             logger.error(
                 "Failed to update Jira issue %s description: %s %s",
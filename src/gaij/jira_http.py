@@ -0,0 +1,162 @@
+"""Shared keep-alive HTTP session for Jira REST calls.
+
+All Jira requests go through one :class:`requests.Session` with a pooled
+adapter, so the TCP/TLS connection is reused for the create call, every
+attachment and the description update.  Requests are retried with jittered
+exponential backoff, honouring ``Retry-After`` on 429/503, and per-endpoint
+latency is recorded for :func:`latency_stats`.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from .logger_setup import logger
+from .multipart import MultipartBody
+from .settings import settings
+
+# Safe to retry whatever the method: the server did not process the request.
+_RETRY_ANY_METHOD = {429, 503}
+# Only retried for idempotent methods.
+_RETRY_IDEMPOTENT = {502, 504}
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+_ISSUE_KEY_RE = re.compile(r"/issue/[A-Za-z][A-Za-z0-9_]*-\d+")
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_stats: dict[str, dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide Jira session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.auth = HTTPBasicAuth(settings.jira_user, settings.jira_api_token)
+            adapter = HTTPAdapter(
+                pool_connections=settings.jira_pool_connections,
+                pool_maxsize=settings.jira_pool_maxsize,
+                max_retries=0,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _endpoint(method: str, url: str) -> str:
+    path = url.removeprefix(settings.jira_url)
+    return f"{method} {_ISSUE_KEY_RE.sub('/issue/{key}', path)}"
+
+
+def _record(endpoint: str, elapsed: float, error: bool = False) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(
+            endpoint, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        entry["count"] += 1
+        entry["errors"] += int(error)
+        entry["total_seconds"] += elapsed
+        entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+    logger.debug("Jira %s took %.3fs", endpoint, elapsed)
+
+
+def latency_stats() -> dict[str, dict[str, float]]:
+    """Return ``{endpoint: {count, errors, total_seconds, max_seconds, avg_seconds}}``."""
+    with _stats_lock:
+        return {
+            endpoint: {**entry, "avg_seconds": entry["total_seconds"] / entry["count"]}
+            for endpoint, entry in _stats.items()
+        }
+
+
+def _backoff(attempt: int) -> float:
+    ceiling = min(settings.jira_backoff_max_seconds, settings.jira_backoff_seconds * 2**attempt)
+    return random.uniform(0, ceiling)  # nosec B311 - jitter, not security
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = (when - datetime.now(UTC)).total_seconds()
+    return min(max(0.0, seconds), settings.jira_backoff_max_seconds)
+
+
+def _should_retry_status(method: str, status: int) -> bool:
+    if status in _RETRY_ANY_METHOD:
+        return True
+    return status in _RETRY_IDEMPOTENT and method in _IDEMPOTENT_METHODS
+
+
+def _should_retry_error(method: str, exc: requests.RequestException) -> bool:
+    # A connect failure never reached Jira; anything later might have.
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    return method in _IDEMPOTENT_METHODS and isinstance(
+        exc, (requests.ConnectionError, requests.Timeout)
+    )
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Send a Jira request with retries; raises ``requests.RequestException``."""
+    method = method.upper()
+    endpoint = _endpoint(method, url)
+    kwargs.setdefault(
+        "timeout", (settings.jira_connect_timeout_seconds, settings.jira_timeout_seconds)
+    )
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            resp = get_session().request(method, url, **kwargs)
+        except requests.RequestException as exc:
+            _record(endpoint, time.monotonic() - started, error=True)
+            if attempt >= settings.jira_max_retries or not _should_retry_error(method, exc):
+                raise
+            delay = _backoff(attempt)
+            logger.warning("Jira %s failed (%s); retrying in %.1fs", endpoint, exc, delay)
+        else:
+            _record(endpoint, time.monotonic() - started, error=resp.status_code >= 500)
+            if attempt >= settings.jira_max_retries or not _should_retry_status(
+                method, resp.status_code
+            ):
+                return resp
+            retry_after = _retry_after(resp)
+            delay = _backoff(attempt) if retry_after is None else retry_after
+            logger.warning(
+                "Jira %s returned %s; retrying in %.1fs", endpoint, resp.status_code, delay
+            )
+        attempt += 1
+        body = kwargs.get("data")
+        if isinstance(body, MultipartBody):
+            body.rewind()
+        time.sleep(delay)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs: Any) -> requests.Response:
+    return request("PUT", url, **kwargs)
@@ -0,0 +1,88 @@
+"""Streaming ``multipart/form-data`` request bodies."""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterator
+from typing import IO
+
+_CHUNK = 64 * 1024
+
+# (filename, mime type, stream, size in bytes)
+FilePart = tuple[str, str, IO[bytes], int]
+
+
+class MultipartBody:
+    """File-like ``multipart/form-data`` body that streams its file parts.
+
+    :mod:`requests` sends any iterable with a known length as a streaming body
+    with a ``Content-Length`` header, so file contents are read in small
+    chunks while the request is written instead of being joined into a single
+    buffer first.  Call :meth:`rewind` before sending the body again.
+    """
+
+    def __init__(self, files: list[FilePart], field: str = "file") -> None:
+        self.boundary = uuid.uuid4().hex
+        self.filenames = [name for name, _, _, _ in files]
+        self._segments: list[bytes | tuple[IO[bytes], int]] = []
+        for name, mime, stream, size in files:
+            self._segments.append(self._part_header(field, name, mime))
+            self._segments.append((stream, size))
+            self._segments.append(b"\r\n")
+        self._segments.append(f"--{self.boundary}--\r\n".encode("ascii"))
+        self.len = sum(
+            len(seg) if isinstance(seg, bytes) else seg[1] for seg in self._segments
+        )
+        self.rewind()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _part_header(self, field: str, name: str, mime: str) -> bytes:
+        safe_name = name.replace('"', "%22").replace("\r", "").replace("\n", "")
+        return (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{safe_name}"\r\n'
+            f"Content-Type: {mime}\r\n\r\n"
+        ).encode()
+
+    def _iter_segments(self) -> Iterator[bytes]:
+        for seg in self._segments:
+            if isinstance(seg, bytes):
+                yield seg
+                continue
+            stream, remaining = seg
+            while remaining > 0:
+                chunk = stream.read(min(_CHUNK, remaining))
+                if not chunk:
+                    raise ValueError("Attachment stream ended before its declared size")
+                remaining -= len(chunk)
+                yield chunk
+
+    def rewind(self) -> None:
+        for seg in self._segments:
+            if not isinstance(seg, bytes):
+                seg[0].seek(0)
+        self._chunks = self._iter_segments()
+        self._buffer = b""
+
+    def read(self, size: int | None = -1) -> bytes:
+        if size is None or size < 0:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+            return data
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        while chunk := self.read(_CHUNK):
+            yield chunk
+
+    def __len__(self) -> int:
+        return self.len
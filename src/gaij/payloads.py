@@ -0,0 +1,63 @@
+"""Helpers for attachment payloads that may be spooled to disk.
+
+Attachment dicts carry their content either as ``data_bytes`` (small parts
+that arrive inline in the Gmail message) or as ``data_file``, a
+:class:`tempfile.SpooledTemporaryFile` that stays in memory below a threshold
+and spills to disk above it.  Consumers should go through these helpers
+rather than reading either key directly.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import os
+import tempfile
+from collections.abc import Iterable
+from typing import IO, Any
+
+# Multiple of 4 so every chunk is a complete run of base64 quanta.
+_B64_CHUNK = 4 * 64 * 1024
+
+
+def spool_base64url(data: str, max_size: int, directory: str | None = None) -> IO[bytes]:
+    """Decode base64url ``data`` chunk by chunk into a spooled temporary file."""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size, dir=directory)  # noqa: SIM115
+    for offset in range(0, len(data), _B64_CHUNK):
+        spool.write(base64.urlsafe_b64decode(data[offset : offset + _B64_CHUNK]))
+    spool.seek(0)
+    return spool
+
+
+def open_payload(att: dict[str, Any]) -> IO[bytes]:
+    """Return a readable stream over the payload, positioned at the start.
+
+    Spooled payloads are returned as-is (the caller must not close them);
+    in-memory payloads are wrapped in a fresh :class:`io.BytesIO`.
+    """
+    stream = att.get("data_file")
+    if stream is not None:
+        stream.seek(0)
+        return stream  # type: ignore[no-any-return]
+    return io.BytesIO(att.get("data_bytes", b""))
+
+
+def payload_size(att: dict[str, Any]) -> int:
+    """Return the payload length in bytes without reading it."""
+    stream = att.get("data_file")
+    if stream is not None:
+        return int(stream.seek(0, os.SEEK_END))
+    return len(att.get("data_bytes", b""))
+
+
+def read_payload(att: dict[str, Any]) -> bytes:
+    """Return the whole payload; only for consumers that need it in memory."""
+    return open_payload(att).read()
+
+
+def close_payloads(parts: Iterable[dict[str, Any]]) -> None:
+    """Release spooled payloads, deleting any spilled temporary files."""
+    for part in parts:
+        stream = part.get("data_file")
+        if stream is not None:
+            stream.close()
@@ -0,0 +1,164 @@
+"""Read JPEG and PNG images into PDF image XObjects without decoding them.
+
+JPEG data is embedded as-is with the ``DCTDecode`` filter.  A PNG's ``IDAT``
+data is already a zlib stream with per-row PNG filters, which PDF's
+``FlateDecode`` with the PNG predictor understands, so it is embedded as-is
+too.  Only what PDF can take over directly is supported: interlaced PNGs and
+PNGs with an alpha channel are rejected (``None``) rather than re-encoded.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import IO
+
+_CHUNK = 64 * 1024
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# SOFn markers that carry the frame size (C4, C8 and CC are not frames).
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_STANDALONE = frozenset(range(0xD0, 0xDA)) | {0x01}
+_JPEG_APP14 = 0xEE
+_JPEG_COLOR_SPACES = {
+    1: b"/ColorSpace /DeviceGray",
+    3: b"/ColorSpace /DeviceRGB",
+    4: b"/ColorSpace /DeviceCMYK",
+}
+# CMYK JPEGs carrying Adobe's APP14 segment store their samples inverted.
+_ADOBE_CMYK_DECODE = b" /Decode [1 0 1 0 1 0 1 0]"
+_PNG_COLORS = {0: 1, 2: 3, 3: 1}
+
+
+@dataclass
+class PdfImage:
+    """Image dictionary entries plus the stream data to embed."""
+
+    width: int
+    height: int
+    entries: bytes
+    length: int
+    chunks: Iterator[bytes]
+
+
+def _copy(stream: IO[bytes]) -> Iterator[bytes]:
+    stream.seek(0)
+    while chunk := stream.read(_CHUNK):
+        yield chunk
+
+
+def _next_marker(stream: IO[bytes]) -> int | None:
+    """Skip to the next marker that starts a segment with a length field."""
+    while byte := stream.read(1):
+        if byte != b"\xff":
+            continue
+        marker = stream.read(1)
+        while marker == b"\xff":
+            marker = stream.read(1)
+        if marker and marker[0] != 0x00 and marker[0] not in _JPEG_STANDALONE:
+            return marker[0]
+    return None
+
+
+def _jpeg_frame(stream: IO[bytes]) -> tuple[int, int, int, bool] | None:
+    """Return height, width and component count from the SOF segment.
+
+    The last item says whether an Adobe APP14 segment came before it.
+    """
+    stream.seek(2)
+    adobe = False
+    while (marker := _next_marker(stream)) is not None:
+        (length,) = struct.unpack(">H", stream.read(2))
+        if marker in _JPEG_SOF:
+            _, height, width, components = struct.unpack(">BHHB", stream.read(6))
+            return height, width, components, adobe
+        if marker == _JPEG_APP14:
+            adobe = adobe or stream.read(length - 2).startswith(b"Adobe")
+        else:
+            stream.seek(length - 2, 1)
+    return None
+
+
+def read_jpeg(stream: IO[bytes]) -> PdfImage | None:
+    frame = _jpeg_frame(stream)
+    if frame is None:
+        return None
+    height, width, components, adobe = frame
+    color_space = _JPEG_COLOR_SPACES.get(components)
+    if color_space is None or not width or not height:
+        return None
+    if components == 4 and adobe:
+        color_space += _ADOBE_CMYK_DECODE
+    length = stream.seek(0, 2)
+    return PdfImage(
+        width,
+        height,
+        color_space + b" /BitsPerComponent 8 /Filter /DCTDecode",
+        length,
+        _copy(stream),
+    )
+
+
+def _png_chunks(stream: IO[bytes]) -> Iterator[tuple[bytes, bytes]]:
+    stream.seek(len(_PNG_SIGNATURE))
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack(">I4s", header)
+        data = stream.read(length)
+        stream.seek(4, 1)  # CRC
+        yield kind, data
+        if kind == b"IEND":
+            return
+
+
+def _png_color_space(color: int, palette: bytes) -> bytes:
+    if color == 3:
+        hival = len(palette) // 3 - 1
+        return b"[/Indexed /DeviceRGB %d <%s>]" % (hival, palette.hex().encode())
+    return b"/DeviceGray" if color == 0 else b"/DeviceRGB"
+
+
+def _png_parts(stream: IO[bytes]) -> tuple[tuple[int, ...], bytes, list[bytes]]:
+    """Return the IHDR fields, the palette and the IDAT chunks."""
+    header: tuple[int, ...] = (0, 0, 0, 0, 0, 0, 0)
+    palette = b""
+    idat: list[bytes] = []
+    for kind, data in _png_chunks(stream):
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", data)
+        elif kind == b"PLTE":
+            palette = data
+        elif kind == b"IDAT":
+            idat.append(data)
+    return header, palette, idat
+
+
+def read_png(stream: IO[bytes]) -> PdfImage | None:
+    header, palette, idat = _png_parts(stream)
+    width, height, depth, color, _, _, interlace = header
+    if interlace or color not in _PNG_COLORS or (color == 3 and not palette):
+        return None
+    if not width or not height or not idat:
+        return None
+    entries = (
+        b"/ColorSpace %s /BitsPerComponent %d /Filter /FlateDecode "
+        b"/DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent %d /Columns %d >>"
+        % (_png_color_space(color, palette), depth, _PNG_COLORS[color], depth, width)
+    )
+    return PdfImage(width, height, entries, sum(map(len, idat)), iter(idat))
+
+
+def load_image(stream: IO[bytes]) -> PdfImage | None:
+    """Return a :class:`PdfImage` for a JPEG or PNG, or ``None`` if unsupported."""
+    stream.seek(0)
+    head = stream.read(8)
+    try:
+        if head.startswith(b"\xff\xd8"):
+            return read_jpeg(stream)
+        if head == _PNG_SIGNATURE:
+            return read_png(stream)
+    except struct.error:
+        return None
+    return None
@@ -0,0 +1,268 @@
+"""Incremental writer for plain-text PDF documents.
+
+Objects are written to a file-like sink as soon as they are complete, so a
+long e-mail never has to be held in memory as one PDF buffer.  Text is
+wrapped to the page width using the Helvetica metrics, pages are started
+automatically when one fills up, and every page's content stream is
+FlateDecode-compressed.  Images are embedded as image XObjects whose data is
+copied through without decoding (see :mod:`gaij.pdf_images`).
+"""
+
+from __future__ import annotations
+
+import itertools
+import zlib
+from collections.abc import Iterable
+from typing import IO
+
+from .pdf_images import PdfImage
+
+# Advance widths of Helvetica for the printable ASCII range, in 1/1000 em.
+_HELVETICA_ASCII = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)  # fmt: skip
+_WIDTHS = {chr(32 + i): w for i, w in enumerate(_HELVETICA_ASCII)}
+_DEFAULT_WIDTH = 556
+
+_CATALOG, _PAGES, _FONT = 1, 2, 3
+
+
+def text_width(text: str, font_size: float) -> float:
+    """Return the width of ``text`` set in Helvetica at ``font_size`` points."""
+    return sum(map(_WIDTHS.get, text, itertools.repeat(_DEFAULT_WIDTH))) * font_size / 1000
+
+
+def _split_long(word: str, max_width: float, font_size: float) -> list[str]:
+    pieces, current, width = [], "", 0.0
+    for ch in word:
+        ch_width = _WIDTHS.get(ch, _DEFAULT_WIDTH) * font_size / 1000
+        if current and width + ch_width > max_width:
+            pieces.append(current)
+            current, width = "", 0.0
+        current += ch
+        width += ch_width
+    pieces.append(current)
+    return pieces
+
+
+def wrap_line(line: str, max_width: float, font_size: float) -> list[str]:
+    """Greedily wrap ``line`` at spaces; words wider than a row are split."""
+    line = line.expandtabs(4)
+    if text_width(line, font_size) <= max_width:
+        return [line]
+    rows: list[str] = []
+    current, width = "", 0.0
+    space = _WIDTHS[" "] * font_size / 1000
+    for word in line.split(" "):
+        word_width = text_width(word, font_size)
+        if current and width + space + word_width <= max_width:
+            current, width = f"{current} {word}", width + space + word_width
+            continue
+        if current:
+            rows.append(current)
+        if word_width > max_width:
+            *full, word = _split_long(word, max_width, font_size)
+            rows.extend(full)
+            word_width = text_width(word, font_size)
+        current, width = word, word_width
+    if current or not rows:
+        rows.append(current)
+    return rows
+
+
+def _pdf_string(text: str) -> bytes:
+    raw = text.encode("cp1252", "replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfWriter:
+    """Write wrapped, paginated text and images to ``sink`` as a PDF.
+
+    Call :meth:`write_text` and :meth:`write_image` any number of times,
+    then :meth:`close`, which writes the page tree and cross-reference table.
+    Only the current page's drawing operators are buffered; image data is
+    copied straight through to the sink.  The sink itself is left open.
+    """
+
+    def __init__(
+        self,
+        sink: IO[bytes],
+        *,
+        font_size: float = 12,
+        leading: float = 14,
+        page_size: tuple[float, float] = (612, 792),
+        margin: float = 72,
+        compress_level: int = 6,
+    ) -> None:
+        self._sink = sink
+        self.font_size = font_size
+        self.leading = leading
+        self.page_size = page_size
+        self.margin = margin
+        self.max_width = page_size[0] - 2 * margin
+        self._compress_level = compress_level
+        self._offset = 0
+        self._offsets: dict[int, int] = {}
+        self._next_id = _FONT + 1
+        self._pages: list[int] = []
+        # Drawing operators of the open page, or ``None`` between pages.
+        self._ops: list[bytes] | None = None
+        self._page_images: list[int] = []
+        self._in_text = False
+        self._y = 0.0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(
+            _FONT,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+            b"/Encoding /WinAnsiEncoding >>",
+        )
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages) + (self._ops is not None)
+
+    @property
+    def _top(self) -> float:
+        return self.page_size[1] - self.margin
+
+    def _write(self, data: bytes) -> None:
+        self._sink.write(data)
+        self._offset += len(data)
+
+    def _allocate(self) -> int:
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _object(self, obj_id: int, body: bytes) -> None:
+        self._offsets[obj_id] = self._offset
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, body))
+
+    def _begin_page(self) -> list[bytes]:
+        self._ops = []
+        self._page_images = []
+        self._in_text = False
+        self._y = self._top
+        return self._ops
+
+    def _end_page(self) -> None:
+        ops = self._ops if self._ops is not None else self._begin_page()
+        if self._in_text:
+            ops.append(b"ET")
+        content = zlib.compress(b"\n".join(ops) + b"\n", self._compress_level)
+        content_id = self._allocate()
+        self._object(
+            content_id,
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+            % (len(content), content),
+        )
+        images = b" ".join(b"/Im%d %d 0 R" % (i, i) for i in self._page_images)
+        page_id = self._allocate()
+        self._object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %g %g] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> /XObject << %s >> >> >>"
+            % (_PAGES, self.page_size[0], self.page_size[1], content_id, _FONT, images),
+        )
+        self._pages.append(page_id)
+        self._ops = None
+
+    def _row(self, row: str) -> None:
+        if self._ops is not None and self._y < self.margin:
+            self._end_page()
+        ops = self._ops if self._ops is not None else self._begin_page()
+        if self._in_text:
+            ops.append(b"T* " + _pdf_string(row) + b" Tj")
+        else:
+            ops.append(
+                b"BT /F1 %g Tf %g TL %g %g Td %s Tj"
+                % (self.font_size, self.leading, self.margin, self._y, _pdf_string(row))
+            )
+            self._in_text = True
+        self._y -= self.leading
+
+    def write_text(self, text: str) -> None:
+        """Add ``text``; each ``\\n`` starts a new line."""
+        for line in text.replace("\r\n", "\n").split("\n"):
+            for row in wrap_line(line, self.max_width, self.font_size):
+                self._row(row)
+
+    def write_image(self, image: PdfImage) -> None:
+        """Add an image below the text, scaled to fit the page.
+
+        Pixels are taken as 1/96 inch, the CSS pixel, so screenshots and
+        logos come out at their on-screen size.
+        """
+        obj_id = self._allocate()
+        self._offsets[obj_id] = self._offset
+        self._write(
+            b"%d 0 obj\n<< /Type /XObject /Subtype /Image /Width %d /Height %d %s "
+            b"/Length %d >>\nstream\n" % (obj_id, image.width, image.height, image.entries, image.length)
+        )
+        for chunk in image.chunks:
+            self._write(chunk)
+        self._write(b"\nendstream\nendobj\n")
+
+        scale = min(
+            0.75,
+            self.max_width / image.width,
+            (self.page_size[1] - 2 * self.margin) / image.height,
+        )
+        width, height = image.width * scale, image.height * scale
+        ops = self._ops if self._ops is not None else self._begin_page()
+        # The image starts where the top of the next text row would be.
+        top = min(self._y + self.font_size, self._top)
+        if top - height < self.margin and top < self._top:
+            self._end_page()
+            ops, top = self._begin_page(), self._top
+        if self._in_text:
+            ops.append(b"ET")
+            self._in_text = False
+        ops.append(
+            b"q %.2f 0 0 %.2f %g %.2f cm /Im%d Do Q"
+            % (width, height, self.margin, top - height, obj_id)
+        )
+        self._page_images.append(obj_id)
+        self._y = top - height - self.leading
+
+    def close(self) -> None:
+        if self._ops is not None or not self._pages:
+            self._end_page()
+        kids = b" ".join(b"%d 0 R" % page for page in self._pages)
+        self._object(
+            _PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages))
+        )
+        self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+        xref = self._offset
+        size = self._next_id
+        entries = [b"0000000000 65535 f \n"]
+        entries.extend(b"%010d 00000 n \n" % self._offsets[i] for i in range(1, size))
+        self._write(b"xref\n0 %d\n%s" % (size, b"".join(entries)))
+        self._write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, _CATALOG, xref)
+        )
+
+
+def write_text_pdf(
+    sink: IO[bytes], text: str, images: Iterable[PdfImage | str] = ()
+) -> int:
+    """Write ``text`` and then ``images`` to ``sink`` as a PDF.
+
+    A string in ``images`` stands for an image that could not be embedded
+    and is written as a ``[image: ...]`` line.  Returns the number of pages.
+    """
+    writer = PdfWriter(sink)
+    writer.write_text(text)
+    for image in images:
+        if isinstance(image, str):
+            writer.write_text(f"[image: {image}]")
+        else:
+            writer.write_image(image)
+    pages = writer.page_count
+    writer.close()
+    return pages
@@ -0,0 +1,300 @@
+"""Rasterize plain text into a small black-and-white PNG preview.
+
+Text is drawn with a built-in 5x7 bitmap font, so no imaging library is
+needed.  The image is 1 bit per pixel and its scanlines are deflated and
+written to the sink as they are produced.  Its height is fixed up front,
+capped by the height limit and by how many lines like the first few fit in
+the byte budget; only that many lines are wrapped, the rest are just counted.
+The compressed size is checked every few lines, and if it approaches the
+budget the remaining rows are left blank, which costs little once deflated.
+Either way the last line says how many lines were left out.
+"""
+
+from __future__ import annotations
+
+import struct
+import unicodedata
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import IO
+
+# Column bitmaps for printable ASCII; bit 0 of each byte is the top row.
+_FONT = bytes.fromhex(
+    "000000000000005f00000007000700147f147f14242a7f2a1223130864623649552250"
+    "0005030000001c2241000041221c00082a1c2a0808083e080800503000000808080808"
+    "006060000020100804023e5149453e00427f400042615149462141454b311814127f10"
+    "27454545393c4a49493001710905033649494936064949291e00363600000056360000"
+    "00081422411414141414412214080002015109063e415d551e7e1111117e7f49494936"
+    "3e414141227f4141221c7f494949417f090901013e414151327f0808087f00417f4100"
+    "2040413f017f081422417f404040407f0204027f7f0408107f3e4141413e7f09090906"
+    "3e4151215e7f09192946464949493101017f01013f4040403f1f2040201f7f2018207f"
+    "63140814630304780403615149454300007f4141020408102041417f00000402010204"
+    "4040404040000102040020545454787f484444383844444420384444487f3854545418"
+    "087e0901020c5252523e7f0804047800447d40002040443d00007f10284400417f4000"
+    "7c041804787c0804047838444444387c14141408081414187c7c080404084854545420"
+    "043f4440203c4040207c1c2040201c3c4030403c44281028440c5050503c4464544c44"
+    "000836410000007f000000413608000402040804"
+)
+_GLYPH_WIDTH, _GLYPH_HEIGHT = 5, 7
+# Each character cell adds one blank column; each line two blank rows.
+_CELL_WIDTH, _LINE_HEIGHT = _GLYPH_WIDTH + 1, _GLYPH_HEIGHT + 2
+_MARGIN_CELLS = 1
+_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_IDAT_SIZE = 64 * 1024
+# Signature, IHDR, pHYs and IEND, plus the framing of the last IDAT chunks.
+_OVERHEAD_BYTES = 128
+_CHUNK_FRAMING = 12
+# Lines drawn between size checks; each check is a Z_SYNC_FLUSH.
+_SYNC_EVERY = 16
+
+
+@dataclass(frozen=True)
+class PngOptions:
+    """Layout and size limits of a text preview.
+
+    At 96 DPI each font pixel is drawn as 2x2 image pixels.
+    """
+
+    dpi: int = 96
+    columns: int = 100
+    max_height: int = 16384
+    max_bytes: int = 2 * 1024 * 1024
+
+    @property
+    def scale(self) -> int:
+        return max(1, round(self.dpi / 48))
+
+
+def _fold(ch: str) -> str:
+    if " " <= ch <= "~":
+        return ch
+    base = unicodedata.normalize("NFKD", ch)[:1]
+    return base if " " <= base <= "~" else "?"
+
+
+@lru_cache(maxsize=8)
+def _glyph_rows(scale: int) -> tuple[dict[str, int], ...]:
+    """Per font row, each character's scaled cell as an ink bitmask."""
+    rows: list[dict[str, int]] = []
+    for row in range(_GLYPH_HEIGHT):
+        masks = {}
+        for index in range(len(_FONT) // _GLYPH_WIDTH):
+            mask = 0
+            for column in _FONT[index * _GLYPH_WIDTH : (index + 1) * _GLYPH_WIDTH]:
+                mask = (mask << scale) | (((1 << scale) - 1) * ((column >> row) & 1))
+            masks[chr(32 + index)] = mask << scale
+        rows.append(masks)
+    return tuple(rows)
+
+
+def _wrapped(text: str, columns: int) -> Iterator[str]:
+    for line in text.replace("\r\n", "\n").split("\n"):
+        line = line.expandtabs(4)
+        if not (line.isascii() and line.isprintable()):
+            line = "".join(map(_fold, line))
+        start = 0
+        while len(line) - start > columns:
+            cut = line.rfind(" ", start + 1, start + columns + 1)
+            if cut < 0:
+                yield line[start : start + columns]
+                start += columns
+            else:
+                yield line[start:cut]
+                start = cut + 1
+        yield line[start:]
+
+
+def wrap_text(text: str, columns: int, limit: int | None = None) -> list[str]:
+    """Split ``text`` into lines of at most ``columns`` characters.
+
+    Lines break at the last space that fits; longer words are split.
+    Characters outside printable ASCII are folded to it or drawn as ``?``.
+    Wrapping stops after ``limit`` lines.
+    """
+    return list(islice(_wrapped(text, columns), limit))
+
+
+class _PngStream:
+    """Writes PNG chunks to the sink, deflating IDAT data incrementally."""
+
+    def __init__(self, sink: IO[bytes], level: int) -> None:
+        self._sink = sink
+        self._deflate = zlib.compressobj(level)
+        self._pending = bytearray()
+        self.written = 0
+        self._write(_SIGNATURE)
+
+    def chunk(self, kind: bytes, data: bytes) -> None:
+        crc = zlib.crc32(data, zlib.crc32(kind))
+        self._write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc))
+
+    def _write(self, data: bytes) -> None:
+        self._sink.write(data)
+        self.written += len(data)
+
+    def scanlines(self, data: bytes) -> None:
+        self._pending += self._deflate.compress(data)
+        if len(self._pending) >= _IDAT_SIZE:
+            self._flush_idat()
+
+    def sync(self) -> int:
+        """Return the output size so far, including data still in the compressor."""
+        self._pending += self._deflate.flush(zlib.Z_SYNC_FLUSH)
+        return self.written + len(self._pending)
+
+    def _flush_idat(self) -> None:
+        if self._pending:
+            self.chunk(b"IDAT", bytes(self._pending))
+            self._pending.clear()
+
+    def finish(self) -> None:
+        self._pending += self._deflate.flush()
+        self._flush_idat()
+        self.chunk(b"IEND", b"")
+
+
+class _Canvas:
+    """Turns text lines into scanlines of a fixed-width 1-bit image."""
+
+    def __init__(self, options: PngOptions) -> None:
+        scale = options.scale
+        self.scale = scale
+        self.columns = max(1, options.columns)
+        self.margin = _MARGIN_CELLS * _CELL_WIDTH * scale
+        content = self.columns * _CELL_WIDTH * scale
+        # Whole bytes per row, so the row bitmask maps straight to bytes.
+        self.stride = (content + 2 * self.margin + 7) // 8
+        self.width = self.stride * 8
+        self.line_height = _LINE_HEIGHT * scale
+        self.white_row = b"\x00" + b"\xff" * self.stride
+        self._cell = _CELL_WIDTH * scale
+        self._full = (1 << self.width) - 1
+        self._glyphs = _glyph_rows(scale)
+
+    def line(self, text: str) -> bytes:
+        """Return the filtered scanlines of one line of text."""
+        pad = self.width - self.margin - len(text) * self._cell
+        out = []
+        for masks in self._glyphs:
+            ink = 0
+            for ch in text:
+                ink = (ink << self._cell) | masks[ch]
+            row = b"\x00" + ((ink << pad) ^ self._full).to_bytes(self.stride, "big")
+            out.append(row * self.scale)
+        gap = self.white_row * ((_LINE_HEIGHT - _GLYPH_HEIGHT) * self.scale)
+        return b"".join(out) + gap
+
+
+def _omitted(count: int, columns: int) -> str:
+    text = f"[... {count} more line{'s' if count != 1 else ''} not shown]"
+    if len(text) > columns:
+        text = f"[+{count}]"
+    return text[:columns]
+
+
+def _deflated_size(data: bytes, level: int) -> int:
+    deflate = zlib.compressobj(level)
+    return len(deflate.compress(data) + deflate.flush(zlib.Z_SYNC_FLUSH))
+
+
+class _Budget:
+    """Estimates of the compressed size of what is left to write."""
+
+    def __init__(
+        self, canvas: _Canvas, max_bytes: int, level: int, sample: list[str], max_lines: int
+    ) -> None:
+        self.max_bytes = max_bytes - _OVERHEAD_BYTES - _CHUNK_FRAMING * (max_bytes // _IDAT_SIZE)
+        blank = canvas.white_row * canvas.line_height * len(sample)
+        self.blank_line = _deflated_size(blank, level) / len(sample)
+        # Sized from the first lines, so the image is not mostly blank rows.
+        drawn = b"".join(map(canvas.line, sample))
+        self.sample_line = max(self.blank_line, _deflated_size(drawn, level) / len(sample))
+        # The "not shown" line and both margins; its count is not known yet,
+        # so it is sized with an upper bound.
+        margins = canvas.white_row * 2 * canvas.margin
+        self.last_line = _deflated_size(
+            canvas.line(_omitted(max_lines, canvas.columns)) + margins, level
+        )
+        self.text_line = 0.0
+
+    def room(self) -> int:
+        """Return how many lines fit if they cost what the first ones do."""
+        spare = self.max_bytes - self.last_line
+        return 1 + max(0, int(spare // self.sample_line))
+
+    def fits(self, size: int, lines_left: int, count: int) -> bool:
+        """Return whether ``count`` more text lines fit after ``size`` bytes.
+
+        ``lines_left`` counts those lines, the blank lines below them and the
+        last line.
+        """
+        blank = max(0, lines_left - count - 1) * self.blank_line
+        last = max(self.text_line, self.last_line)
+        return size + count * self.text_line + blank + last <= self.max_bytes
+
+
+def _draw(png: _PngStream, canvas: _Canvas, budget: _Budget, lines: list[str]) -> int:
+    """Draw all but the last line while they fit; return how many were drawn.
+
+    Lines are drawn ``_SYNC_EVERY`` at a time, then one at a time once a
+    whole batch no longer fits.
+    """
+    drawn, step = 0, _SYNC_EVERY
+    size = png.sync()
+    while drawn < len(lines) - 1:
+        count = min(step, len(lines) - 1 - drawn)
+        if not budget.fits(size, len(lines) - drawn, count):
+            if step == 1:
+                break
+            step = 1
+            continue
+        png.scanlines(b"".join(canvas.line(line) for line in lines[drawn : drawn + count]))
+        written = png.sync()
+        budget.text_line = max(budget.text_line, (written - size) / count)
+        size = written
+        drawn += count
+    return drawn
+
+
+def write_text_png(
+    sink: IO[bytes], text: str, options: PngOptions | None = None, *, level: int = 9
+) -> int:
+    """Write ``text`` to ``sink`` as a PNG and return the number of lines drawn.
+
+    Lines beyond ``options.max_height``, or beyond what fits in
+    ``options.max_bytes``, are replaced by a single "not shown" line.  The
+    PNG stays within ``max_bytes`` unless even that one line does not fit.
+    """
+    options = options or PngOptions()
+    canvas = _Canvas(options)
+    wrapped = _wrapped(text, canvas.columns)
+    lines = list(islice(wrapped, 16))
+    # Every wrapped line but the last consumes at least one character.
+    budget = _Budget(canvas, options.max_bytes, level, lines, len(text) + 1)
+    room = min(
+        max(1, (options.max_height - 2 * canvas.margin) // canvas.line_height), budget.room()
+    )
+    lines.extend(islice(wrapped, room + 1 - len(lines)))
+    total = len(lines) + sum(1 for _ in wrapped)
+    if total > room:
+        lines = [*lines[: room - 1], _omitted(total - room + 1, canvas.columns)]
+    height = 2 * canvas.margin + len(lines) * canvas.line_height
+
+    png = _PngStream(sink, level)
+    png.chunk(b"IHDR", struct.pack(">IIBBBBB", canvas.width, height, 1, 0, 0, 0, 0))
+    ppm = round(options.dpi / 0.0254)
+    png.chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+    png.scanlines(canvas.white_row * canvas.margin)
+
+    drawn = _draw(png, canvas, budget, lines)
+    blank_line = canvas.white_row * canvas.line_height
+    for _ in range(len(lines) - 1 - drawn):
+        png.scanlines(blank_line)
+    last = lines[-1] if drawn + 1 == total else _omitted(total - drawn, canvas.columns)
+    png.scanlines(canvas.line(last))
+    png.scanlines(canvas.white_row * canvas.margin)
+    png.finish()
+    return drawn + 1
@@ -0,0 +1,129 @@
+"""Compact, token-budgeted prompts for GPT classification.
+
+The system message holds everything that never changes between calls (the
+instructions and the client list) so providers that cache prompt prefixes can
+reuse it.  Only the subject and a compacted body go into the user message:
+quoted reply chains, signatures and legal disclaimers are dropped and the
+rest is cut to a token budget.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import math
+import re
+from dataclasses import dataclass
+from typing import Any
+
+# Bump when the prompt changes in a way that should invalidate cached results.
+PROMPT_VERSION = "2"
+
+KNOWN_CLIENTS = (
+    "Global, ALA, AOCDS, APA2118, AWPPW, AWU, BIU, BPSU, CARPDC, CarpentersUnion, CATS831, "
+    "CFA, CFPA, CMPTCW, CMW, CSCRC, CUPE37, FLCRC, HBPOA, HNA, HOFSTRA, IATSE 887, IATSE 927, "
+    "IATSE107, IATSE15, IATSE22, IATSE58, IATSE665, IBEW Local 303, IBEW105, IBEW124, IKORCC, "
+    "IMWU, IUOE18, IUPATDC5, IW377, IWL118, IWL229, IWL29, IWL397, IWL433, IWL732, IWL8, "
+    "KC249, LACPDU, LBPOA, LEEBA, LEO, Localhire, MCPB, MRCC, NCSRCC, New Payment, "
+    "New_Grievances, NorCARPENTERS, NWCI, OETraining, OPCMIA528, OPEIU12, OPEIU174, OPEIU29, "
+    "PNWSU, PNWProfiles, PSEofWA, QUADC, SEBA, SECRC, SEIU87, SWCarpenters, Teamsters264, "
+    "Teamsters456, Teamsters728, Teamsters817, Teamsters988, TeamstersNAC, TEF, TWU577, "
+    "TWU579, UA123, UA198, UA230, UA32, UA434, UA467, UA486, UA486School, UA525, UA550, UA798, "
+    "UA8, USW1331, UWUA1-2, WSCarpenters, WSRJB, N/A, IBEW110, OPEIU8, Teamsters891, UCCWA, "
+    "IATSE835, NWOBT, IBEW640, IBEW379, ILA2078, IATSE500, CUPE417"
+)
+
+SYSTEM_PROMPT = f"""You are an assistant that classifies emails into JIRA tickets.
+Based on the subject and body you are given, return a JSON object with:
+- issueType: "Bug", "Task", or "Story"
+- client: Determine the client from Email body - email address or email body. Use the domain \
+part (e.g., oetraining.com → OETraining). Match against this list of known clients: \
+[{KNOWN_CLIENTS}], if not found - put "N/A"
+
+Respond only with a JSON object, nothing else."""
+
+# A reply header ends the new content; everything below is the quoted thread.
+_REPLY_MARKERS = re.compile(
+    r"^(?:On .{0,200}wrote:\s*$"
+    r"|-{2,}\s*Original Message\s*-{2,}"
+    r"|_{10,}\s*$"
+    r"|From:\s.*$\n^(?:Sent|Date):\s)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_SIGNATURE_MARKERS = re.compile(
+    r"^(?:--\s*$|Sent from my \w+|Get Outlook for \w+)", re.IGNORECASE | re.MULTILINE
+)
+_DISCLAIMER_RE = re.compile(
+    r"\b(?:confidential|privileged)\b.*\b(?:intended (?:solely )?for|intended recipient|"
+    r"received this (?:e-?mail|message) in error)",
+    re.IGNORECASE | re.DOTALL,
+)
+_QUOTED_LINE_RE = re.compile(r"^[ \t]*>.*(?:\n|$)", re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+_SPACES_RE = re.compile(r"[ \t]+")
+
+_CHARS_PER_TOKEN = 4
+
+if importlib.util.find_spec("tiktoken"):  # pragma: no cover - optional dependency
+    import tiktoken
+
+    _ENCODING: Any = tiktoken.get_encoding("cl100k_base")
+else:
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """Return the token count, estimated from length without ``tiktoken``."""
+    if _ENCODING is not None:  # pragma: no cover - optional dependency
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """Cut ``text`` to at most ``budget`` tokens."""
+    if count_tokens(text) <= budget:
+        return text
+    if _ENCODING is not None:  # pragma: no cover - optional dependency
+        return str(_ENCODING.decode(_ENCODING.encode(text)[:budget]))
+    return text[: max(0, budget) * _CHARS_PER_TOKEN]
+
+
+def _cut_at(pattern: re.Pattern[str], text: str) -> str:
+    # Only cut when something substantive precedes the marker, so a mail that
+    # is nothing but a forwarded thread keeps its content.
+    match = pattern.search(text)
+    if match and text[: match.start()].strip():
+        return text[: match.start()]
+    return text
+
+
+def compact_body(body: str) -> str:
+    """Drop quoted replies, signatures and disclaimers and squeeze whitespace."""
+    text = (body or "").replace("\r\n", "\n")
+    text = _cut_at(_REPLY_MARKERS, text)
+    text = _QUOTED_LINE_RE.sub("", text)
+    text = _cut_at(_SIGNATURE_MARKERS, text)
+    paragraphs = [p for p in _BLANK_LINES_RE.split(text) if not _DISCLAIMER_RE.search(p)]
+    return "\n\n".join(_SPACES_RE.sub(" ", p).strip() for p in paragraphs if p.strip())
+
+
+@dataclass(frozen=True)
+class Prompt:
+    messages: list[dict[str, str]]
+    raw_tokens: int
+    compact_tokens: int
+
+
+def build_prompt(subject: str, body: str, body_budget: int) -> Prompt:
+    """Return chat messages with the static prefix first and a compact body."""
+    compact = truncate_tokens(compact_body(body), body_budget)
+    user = f"Email subject: {subject}\nEmail body: {compact}"
+    raw_user = f"Email subject: {subject}\nEmail body: {body}"
+    system_tokens = count_tokens(SYSTEM_PROMPT)
+    return Prompt(
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user},
+        ],
+        raw_tokens=system_tokens + count_tokens(raw_user),
+        compact_tokens=system_tokens + count_tokens(user),
+    )
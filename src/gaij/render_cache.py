@@ -0,0 +1,229 @@
+"""Content-addressed cache of full-fidelity e-mail renders.
+
+Newsletters sent to several aliases, messages retried after being unclaimed
+and identical automated alerts all produce the same render.  Keys hash the
+render format and options, the HTML and every inline part's content ID,
+filename, type and payload, so a hit is byte-for-byte what
+:mod:`gaij.html_renderer` would produce and skips rendering altogether.
+
+An in-process LRU bounded by total bytes is always consulted first.  Behind
+it, ``RENDER_CACHE_BACKEND=disk`` adds a SQLite file shared by the workers on
+a host; ``memory`` uses no shared tier and ``none`` disables caching.
+Renders never change for a key, so entries have no TTL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Protocol
+
+from . import payloads
+from .logger_setup import logger
+from .settings import settings
+
+RenderEntry = tuple[bytes, str]
+
+_CHUNK = 64 * 1024
+
+_DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used_at INTEGER NOT NULL
+)
+"""
+
+
+def _payload_digest(part: dict[str, Any]) -> bytes:
+    digest = hashlib.sha256()
+    stream = payloads.open_payload(part)
+    while chunk := stream.read(_CHUNK):
+        digest.update(chunk)
+    return digest.digest()
+
+
+def cache_key(
+    html: str, inline_parts: list[dict[str, Any]], fmt: str, options: object = None
+) -> str:
+    """Return the cache key for rendering ``html`` with ``inline_parts`` as ``fmt``.
+
+    ``options`` (e.g. :class:`gaij.png_writer.PngOptions`) is keyed by its repr.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{fmt}\0{options!r}\0".encode())
+    digest.update(html.encode("utf-8", "surrogatepass"))
+    for part in inline_parts:
+        if not part.get("content_id"):
+            continue
+        header = "\0".join(
+            (part["content_id"], part.get("filename") or "", part.get("mime_type") or "")
+        )
+        digest.update(b"\0" + header.encode("utf-8") + b"\0")
+        digest.update(_payload_digest(part))
+    return digest.hexdigest()
+
+
+class _Backend(Protocol):
+    def get(self, key: str) -> RenderEntry | None: ...
+
+    def put(self, key: str, data: bytes, name: str) -> None: ...
+
+
+class MemoryCache:
+    """Thread-safe LRU bounded by the total size of the cached renders."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self.size = 0
+        self._entries: OrderedDict[str, RenderEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> RenderEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, data: bytes, name: str) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = (data, name)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """SQLite-backed LRU bounded by total size, shared by all processes on a host."""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_DISK_SCHEMA)
+
+    def get(self, key: str) -> RenderEntry | None:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data, name FROM renders WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE renders SET used_at = (SELECT COALESCE(MAX(used_at), 0) + 1 "
+                "FROM renders) WHERE key = ?",
+                (key,),
+            )
+        return bytes(row[0]), row[1]
+
+    def put(self, key: str, data: bytes, name: str) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO renders (key, name, data, size, used_at) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(used_at), 0) + 1 FROM renders))",
+                (key, name, data, len(data)),
+            )
+            # Drop the least recently used renders beyond the size budget.
+            self._conn.execute(
+                "DELETE FROM renders WHERE key IN (SELECT key FROM ("
+                "SELECT key, SUM(size) OVER (ORDER BY used_at DESC) AS total FROM renders"
+                ") WHERE total > ?)",
+                (self.max_bytes,),
+            )
+
+
+_memory: MemoryCache | None = None
+_backend: _Backend | None = None
+_init_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "memory_hits": 0, "backend_hits": 0, "stores": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(*names: str) -> None:
+    with _stats_lock:
+        for name in names:
+            _stats[name] += 1
+
+
+def _tiers() -> tuple[MemoryCache, _Backend | None]:
+    global _memory, _backend
+    with _init_lock:
+        if _memory is None:
+            _memory = MemoryCache(settings.render_cache_max_bytes)
+            kind = settings.render_cache_backend
+            if kind == "disk":
+                _backend = DiskCache(
+                    settings.render_cache_path, settings.render_cache_disk_max_bytes
+                )
+            elif kind != "memory":
+                logger.warning("Unknown RENDER_CACHE_BACKEND %r; using memory", kind)
+        return _memory, _backend
+
+
+def enabled() -> bool:
+    return settings.render_cache_backend != "none"
+
+
+def get(key: str) -> RenderEntry | None:
+    """Return the cached render data and filename for ``key``, if any."""
+    if not enabled():
+        return None
+    memory, backend = _tiers()
+    entry = memory.get(key)
+    if entry is not None:
+        _count("hits", "memory_hits")
+        return entry
+    if backend is not None:
+        try:
+            entry = backend.get(key)
+        except Exception as exc:
+            logger.warning("Render cache lookup failed: %s", exc)
+            entry = None
+        if entry is not None:
+            memory.put(key, *entry)
+            _count("hits", "backend_hits")
+            return entry
+    _count("misses")
+    return None
+
+
+def put(key: str, data: bytes, name: str) -> None:
+    """Store a render in every configured tier; oversized renders are skipped."""
+    if not enabled():
+        return
+    memory, backend = _tiers()
+    memory.put(key, data, name)
+    if backend is not None:
+        try:
+            backend.put(key, data, name)
+        except Exception as exc:
+            logger.warning("Render cache store failed: %s", exc)
+    _count("stores")
+
+
+def stats() -> dict[str, float]:
+    """Return hit/miss counters plus the hit ratio and in-memory size."""
+    with _stats_lock:
+        result: dict[str, float] = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_ratio"] = result["hits"] / lookups if lookups else 0.0
+    result["memory_entries"] = len(_memory) if _memory is not None else 0
+    result["memory_bytes"] = _memory.size if _memory is not None else 0
+    return result
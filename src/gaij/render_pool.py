@@ -0,0 +1,156 @@
+"""Render e-mail HTML in worker processes, off the request threads.
+
+Rendering is CPU-bound Python, so it runs in a process pool instead of on
+the threads that talk to Gmail and Jira, and the issue is created without
+waiting for it.  Each worker caps how much memory it may allocate and every
+render runs under an interval timer, so pathological HTML fails that one
+render instead of stalling a worker.  Workers are started with
+``forkserver`` so they never inherit the parent's threads or locks.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import resource
+import signal
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from types import FrameType
+from typing import Any
+
+from .html_renderer import render_html
+from .logger_setup import logger
+from .png_writer import PngOptions
+
+RenderResult = tuple[bytes, str]
+
+# How long past the render timeout the parent waits before giving up on a
+# worker that did not honour its own timer (e.g. stuck inside C code).
+_WAIT_GRACE_SECONDS = 5.0
+# How often a waiter checks whether its render has left the queue.
+_START_POLL_SECONDS = 0.1
+
+_timeout = 0.0
+
+
+class RenderTimeoutError(Exception):
+    """A render ran longer than the configured timeout."""
+
+
+def _on_alarm(signum: int, frame: FrameType | None) -> None:
+    raise RenderTimeoutError(f"render exceeded {_timeout:g}s")
+
+
+def _address_space() -> int:
+    """Return the worker's current virtual size, or 0 where unknown."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _init_worker(timeout: float, memory_bytes: int) -> None:
+    global _timeout
+    _timeout = timeout
+    signal.signal(signal.SIGALRM, _on_alarm)
+    if memory_bytes > 0:
+        # The cap is headroom on top of what the interpreter already maps.
+        limit = _address_space() + memory_bytes
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as err:
+            logger.warning("Could not cap render worker memory: %s", err)
+
+
+def _render(
+    html: str, inline_parts: list[dict[str, Any]], fmt: str, png_options: PngOptions | None
+) -> RenderResult:
+    if _timeout > 0:
+        signal.setitimer(signal.ITIMER_REAL, _timeout)
+    try:
+        return render_html(html, inline_parts, fmt, png_options=png_options)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class RenderPool:
+    """Process pool for renders plus threads that hand finished ones back.
+
+    ``inline_parts`` passed to :meth:`submit` must be picklable, i.e. carry
+    their payload as ``data_bytes``.
+    """
+
+    def __init__(self, processes: int, timeout: float, memory_bytes: int) -> None:
+        self.processes = processes
+        self.timeout = timeout
+        self.memory_bytes = memory_bytes
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self._waiters = ThreadPoolExecutor(
+            max_workers=processes, thread_name_prefix="gaij-render"
+        )
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+            initargs=(self.timeout, self.memory_bytes),
+        )
+
+    def submit(
+        self,
+        html: str,
+        inline_parts: list[dict[str, Any]],
+        fmt: str,
+        png_options: PngOptions | None = None,
+    ) -> Future[RenderResult]:
+        """Start rendering and return its future."""
+        args = (html, inline_parts, fmt, png_options)
+        with self._lock:
+            try:
+                return self._executor.submit(_render, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool.
+                logger.warning("Render pool was broken; restarting it")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                return self._executor.submit(_render, *args)
+
+    def when_done(
+        self, job: Future[RenderResult], callback: Callable[[RenderResult], None]
+    ) -> Future[None]:
+        """Call ``callback`` with the render once ``job`` finishes.
+
+        The callback runs on a waiter thread.  Failed and timed-out renders
+        are logged and dropped; the parent-side timeout only starts once a
+        worker has picked the render up.
+        """
+        return self._waiters.submit(self._finish, job, callback)
+
+    def _run_deadline(self) -> float | None:
+        if self.timeout <= 0:
+            return None
+        # The executor marks a job running once it is queued for a worker,
+        # which can be up to one render before the job actually starts.
+        return 2 * self.timeout + _WAIT_GRACE_SECONDS
+
+    def _finish(self, job: Future[RenderResult], callback: Callable[[RenderResult], None]) -> None:
+        try:
+            # Time spent waiting behind other renders does not count.
+            while not (job.running() or job.done()):
+                wait([job], timeout=_START_POLL_SECONDS)
+            result = job.result(timeout=self._run_deadline())
+        except Exception as err:
+            job.cancel()
+            logger.warning("HTML render failed: %s: %s", type(err).__name__, err)
+            return
+        callback(result)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._waiters.shutdown(wait=wait)
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
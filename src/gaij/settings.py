@@ -50,6 +50,24 @@ def _load_allowed_senders_json() -> list[str]:
     return []
 
 
+def _load_classifier_rules_json() -> list[dict[str, str]]:
+    try:
+        raw = json.loads(os.getenv("CLASSIFIER_RULES_JSON", "[]"))
+    except json.JSONDecodeError:
+        logger.error(
+            "Failed to decode CLASSIFIER_RULES_JSON; defaulting to empty list"
+        )
+        return []
+
+    if isinstance(raw, list):
+        return [item for item in raw if isinstance(item, dict)]
+
+    logger.error(
+        "CLASSIFIER_RULES_JSON is not a JSON array; defaulting to empty list"
+    )
+    return []
+
+
 @dataclass
 class Settings:
     jira_url: str = require_env("JIRA_URL")
@@ -58,10 +76,27 @@ class Settings:
     jira_api_token: str = require_env("JIRA_API_TOKEN")
     jira_client_field_id: str = require_env("JIRA_CLIENT_FIELD_ID")
     jira_assignee: str | None = os.getenv("JIRA_ASSIGNEE")
+    jira_timeout_seconds: float = float(os.getenv("JIRA_TIMEOUT_SECONDS", "10"))
+    jira_connect_timeout_seconds: float = float(os.getenv("JIRA_CONNECT_TIMEOUT_SECONDS", "5"))
+    jira_pool_connections: int = int(os.getenv("JIRA_POOL_CONNECTIONS", "4"))
+    jira_pool_maxsize: int = int(os.getenv("JIRA_POOL_MAXSIZE", "16"))
+    jira_max_retries: int = int(os.getenv("JIRA_MAX_RETRIES", "3"))
+    jira_backoff_seconds: float = float(os.getenv("JIRA_BACKOFF_SECONDS", "0.5"))
+    jira_backoff_max_seconds: float = float(os.getenv("JIRA_BACKOFF_MAX_SECONDS", "30"))
 
     gmail_token_file_path: str = os.getenv("GMAIL_TOKEN_FILE_PATH", "/workspace/token.json")
     gmail_token_file: str | None = os.getenv("GMAIL_TOKEN_FILE")
     gmail_user_id: str = os.getenv("GMAIL_USER_ID", "me")
+    gmail_watch_label: str = os.getenv("GMAIL_WATCH_LABEL", "INBOX")
+    gap_recovery_max_days: float = float(os.getenv("GAP_RECOVERY_MAX_DAYS", "7"))
+    gap_recovery_slices: int = int(os.getenv("GAP_RECOVERY_SLICES", "4"))
+    gmail_download_concurrency: int = int(os.getenv("GMAIL_DOWNLOAD_CONCURRENCY", "4"))
+    gmail_batch_downloads: bool = os.getenv("GMAIL_BATCH_DOWNLOADS", "true").lower() == "true"
+    gmail_batch_max_bytes: int = int(
+        os.getenv("GMAIL_BATCH_MAX_BYTES", str(16 * 1024 * 1024))
+    )
+    gmail_prefetch: bool = os.getenv("GMAIL_PREFETCH", "true").lower() == "true"
+    gmail_prefetch_chunk: int = int(os.getenv("GMAIL_PREFETCH_CHUNK", "50"))
 
     domain_to_client_json: dict[str, str] = field(
         default_factory=_load_domain_to_client_json
@@ -76,6 +111,10 @@ class Settings:
     gcp_project_id: str | None = os.getenv("GCP_PROJECT_ID")
     gcp_firestore_collection: str = os.getenv("GCP_FIRESTORE_COLLECTION", "gaij_state")
     pubsub_topic: str | None = os.getenv("PUBSUB_TOPIC")
+    processed_retention_days: float = float(os.getenv("PROCESSED_RETENTION_DAYS", "30"))
+    state_flush_mode: str = os.getenv("STATE_FLUSH_MODE", "message")
+    claim_lease_seconds: float = float(os.getenv("CLAIM_LEASE_SECONDS", "300"))
+    processed_cache_size: int = int(os.getenv("PROCESSED_CACHE_SIZE", "10000"))
 
     jira_max_attachment_bytes: int = int(
         os.getenv("JIRA_MAX_ATTACHMENT_BYTES", str(10 * 1024 * 1024))
@@ -88,6 +127,13 @@ class Settings:
             )
         )
     )
+    attachment_spool_bytes: int = int(os.getenv("ATTACHMENT_SPOOL_BYTES", str(512 * 1024)))
+    attachment_spool_dir: str | None = os.getenv("ATTACHMENT_SPOOL_DIR") or None
+    jira_single_pass_description: bool = (
+        os.getenv("JIRA_SINGLE_PASS_DESCRIPTION", "true").lower() == "true"
+    )
+    jira_upload_concurrency: int = int(os.getenv("JIRA_UPLOAD_CONCURRENCY", "4"))
+    jira_upload_batch_size: int = int(os.getenv("JIRA_UPLOAD_BATCH_SIZE", "1"))
     attachment_upload_enabled: bool = (
         os.getenv("ATTACHMENT_UPLOAD_ENABLED", "true").lower() == "true"
     )
@@ -99,9 +145,57 @@ class Settings:
         os.getenv("PRESERVE_HTML_RENDER", "true").lower() == "true"
     )
     html_render_format: str = os.getenv("HTML_RENDER_FORMAT", "pdf")
+    html_render_processes: int = int(os.getenv("HTML_RENDER_PROCESSES", "2"))
+    html_render_timeout_seconds: float = float(os.getenv("HTML_RENDER_TIMEOUT_SECONDS", "30"))
+    html_render_memory_mb: int = int(os.getenv("HTML_RENDER_MEMORY_MB", "512"))
+    html_render_png_dpi: int = int(os.getenv("HTML_RENDER_PNG_DPI", "96"))
+    html_render_png_columns: int = int(os.getenv("HTML_RENDER_PNG_COLUMNS", "100"))
+    html_render_png_max_height: int = int(os.getenv("HTML_RENDER_PNG_MAX_HEIGHT", "16384"))
+    html_render_png_max_bytes: int = int(
+        os.getenv("HTML_RENDER_PNG_MAX_BYTES", str(2 * 1024 * 1024))
+    )
+    render_cache_backend: str = os.getenv("RENDER_CACHE_BACKEND", "memory")
+    render_cache_max_bytes: int = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    render_cache_disk_max_bytes: int = int(
+        os.getenv("RENDER_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))
+    )
+    render_cache_path: str = os.getenv(
+        "RENDER_CACHE_PATH", "/tmp/gaij-render-cache.sqlite3"  # nosec B108
+    )
+
+    message_concurrency: int = int(os.getenv("MESSAGE_CONCURRENCY", "1"))
+
+    pubsub_async_mode: bool = os.getenv("PUBSUB_ASYNC_MODE", "false").lower() == "true"
+    work_queue_path: str = os.getenv("WORK_QUEUE_PATH", "/tmp/gaij-work-queue.sqlite3")  # nosec B108
+    work_queue_consumers: int = int(os.getenv("WORK_QUEUE_CONSUMERS", "1"))
+    work_queue_lease_seconds: float = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "900"))
 
     openai_api_key: str = require_env("OPENAI_API_KEY")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4")
+    openai_body_token_budget: int = int(os.getenv("OPENAI_BODY_TOKEN_BUDGET", "1500"))
+    classifier_rules_json: list[dict[str, str]] = field(
+        default_factory=_load_classifier_rules_json
+    )
+    classifier_model_enabled: bool = (
+        os.getenv("CLASSIFIER_MODEL_ENABLED", "false").lower() == "true"
+    )
+    classifier_model_path: str = os.getenv(
+        "CLASSIFIER_MODEL_PATH", "/tmp/gaij-classifier.sqlite3"  # nosec B108
+    )
+    classifier_min_confidence: float = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+    classifier_min_training_examples: int = int(
+        os.getenv("CLASSIFIER_MIN_TRAINING_EXAMPLES", "50")
+    )
+    classification_cache_backend: str = os.getenv("CLASSIFICATION_CACHE_BACKEND", "memory")
+    classification_cache_ttl_seconds: float = float(
+        os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+    )
+    classification_cache_max_entries: int = int(
+        os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "1024")
+    )
+    classification_cache_path: str = os.getenv(
+        "CLASSIFICATION_CACHE_PATH", "/tmp/gaij-classification-cache.sqlite3"  # nosec B108
+    )
     email_sender: str | None = os.getenv("EMAIL_SENDER")
 
 
@@ -0,0 +1,208 @@
+"""Durable local queue of Gmail history ranges for asynchronous processing.
+
+Each entry is a half-open history range ``(start, end]``: ``start`` is the
+last history ID already covered and ``end`` is the ``historyId`` from a Pub/Sub
+push.  Pending ranges that overlap or touch are merged on insert, so a burst
+of pushes collapses into a single listing.  The queue lives in SQLite so it
+survives worker restarts and can be shared by all gunicorn workers on a host.
+"""
+
+from __future__ import annotations
+
+import random
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from .logger_setup import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_id INTEGER NOT NULL,
+    end_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    leased_until REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_MAX_RETRY_DELAY = 60.0
+
+
+@dataclass(frozen=True)
+class HistoryRange:
+    id: int
+    start: int
+    end: int
+    attempts: int
+
+
+class HistoryQueue:
+    """SQLite-backed queue of pending history ranges."""
+
+    def __init__(self, path: str, lease_seconds: float = 900.0) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def watermark(self) -> int | None:
+        """Return the highest history ID ever enqueued, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'watermark'"
+            ).fetchone()
+        return int(row[0]) if row else None
+
+    def enqueue(self, start: int, end: int) -> bool:
+        """Queue ``(start, end]``, merging it with touching pending ranges.
+
+        ``start`` is raised to the current watermark so repeated pushes never
+        list the same history twice.  Returns ``False`` if nothing new remains.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+            if row:
+                start = max(start, int(row[0]))
+            if end <= start:
+                return False
+            rows = conn.execute(
+                "SELECT id, start_id, end_id, attempts, available_at FROM ranges "
+                "WHERE start_id <= ? AND end_id >= ? "
+                "AND (leased_until IS NULL OR leased_until < ?)",
+                (end, start, now),
+            ).fetchall()
+            attempts, available_at = 0, 0.0
+            for rid, r_start, r_end, r_attempts, r_available in rows:
+                start, end = min(start, r_start), max(end, r_end)
+                attempts = max(attempts, r_attempts)
+                available_at = max(available_at, r_available)
+                conn.execute("DELETE FROM ranges WHERE id = ?", (rid,))
+            conn.execute(
+                "INSERT INTO ranges (start_id, end_id, attempts, available_at) "
+                "VALUES (?, ?, ?, ?)",
+                (start, end, attempts, available_at),
+            )
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('watermark', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+                (end,),
+            )
+        self.wake()
+        return True
+
+    def lease(self) -> HistoryRange | None:
+        """Lease the oldest available range, or return ``None`` if idle."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, start_id, end_id, attempts FROM ranges "
+                "WHERE available_at <= ? AND (leased_until IS NULL OR leased_until < ?) "
+                "ORDER BY start_id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE ranges SET leased_until = ? WHERE id = ?",
+                (now + self.lease_seconds, row[0]),
+            )
+        return HistoryRange(*row)
+
+    def complete(self, item: HistoryRange) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM ranges WHERE id = ?", (item.id,))
+
+    def release(self, item: HistoryRange) -> None:
+        """Return a failed range to the queue with jittered backoff."""
+        delay = min(_MAX_RETRY_DELAY, 2.0**item.attempts) * random.uniform(0.5, 1.0)  # nosec B311
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE ranges SET leased_until = NULL, attempts = attempts + 1, "
+                "available_at = ? WHERE id = ?",
+                (time.time() + delay, item.id),
+            )
+
+    def checkpoint_for(self, item: HistoryRange) -> int:
+        """Return how far the checkpoint may move once ``item`` is done.
+
+        That is ``item.end``, unless an earlier range is still queued, leased
+        or backing off: history from its start on is not processed yet.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(start_id) FROM ranges WHERE id != ? AND start_id < ?",
+                (item.id, item.end),
+            ).fetchone()
+        return item.end if row[0] is None else min(item.end, int(row[0]))
+
+    def pending(self) -> list[tuple[int, int]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start_id, end_id FROM ranges ORDER BY start_id"
+            ).fetchall()
+        return [(int(s), int(e)) for s, e in rows]
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def wait(self, timeout: float) -> None:
+        """Block until something is enqueued in this process or ``timeout``."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def run_consumer(
+    queue: HistoryQueue,
+    handler: Callable[[int, int, int], bool],
+    stop: threading.Event,
+    poll_interval: float = 5.0,
+) -> None:
+    """Drain ``queue`` with ``handler(start, end, checkpoint)`` until ``stop`` is set.
+
+    ``checkpoint`` is the history ID the handler may advance the checkpoint
+    to on success (see :meth:`HistoryQueue.checkpoint_for`).
+    """
+    while not stop.is_set():
+        item = queue.lease()
+        if item is None:
+            queue.wait(poll_interval)
+            continue
+        try:
+            ok = handler(item.start, item.end, queue.checkpoint_for(item))
+        except Exception as exc:
+            logger.error("Error handling history range %s-%s: %s", item.start, item.end, exc)
+            ok = False
+        if ok:
+            queue.complete(item)
+        else:
+            queue.release(item)
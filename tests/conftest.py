@@ -1,5 +1,6 @@
 import base64
 import importlib
+import itertools
 import json
 import os
 import sys
@@ -14,28 +15,62 @@ from google.cloud import firestore as firestore_mod
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
 
 
+class FakeStore(dict):
+    """Document data by path, plus a per-document update time."""
+
+    def __init__(self):
+        super().__init__()
+        self.update_times = {}
+        self._clock = itertools.count(1)
+
+    def touch(self, path):
+        self.update_times[path] = next(self._clock)
+        return SimpleNamespace(update_time=self.update_times[path])
+
+
 class FakeDocument:
     def __init__(self, store, path):
         self.store = store
         self.path = path
 
+    def _check(self, option):
+        if option is None:
+            return
+        if self.path not in self.store:
+            raise gcloud_exceptions.NotFound("No document to update")
+        if self.store.update_times.get(self.path) != option.last_update_time:
+            raise gcloud_exceptions.FailedPrecondition("Document was modified")
+
     def get(self):
         data = self.store.get(self.path)
         return SimpleNamespace(
             exists=data is not None,
             to_dict=lambda: data or {},
+            update_time=self.store.update_times.get(self.path),
         )
 
     def set(self, data):
         self.store[self.path] = data
+        return self.store.touch(self.path)
 
     def create(self, data):
         if self.path in self.store:
             raise gcloud_exceptions.AlreadyExists("Document already exists")
         self.store[self.path] = data
+        return self.store.touch(self.path)
+
+    def update(self, data, option=None):
+        if self.path not in self.store:
+            raise gcloud_exceptions.NotFound("No document to update")
+        self._check(option)
+        self.store[self.path] = {**self.store[self.path], **data}
+        return self.store.touch(self.path)
 
-    def delete(self):
+    def delete(self, option=None):
+        if self.path in self.store:
+            self._check(option)
         self.store.pop(self.path, None)
+        self.store.update_times.pop(self.path, None)
 
     def collection(self, name):
         return FakeCollection(self.store, f"{self.path}/{name}")
@@ -50,13 +85,51 @@ class FakeCollection:
         return FakeDocument(self.store, f"{self.path}/{name}")
 
 
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data, None))
+
+    def update(self, ref, data, option=None):
+        self.writes.append((ref, data, option or SimpleNamespace(last_update_time=None)))
+
+    def create(self, ref, data):
+        self.writes.append((ref, data, "create"))
+
+    def commit(self):
+        self.client.commits.append(len(self.writes))
+        # Commits are atomic: check every precondition before writing.
+        for ref, _, option in self.writes:
+            if option == "create":
+                if ref.path in ref.store:
+                    raise gcloud_exceptions.AlreadyExists("Document already exists")
+            elif option is not None and option.last_update_time is not None:
+                ref._check(option)
+        for ref, data, option in self.writes:
+            if option is None or option == "create":
+                ref.set(data)
+            else:
+                ref.update(data, option if option.last_update_time is not None else None)
+
+
 class FakeFirestoreClient:
     def __init__(self, project=None):
-        self.store = {}
+        self.store = FakeStore()
+        self.commits = []
 
     def collection(self, name):
         return FakeCollection(self.store, name)
 
+    def batch(self):
+        return FakeBatch(self)
+
+    @staticmethod
+    def write_option(**kwargs):
+        return SimpleNamespace(**kwargs)
+
 
 @pytest.fixture
 def firestore_state_module(monkeypatch):
@@ -85,6 +158,8 @@ def firestore_state_module(monkeypatch):
     monkeypatch.setenv("ATTACH_INLINE_IMAGES", "true")
     monkeypatch.setenv("PRESERVE_HTML_RENDER", "true")
     monkeypatch.setenv("HTML_RENDER_FORMAT", "pdf")
+    monkeypatch.setenv("GMAIL_PREFETCH", "false")
+    monkeypatch.setenv("HTML_RENDER_PROCESSES", "0")
     import gaij.firestore_state as firestore_state
     import gaij.settings as settings
     importlib.reload(settings)
@@ -93,7 +168,7 @@ def firestore_state_module(monkeypatch):
 
 
 @pytest.fixture
-def app_setup(monkeypatch, firestore_state_module):
+def app_setup(monkeypatch, tmp_path, firestore_state_module):
     """Set up application modules with fakes and return references."""
     monkeypatch.setenv("JIRA_URL", "https://example.atlassian.net")
     monkeypatch.setenv("JIRA_USER", "user@example.com")
@@ -119,8 +194,11 @@ def app_setup(monkeypatch, firestore_state_module):
     monkeypatch.setenv("ATTACH_INLINE_IMAGES", "true")
     monkeypatch.setenv("PRESERVE_HTML_RENDER", "true")
     monkeypatch.setenv("HTML_RENDER_FORMAT", "pdf")
+    monkeypatch.setenv("GMAIL_PREFETCH", "false")
+    monkeypatch.setenv("HTML_RENDER_PROCESSES", "0")
     domain_map = {"oetraining.com": "OETraining"}
     monkeypatch.setenv("DOMAIN_TO_CLIENT_JSON", json.dumps(domain_map))
+    monkeypatch.setenv("CLASSIFIER_MODEL_PATH", str(tmp_path / "classifier.sqlite3"))
 
     token_path = os.path.join(
         os.path.dirname(os.path.dirname(__file__)), "token.json"
@@ -132,14 +210,33 @@ def app_setup(monkeypatch, firestore_state_module):
     import gaij.settings as settings
     importlib.reload(settings)
     import gaij.app as app
+    import gaij.classification_cache as classification_cache
+    import gaij.classifier as classifier
     import gaij.gmail_client as gmail_client
     import gaij.gpt_agent as gpt_agent
     import gaij.jira_client as jira_client
+    import gaij.jira_http as jira_http
+    import gaij.render_cache as render_cache
     importlib.reload(gmail_client)
+    importlib.reload(jira_http)
     importlib.reload(jira_client)
+    importlib.reload(classification_cache)
+    importlib.reload(render_cache)
     importlib.reload(gpt_agent)
+    importlib.reload(classifier)
     importlib.reload(app)
-    gmail_client._service = None
+    gmail_client._pool = None
+    # Tests stub ``get_message``; derive the metadata fetch from it.
+    monkeypatch.setattr(
+        gmail_client,
+        "get_message_metadata",
+        lambda mid: {"id": mid}
+        | {
+            key: value
+            for key, value in gmail_client.get_message(mid).items()
+            if key in ("from", "subject", "message_id")
+        },
+    )
 
     client = app.app.test_client()
     return {
@@ -17,9 +17,9 @@ def test_extract_history_id_edge_cases(app_setup):
 def test_handle_new_messages_failure(app_setup, monkeypatch):
     app = app_setup["app"]
     # Simulate one message that raises during processing
-    monkeypatch.setattr(app.gmail_client, "list_new_message_ids_since", lambda a, b: ["1"])
+    monkeypatch.setattr(app.gmail_client, "list_new_message_ids_since", lambda a, b, **kw: ["1"])
 
-    def boom(mid: str) -> None:
+    def boom(mid: str, writer=None) -> None:
         raise RuntimeError("boom")
 
     monkeypatch.setattr(app, "process_message", boom)
@@ -31,3 +31,25 @@ def test_handle_new_messages_failure(app_setup, monkeypatch):
     monkeypatch.setattr(app.firestore_state, "set_last_history_id", fake_set)
     app.handle_new_messages(1, 2)
     assert called["set"] is False
+
+
+def test_handle_new_messages_pool_failure_keeps_history(app_setup, monkeypatch):
+    app = app_setup["app"]
+    monkeypatch.setattr(app.settings, "message_concurrency", 4)
+    ids = [str(i) for i in range(10)]
+    monkeypatch.setattr(app.gmail_client, "list_new_message_ids_since", lambda a, b, **kw: iter(ids))
+    processed = []
+
+    def flaky(mid: str, writer=None) -> None:
+        processed.append(mid)
+        if mid == "7":
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(app, "process_message", flaky)
+    called = {"set": False}
+    monkeypatch.setattr(
+        app.firestore_state, "set_last_history_id", lambda h: called.__setitem__("set", True)
+    )
+    assert app.handle_new_messages(1, 2) is False
+    assert sorted(processed) == sorted(ids)
+    assert called["set"] is False
@@ -46,8 +46,8 @@ def test_attachment_filters_and_limits(app_setup, monkeypatch):
 
     uploaded = []
 
-    def fake_post(url, auth=None, headers=None, files=None, timeout=None):
-        name = files["file"][0]
+    def fake_post(url, auth=None, headers=None, data=None, timeout=None):
+        name = data.filenames[0]
         uploaded.append(name)
         idx = len(uploaded)
         class R:
@@ -57,7 +57,7 @@ def test_attachment_filters_and_limits(app_setup, monkeypatch):
                 return [{"id": str(idx)}]
         return R()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     desc = {}
     monkeypatch.setattr(jira_client, "update_issue_description", lambda k, a: desc.setdefault("adf", a))
 
@@ -0,0 +1,112 @@
+import time
+from types import SimpleNamespace
+
+
+def _fake_openai(calls, content='{"issueType": "Bug", "client": "ALA"}'):
+    def create(**kw):
+        calls.append(kw)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_cache_key_normalizes_content(app_setup):
+    cache_key = app_setup["gpt_agent"].classification_cache.cache_key
+
+    base = cache_key("Printer down", "It  is\n broken", "gpt-4")
+    assert cache_key("RE: Fwd:  printer DOWN ", "it is broken", "gpt-4") == base
+    assert cache_key("Printer down", "It is broken", "gpt-4o") != base
+    assert cache_key("Printer down", "It is fixed", "gpt-4") != base
+
+
+def test_gpt_classification_is_cached(app_setup, monkeypatch):
+    gpt_agent = app_setup["gpt_agent"]
+    cache = gpt_agent.classification_cache
+    calls = []
+    monkeypatch.setattr(gpt_agent, "_get_client", lambda: _fake_openai(calls))
+
+    first = gpt_agent.gpt_classify_issue("Subject", "Body")
+    first["issueType"] = "mutated"
+    second = gpt_agent.gpt_classify_issue("Re: subject", "body")
+    assert second == {"issueType": "Bug", "client": "ALA"}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+    resp = app_setup["client"].get("/stats")
+    assert resp.get_json()["classification_cache"]["hits"] == 1
+
+
+def test_failures_are_not_cached(app_setup, monkeypatch):
+    gpt_agent = app_setup["gpt_agent"]
+    calls = []
+    monkeypatch.setattr(gpt_agent, "_get_client", lambda: _fake_openai(calls, "not json"))
+    assert gpt_agent.gpt_classify_issue("S", "B") is None
+    assert gpt_agent.gpt_classify_issue("S", "B") is None
+    assert len(calls) == 2
+
+
+def test_memory_lru_bounds_and_ttl(app_setup, monkeypatch):
+    MemoryCache = app_setup["gpt_agent"].classification_cache.MemoryCache  # noqa: N806
+
+    cache = MemoryCache(2)
+    cache.put("a", {"v": 1}, 60)
+    cache.put("b", {"v": 2}, 60)
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3}, 60)
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get("a") is None
+
+
+def test_disk_backend_shared_between_instances(app_setup, tmp_path):
+    DiskCache = app_setup["gpt_agent"].classification_cache.DiskCache  # noqa: N806
+
+    path = str(tmp_path / "cache.sqlite3")
+    writer = DiskCache(path, 2)
+    writer.put("a", {"issueType": "Task"}, 60)
+    writer.put("b", {"issueType": "Bug"}, 60)
+    reader = DiskCache(path, 2)
+    assert reader.get("a") == {"issueType": "Task"}
+    writer.put("c", {"issueType": "Story"}, 60)
+    assert reader.get("b") is None
+    assert reader.get("a") is not None
+    writer.put("d", {"issueType": "Story"}, -1)
+    assert reader.get("d") is None
+
+
+def test_firestore_backend(app_setup, monkeypatch):
+    gpt_agent = app_setup["gpt_agent"]
+    cache = gpt_agent.classification_cache
+    monkeypatch.setattr(cache.settings, "classification_cache_backend", "firestore")
+    calls = []
+    monkeypatch.setattr(gpt_agent, "_get_client", lambda: _fake_openai(calls))
+
+    gpt_agent.gpt_classify_issue("Subject", "Body")
+    # A fresh in-process tier, as on another instance, is filled from Firestore.
+    monkeypatch.setattr(cache, "_memory", None)
+    monkeypatch.setattr(cache, "_backend", None)
+    assert gpt_agent.gpt_classify_issue("Subject", "Body")["client"] == "ALA"
+    assert len(calls) == 1
+    assert cache.stats()["backend_hits"] == 1
+
+    key = cache.cache_key("Old", "Body", cache.settings.openai_model)
+    past = cache.datetime.fromtimestamp(0, cache.UTC)
+    app_setup["firestore_state"].set_cached_classification(key, {"client": "x"}, past)
+    assert app_setup["firestore_state"].get_cached_classification(key) is None
+
+
+def test_cache_disabled(app_setup, monkeypatch):
+    gpt_agent = app_setup["gpt_agent"]
+    monkeypatch.setattr(gpt_agent.settings, "classification_cache_backend", "none")
+    calls = []
+    monkeypatch.setattr(gpt_agent, "_get_client", lambda: _fake_openai(calls))
+    gpt_agent.gpt_classify_issue("S", "B")
+    gpt_agent.gpt_classify_issue("S", "B")
+    assert len(calls) == 2
@@ -0,0 +1,190 @@
+import random
+
+
+def _rules(monkeypatch, app_setup, rules):
+    classifier = app_setup["app"].classifier
+    monkeypatch.setattr(classifier.settings, "classifier_rules_json", rules)
+    monkeypatch.setattr(classifier, "_rules", None)
+    return classifier
+
+
+def _count_gpt(monkeypatch, app_setup, result):
+    calls = []
+
+    def fake(subject, body):
+        calls.append(subject)
+        return result
+
+    monkeypatch.setattr(app_setup["gpt_agent"], "gpt_classify_issue", fake)
+    return calls
+
+
+def test_rules_settle_both_fields_without_gpt(app_setup, monkeypatch):
+    classifier = _rules(
+        monkeypatch,
+        app_setup,
+        [
+            {"field": "issueType", "match": "subject", "pattern": r"\berror\b", "value": "Bug"},
+            {"field": "client", "match": "sender", "pattern": "x@y", "value": "Ignored"},
+            {"field": "bogus", "pattern": ".", "value": "x"},
+            {"field": "issueType", "pattern": "(", "value": "x"},
+        ],
+    )
+    calls = _count_gpt(monkeypatch, app_setup, {"issueType": "Task", "client": "ALA"})
+
+    result = classifier.classify("Login ERROR again", "body", "marisa@oetraining.com")
+    assert (result.issue_type, result.client) == ("Bug", "OETraining")
+    assert calls == []
+
+    result = classifier.classify("Question", "body", "marisa@oetraining.com")
+    assert (result.issue_type, result.client) == ("Task", "OETraining")
+    assert result.decisions["client"].tier == "rules"
+    assert result.decisions["issueType"].tier == "gpt"
+    assert len(calls) == 1
+
+    report = classifier.tier_report()
+    assert report["gpt_calls_avoided"] == 1
+    assert report["gpt_calls"] == 1
+    assert report["issueType.rules"] == 1
+    assert report["gpt_avoided_ratio"] == 0.5
+    stats = app_setup["client"].get("/stats").get_json()
+    assert stats["classifier"]["messages"] == 2
+
+
+def test_domain_map_matches_whole_domain_only(app_setup, monkeypatch):
+    classifier = _rules(monkeypatch, app_setup, [])
+    _count_gpt(monkeypatch, app_setup, {"issueType": "Task", "client": "N/A"})
+
+    assert classifier.classify("S", "B", "marisa@OETraining.com").client == "OETraining"
+    for sender in ("x@notoetraining.com", "x@evil.oetraining.com"):
+        result = classifier.classify("S", "B", sender)
+        assert result.client == "N/A"
+        assert result.decisions["client"].tier == "gpt"
+
+
+def test_gpt_failure_falls_back_to_defaults(app_setup, monkeypatch):
+    classifier = app_setup["app"].classifier
+    _count_gpt(monkeypatch, app_setup, None)
+    result = classifier.classify("S", "B", "someone@unknown.org")
+    assert (result.issue_type, result.client) == ("Task", "N/A")
+    assert {d.tier for d in result.decisions.values()} == {"default"}
+
+
+def _enable_model(monkeypatch, app_setup, min_examples):
+    classifier = app_setup["app"].classifier
+    monkeypatch.setattr(classifier.settings, "classifier_model_enabled", True)
+    monkeypatch.setattr(classifier.settings, "classifier_min_training_examples", min_examples)
+    monkeypatch.setattr(classifier, "_MIN_CHECKS", 10)
+    return classifier
+
+
+def _label_by_subject(monkeypatch, app_setup):
+    labels = {"Crash": {"issueType": "Bug", "client": "ALA"}}
+    other = {"issueType": "Task", "client": "CFA"}
+    calls = []
+
+    def fake(subject, body):
+        calls.append(subject)
+        return labels.get(subject.split()[0], other)
+
+    monkeypatch.setattr(app_setup["gpt_agent"], "gpt_classify_issue", fake)
+    return calls
+
+
+def test_model_tier_is_disabled_by_default(app_setup):
+    classifier = app_setup["app"].classifier
+    assert classifier._get_model() is None
+
+
+def test_model_tier_learns_from_created_tickets(app_setup, monkeypatch):
+    classifier = _enable_model(monkeypatch, app_setup, 4)
+    calls = _label_by_subject(monkeypatch, app_setup)
+
+    for i in range(2):
+        classifier.learn(classifier.classify(f"Crash {i}", "app crashes on login", "a@ala.org"))
+        classifier.learn(classifier.classify(f"Invoice {i}", "please send invoice", "b@cfa.org"))
+    # Enough examples, but too few held-out predictions: GPT still decides.
+    assert len(calls) == 4
+    assert classifier._get_model().accuracy("issueType")[0] < 10
+
+    for i in range(2, 8):
+        classifier.learn(classifier.classify(f"Crash {i}", "app crashes on login", "a@ala.org"))
+        classifier.learn(classifier.classify(f"Invoice {i}", "please send invoice", "b@cfa.org"))
+    checked, accuracy = classifier._get_model().accuracy("issueType")
+    assert checked >= 10 and accuracy >= 0.9
+
+    calls.clear()
+    result = classifier.classify("Crash again", "the app crashes on login", "a@ala.org")
+    assert (result.issue_type, result.client) == ("Bug", "ALA")
+    assert result.decisions["issueType"].tier == "model"
+    assert result.decisions["issueType"].confidence >= 0.9
+    assert calls == []
+
+    # Model decisions are not fed back into the model.
+    before = classifier._get_model().examples("issueType")
+    classifier.learn(result)
+    assert classifier._get_model().examples("issueType") == before
+
+    # Some decisions are still audited by GPT so the accuracy stays current.
+    monkeypatch.setattr(classifier, "_AUDIT_INTERVAL", 1)
+    result = classifier.classify("Crash again", "the app crashes on login", "a@ala.org")
+    assert result.decisions["issueType"].tier == "gpt"
+    classifier.learn(result)
+    assert classifier._get_model().accuracy("issueType")[0] == checked + 1
+
+    # The model is persisted and reloaded by a fresh process.
+    reloaded = classifier.NaiveBayesModel(classifier.settings.classifier_model_path)
+    assert reloaded.examples("client") == classifier._get_model().examples("client") > 4
+    assert reloaded.accuracy("issueType")[0] == checked + 1
+
+
+def test_model_never_trusts_random_labels(app_setup, monkeypatch):
+    classifier = _enable_model(monkeypatch, app_setup, 50)
+    rng = random.Random(1234)
+    words = [f"w{chr(97 + i)}{chr(97 + j)}" for i in range(26) for j in range(26)]
+
+    def email():
+        return " ".join(rng.choices(words, k=3)), " ".join(rng.choices(words, k=80))
+
+    def fake(subject, body):
+        return {"issueType": rng.choice(["Bug", "Task", "Story"]), "client": rng.choice("ABCD")}
+
+    monkeypatch.setattr(app_setup["gpt_agent"], "gpt_classify_issue", fake)
+    for _ in range(60):
+        classifier.learn(classifier.classify(*email(), "x@example.org"))
+
+    tiers = {
+        decision.tier
+        for _ in range(50)
+        for decision in classifier.classify(*email(), "x@example.org").decisions.values()
+    }
+    assert tiers == {"gpt"}
+    for fld in classifier.FIELDS:
+        checked, accuracy = classifier._get_model().accuracy(fld)
+        assert checked == 0 or accuracy < 0.9
+
+
+def test_process_message_trains_on_created_ticket(app_setup, monkeypatch):
+    app = app_setup["app"]
+    monkeypatch.setattr(app.settings, "preserve_html_render", False)
+    monkeypatch.setattr(app.settings, "classifier_model_enabled", True)
+    message = {
+        "from": "Marisa@oetraining.com",
+        "subject": "Sub",
+        "message_id": "<id1>",
+        "body_text": "Body",
+        "body_html": "<p>Body</p>",
+        "attachments": [],
+    }
+    monkeypatch.setattr(app_setup["gmail_client"], "get_message", lambda mid: message)
+    _count_gpt(monkeypatch, app_setup, {"issueType": "Story"})
+    created = []
+    monkeypatch.setattr(
+        app_setup["jira_client"],
+        "create_ticket",
+        lambda s, adf, client, **k: created.append((client, k["issue_type"])) or "J-1",
+    )
+    app.process_message("A1")
+    assert created == [("OETraining", "Story")]
+    assert app.classifier._get_model().examples("client") == 1
+    assert app.classifier.tier_report()["client.rules"] == 1
@@ -39,3 +39,53 @@ def test_concurrent_processing_creates_single_ticket(app_setup, monkeypatch):
     t2.join()
 
     assert created == ["JIRA-1"]
+
+
+def test_process_message_ids_runs_in_parallel(app_setup, monkeypatch):
+    app = app_setup["app"]
+    monkeypatch.setattr(app.settings, "message_concurrency", 3)
+    barrier = threading.Barrier(3, timeout=5)
+    seen = []
+
+    def fake_process(mid, writer=None):
+        # Deadlocks (and breaks the barrier) unless all three run at once.
+        barrier.wait()
+        seen.append(mid)
+
+    monkeypatch.setattr(app, "process_message", fake_process)
+    assert app.process_message_ids(iter(["1", "2", "3"])) is True
+    assert sorted(seen) == ["1", "2", "3"]
+
+
+def test_pool_dedupes_repeated_ids(app_setup, monkeypatch):
+    app = app_setup["app"]
+    jira_client = app_setup["jira_client"]
+    gmail_client = app_setup["gmail_client"]
+    gpt_agent = app_setup["gpt_agent"]
+    monkeypatch.setattr(app.settings, "message_concurrency", 4)
+
+    message = {
+        "from": "Marisa@oetraining.com",
+        "subject": "Sub",
+        "message_id": "<id1>",
+        "body_text": "Body",
+        "body_html": "<p>Body</p>",
+        "inline_map": {},
+        "inline_parts": [],
+        "attachments": [],
+    }
+    monkeypatch.setattr(gmail_client, "get_message", lambda mid: message)
+    monkeypatch.setattr(gpt_agent, "gpt_classify_issue", lambda s, b: {"issueType": "Task"})
+    monkeypatch.setattr(app.settings, "preserve_html_render", False)
+
+    created = []
+    lock = threading.Lock()
+
+    def fake_create(*a, **k):
+        with lock:
+            created.append("JIRA-1")
+        return "JIRA-1"
+
+    monkeypatch.setattr(jira_client, "create_ticket", fake_create)
+    assert app.process_message_ids(["A1"] * 6) is True
+    assert created == ["JIRA-1"]
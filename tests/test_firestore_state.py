@@ -6,13 +6,77 @@ def test_history_id_roundtrip(firestore_state_module):
     assert fs.get_last_history_id() == 100
 
 
-def test_mark_processed_prunes(firestore_state_module, monkeypatch):
+def test_history_id_never_moves_backwards(firestore_state_module):
+    fs = firestore_state_module
+    fs.set_last_history_id(300)
+    fs.set_last_history_id(200)  # an earlier range finishing late
+    assert fs.get_last_history_id() == 300
+
+    writer = fs.StateWriter()
+    writer.set_last_history_id(250)
+    assert writer.flush()
+    assert fs.get_last_history_id() == 300
+    fs.set_last_history_id(400)
+    assert fs.get_last_history_id() == 400
+
+
+def test_mark_processed_writes_per_message_markers(firestore_state_module):
     fs = firestore_state_module
-    monkeypatch.setattr(fs, "_MAX_STORED_IDS", 3)
     for i in range(5):
+        assert fs.claim_message(f"M{i}")
+        fs.mark_processed(f"M{i}")
+    store = fs._get_collection().store
+    assert "gaij_state/processed" not in store
+    marker = store["gaij_state/messages/ids/M4"]
+    assert marker["processed"] is True
+    assert marker["expire_at"] > marker["processed_at"]
+    assert all(fs.is_processed(f"M{i}") for i in range(5))
+    assert not fs.is_processed("M5")
+
+
+def test_is_processed_cache_avoids_reads(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    assert fs.claim_message("M1")
+    fs.mark_processed("M1")
+    # Simulate another instance marking M2.
+    fs._marker_doc("M2").set({"processed": True})
+    reads = []
+    original = fs._marker_doc
+
+    def counting(message_id):
+        reads.append(message_id)
+        return original(message_id)
+
+    monkeypatch.setattr(fs, "_marker_doc", counting)
+    assert fs.is_processed("M1")
+    assert fs.is_processed("M2")
+    assert fs.is_processed("M2")
+    assert reads == ["M2"]
+
+
+def test_expired_markers_are_ignored(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    monkeypatch.setattr(fs.settings, "processed_retention_days", -1)
+    assert fs.claim_message("OLD")
+    fs.mark_processed("OLD")
+    fs._processed_cache.clear()
+    assert not fs.is_processed("OLD")
+
+
+def test_processed_cache_is_bounded(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    monkeypatch.setattr(fs.settings, "processed_cache_size", 2)
+    for i in range(4):
+        assert fs.claim_message(f"M{i}")
         fs.mark_processed(f"M{i}")
-    assert fs.is_processed("M4")
-    assert not fs.is_processed("M0")
+    assert list(fs._processed_cache) == ["M2", "M3"]
+
+
+def test_legacy_processed_array_still_honoured(firestore_state_module):
+    fs = firestore_state_module
+    fs._processed_doc().set({"message_ids": ["LEGACY"]})
+    assert fs.is_processed("LEGACY")
+    assert not fs.is_processed("NEW")
 
 
 def test_get_last_history_id_invalid_value_warns(firestore_state_module, caplog):
@@ -29,3 +93,105 @@ def test_get_last_history_id_none_value_warns(firestore_state_module, caplog):
     with caplog.at_level("WARNING"):
         assert fs.get_last_history_id() is None
         assert "Invalid last_history_id value" in caplog.text
+
+
+def _marker(fs, message_id):
+    return fs._get_collection().store[f"gaij_state/messages/ids/{message_id}"]
+
+
+def test_claim_is_single_create_with_lease(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    fs._is_legacy_processed("warm")  # legacy array is read once per process
+    calls = []
+    original = fs._marker_doc
+
+    def tracking(message_id):
+        doc = original(message_id)
+        for name in ("get", "create", "update", "set"):
+            method = getattr(doc, name)
+            setattr(doc, name, lambda *a, _m=method, _n=name, **k: calls.append(_n) or _m(*a, **k))
+        return doc
+
+    monkeypatch.setattr(fs, "_marker_doc", tracking)
+    assert fs.claim_message("M1")
+    assert calls == ["create"]
+    data = _marker(fs, "M1")
+    assert data["state"] == "claimed"
+    assert data["owner"] == fs.OWNER_ID
+    assert data["lease_until"] > fs.datetime.now(fs.UTC)
+
+    assert not fs.claim_message("M1")
+    fs.mark_processed("M1")
+    assert _marker(fs, "M1")["state"] == "processed"
+    calls.clear()
+    assert not fs.claim_message("M1")
+    assert calls == []
+    assert "M1" not in fs._held
+
+
+def test_expired_lease_is_taken_over(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    monkeypatch.setattr(fs.settings, "claim_lease_seconds", -1)
+    assert fs.claim_message("M1")
+    first_owner_time = fs._held["M1"]
+    # Another worker sees the expired lease and takes it over.
+    fs._held.clear()
+    monkeypatch.setattr(fs.settings, "claim_lease_seconds", 300)
+    assert fs.claim_message("M1")
+    assert fs._held["M1"] != first_owner_time
+    assert not fs.claim_message("M1")
+
+    # The original owner's late unclaim must not delete the new claim.
+    fs._held["M1"] = first_owner_time
+    fs.unclaim_message("M1")
+    assert _marker(fs, "M1")["state"] == "claimed"
+
+
+def test_takeover_race_loses_on_precondition(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    monkeypatch.setattr(fs.settings, "claim_lease_seconds", -1)
+    assert fs.claim_message("M1")
+    fs._held.clear()
+    doc = fs._marker_doc("M1")
+    stale = doc.get()
+    doc.update({"owner": "someone-else"})  # a competing worker won
+    monkeypatch.setattr(doc, "get", lambda: stale)
+    monkeypatch.setattr(fs, "_marker_doc", lambda mid: doc)
+    assert not fs.claim_message("M1")
+
+
+def test_unclaim_releases_and_allows_retry(firestore_state_module):
+    fs = firestore_state_module
+    assert fs.claim_message("M1")
+    fs.unclaim_message("M1")
+    assert "gaij_state/messages/ids/M1" not in fs._get_collection().store
+    assert fs.claim_message("M1")
+
+
+def test_renew_leases_extends_and_detects_loss(firestore_state_module):
+    fs = firestore_state_module
+    assert fs.claim_message("M1")
+    assert fs.claim_message("M2")
+    before = _marker(fs, "M1")["lease_until"]
+    fs._marker_doc("M2").update({"owner": "thief"})
+    fs.renew_leases()
+    assert _marker(fs, "M1")["lease_until"] >= before
+    assert fs._held["M1"] == fs._get_collection().store.update_times[
+        "gaij_state/messages/ids/M1"
+    ]
+    assert "M2" not in fs._held
+    fs.unclaim_message("M2")
+    assert _marker(fs, "M2")["owner"] == "thief"
+
+
+def test_mark_processed_requires_the_held_lease(firestore_state_module):
+    fs = firestore_state_module
+    assert fs.claim_message("M1")
+    fs._marker_doc("M1").update({"owner": "thief"})  # another worker took over
+    fs.mark_processed("M1")
+    assert _marker(fs, "M1")["state"] == "claimed"
+    assert _marker(fs, "M1")["owner"] == "thief"
+    assert "M1" not in fs._processed_cache
+
+    fs.mark_processed("M2")  # never claimed
+    assert "gaij_state/messages/ids/M2" not in fs._get_collection().store
@@ -0,0 +1,113 @@
+import threading
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from googleapiclient.errors import HttpError
+
+
+class ExpiredHistory:
+    def users(self):
+        return self
+
+    def history(self):
+        return self
+
+    def list(self, **kwargs):
+        return self
+
+    def execute(self):
+        raise HttpError(SimpleNamespace(status=404, reason="Not Found"), b"")
+
+
+class MessageList:
+    def __init__(self):
+        self.queries = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, **kwargs):
+        self.queries.append(kwargs)
+        self.kwargs = kwargs
+        return self
+
+    def execute(self):
+        if self.kwargs.get("pageToken"):
+            return {"messages": [{"id": "shared"}]}
+        return {"messages": [{"id": self.kwargs["q"]}, {"id": "shared"}], "nextPageToken": "n"}
+
+
+def test_expired_history_raises_gap_error(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: ExpiredHistory())
+    with pytest.raises(gmail_client.HistoryGapError):
+        list(gmail_client.list_new_message_ids_since(1, 2))
+
+
+def test_scan_slices_window_and_dedupes(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    local = threading.local()
+    services = []
+
+    def service_for_thread():
+        if not hasattr(local, "service"):
+            local.service = MessageList()
+            local.service.thread = threading.current_thread().name
+            services.append(local.service)
+        return local.service
+
+    monkeypatch.setattr(gmail_client, "get_gmail_service", service_for_thread)
+    after = datetime(2024, 1, 1, tzinfo=UTC)
+
+    ids = list(gmail_client.scan_message_ids(after, after + timedelta(hours=4), slices=4))
+
+    start = int(after.timestamp())
+    slice_queries = [
+        f"after:{start + i * 3600 - 1} before:{start + (i + 1) * 3600 + 1}" for i in range(4)
+    ]
+    assert sorted(ids) == sorted([*slice_queries, "shared"])
+    queries = [q for s in services for q in s.queries]
+    assert {q["q"] for q in queries} == set(slice_queries)
+    assert all(q["labelIds"] == ["INBOX"] for q in queries)
+    # Each slice is listed on its worker thread's own service.
+    assert all(s.thread.startswith("gaij-scan") for s in services)
+
+
+def test_gap_triggers_scan_and_rebaseline(app_setup, monkeypatch):
+    app = app_setup["app"]
+    fs = app_setup["firestore_state"]
+    fs.set_last_history_id(5)
+    checkpoint = fs.get_checkpoint_time()
+    monkeypatch.setattr(app.gmail_client, "get_gmail_service", lambda: ExpiredHistory())
+    windows = []
+
+    def scan(after, before, slices):
+        windows.append((after, before))
+        return iter(["m1", "m2"])
+
+    monkeypatch.setattr(app.gmail_client, "scan_message_ids", scan)
+    processed = []
+    monkeypatch.setattr(
+        app, "_process_safely", lambda mid, writer=None: processed.append(mid) or True
+    )
+
+    assert app.handle_new_messages(5, 50) is True
+    assert sorted(processed) == ["m1", "m2"]
+    assert windows[0][0] == checkpoint - timedelta(hours=1)
+    assert fs.get_last_history_id() == 50
+
+
+def test_failed_gap_recovery_keeps_checkpoint(app_setup, monkeypatch):
+    app = app_setup["app"]
+    fs = app_setup["firestore_state"]
+    fs.set_last_history_id(5)
+    monkeypatch.setattr(app.gmail_client, "get_gmail_service", lambda: ExpiredHistory())
+    monkeypatch.setattr(app.gmail_client, "scan_message_ids", lambda a, b, slices: iter(["m1"]))
+    monkeypatch.setattr(app, "_process_safely", lambda mid, writer=None: False)
+
+    assert app.handle_new_messages(5, 50) is False
+    assert fs.get_last_history_id() == 5
@@ -0,0 +1,274 @@
+import base64
+import threading
+
+from gaij.payloads import read_payload
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+
+MESSAGE = {
+    "id": "M1",
+    "payload": {
+        "mimeType": "multipart/mixed",
+        "parts": [
+            {
+                "mimeType": "text/html",
+                "body": {"data": _b64(b"<p>Hi<img src='cid:logo'></p>")},
+            },
+            {
+                "filename": "a.pdf",
+                "mimeType": "application/pdf",
+                "body": {"attachmentId": "att-a"},
+            },
+            {
+                "filename": "logo.png",
+                "mimeType": "image/png",
+                "body": {"attachmentId": "att-logo"},
+                "headers": [{"name": "Content-ID", "value": "<logo>"}],
+            },
+            {
+                "filename": "c.pdf",
+                "mimeType": "application/pdf",
+                "body": {"attachmentId": "att-c"},
+            },
+        ],
+    },
+}
+
+
+class FakeRequest:
+    def __init__(self, attachment_id, calls):
+        self.attachment_id = attachment_id
+        self.calls = calls
+
+    def execute(self):
+        self.calls.append(self.attachment_id)
+        if self.attachment_id == "att-c":
+            raise RuntimeError("boom")
+        return {"data": _b64(self.attachment_id.encode())}
+
+
+class FakeService:
+    def __init__(self):
+        self.calls = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def attachments(self):
+        return self
+
+    def get(self, userId, messageId, id):  # noqa: N803
+        assert messageId == "M1"
+        return FakeRequest(id, self.calls)
+
+
+class FakeBatch:
+    def __init__(self, callback, service):
+        self.callback = callback
+        self.service = service
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batches += 1
+        for request_id, request in reversed(self.requests):
+            try:
+                self.callback(request_id, request.execute(), None)
+            except RuntimeError as exc:
+                self.callback(request_id, None, exc)
+
+
+class FakeBatchService(FakeService):
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback, self)
+
+
+def _summary(parts):
+    return [(p["filename"], read_payload(p), p["is_inline"], p["content_id"]) for p in parts]
+
+
+EXPECTED = [
+    ("a.pdf", b"att-a", False, None),
+    ("logo.png", b"att-logo", True, "logo"),
+    ("c.pdf", b"", False, None),
+]
+
+
+def test_collect_parts_uses_single_batch(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    service = FakeBatchService()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    html, parts = gmail_client._collect_all_parts(MESSAGE)
+    assert "cid:logo" in html
+    assert _summary(parts) == EXPECTED
+    assert service.batches == 1
+
+
+def test_collect_parts_thread_pool_fallback(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    service = FakeService()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    _, parts = gmail_client._collect_all_parts(MESSAGE)
+    assert _summary(parts) == EXPECTED
+    assert sorted(service.calls) == ["att-a", "att-c", "att-logo"]
+
+
+class ThreadBoundService(FakeService):
+    """Fails if used from any thread but the one it was handed to."""
+
+    def __init__(self):
+        super().__init__()
+        self.owner = threading.get_ident()
+
+    def get(self, userId, messageId, id):  # noqa: N803
+        assert threading.get_ident() == self.owner
+        return super().get(userId, messageId, id)
+
+
+def test_fallback_workers_use_their_own_service(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    local = threading.local()
+    built = []
+
+    def service_for_thread():
+        if not hasattr(local, "service"):
+            local.service = ThreadBoundService()
+            built.append(local.service)
+        return local.service
+
+    monkeypatch.setattr(gmail_client, "get_gmail_service", service_for_thread)
+    files = gmail_client.download_attachments("M1", ["att-a", "att-logo", "att-b"])
+    assert [f.read() for f in files] == [b"att-a", b"att-logo", b"att-b"]
+    assert sorted(c for s in built for c in s.calls) == ["att-a", "att-b", "att-logo"]
+    assert all(s.owner != threading.get_ident() for s in built if s.calls)
+
+
+def test_batch_failure_falls_back_to_individual_calls(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    service = FakeBatchService()
+
+    def broken_batch(callback):
+        raise RuntimeError("batch endpoint unavailable")
+
+    service.new_batch_http_request = broken_batch
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    _, parts = gmail_client._collect_all_parts(MESSAGE)
+    assert _summary(parts) == EXPECTED
+
+
+def test_rejected_parts_are_not_downloaded(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    jira_client = app_setup["jira_client"]
+    settings = gmail_client.settings
+    monkeypatch.setattr(settings, "attach_inline_images", False)
+    monkeypatch.setattr(settings, "preserve_html_render", False)
+    limit = settings.jira_max_attachment_bytes
+    message = {
+        "id": "M1",
+        "payload": {
+            "mimeType": "multipart/mixed",
+            "parts": [
+                {
+                    "mimeType": "text/html",
+                    "body": {"data": _b64(b"<p><img src='cid:logo'></p>")},
+                },
+                {
+                    "filename": "big.pdf",
+                    "mimeType": "application/pdf",
+                    "body": {"attachmentId": "att-big", "size": limit + 1},
+                },
+                {
+                    "filename": "tool.exe",
+                    "mimeType": "application/x-msdownload",
+                    "body": {"attachmentId": "att-exe", "size": 10},
+                },
+                {
+                    "filename": "logo.png",
+                    "mimeType": "image/png",
+                    "body": {"attachmentId": "att-logo", "size": 10},
+                    "headers": [{"name": "Content-ID", "value": "<logo>"}],
+                },
+                {
+                    "filename": "ok.pdf",
+                    "mimeType": "application/pdf",
+                    "body": {"attachmentId": "att-a", "size": 5},
+                },
+            ],
+        },
+    }
+    service = FakeService()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    _, parts = gmail_client._collect_all_parts(message)
+    assert service.calls == ["att-a"]
+
+    monkeypatch.setattr(
+        jira_client.jira_http,
+        "post",
+        lambda url, **kwargs: type(
+            "R", (), {"status_code": 200, "text": "", "json": lambda self: [{"id": "1"}]}
+        )(),
+    )
+    results, _ = jira_client.upload_attachments("JIRA-1", parts)
+    assert results == {
+        "big.pdf": "oversize",
+        "tool.exe": "disallowed",
+        "logo.png": "skipped inline",
+        "ok.pdf": "uploaded",
+    }
+
+
+def test_inline_images_are_downloaded_for_the_render(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    settings = gmail_client.settings
+    monkeypatch.setattr(settings, "attach_inline_images", False)
+    monkeypatch.setattr(settings, "preserve_html_render", True)
+    message = {
+        "id": "M1",
+        "payload": {
+            "mimeType": "multipart/related",
+            "parts": [
+                {
+                    "mimeType": "text/html",
+                    "body": {"data": _b64(b"<p><img src='cid:logo'><img src='cid:icon'></p>")},
+                },
+                {
+                    "filename": "logo.png",
+                    "mimeType": "image/png",
+                    "body": {"attachmentId": "att-logo", "size": 10},
+                    "headers": [{"name": "Content-ID", "value": "<logo>"}],
+                },
+                {
+                    "filename": "icon.gif",
+                    "mimeType": "image/gif",
+                    "body": {"attachmentId": "att-gif", "size": 10},
+                    "headers": [{"name": "Content-ID", "value": "<icon>"}],
+                },
+            ],
+        },
+    }
+    service = FakeService()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    gmail_client._collect_all_parts(message)
+    assert service.calls == ["att-logo"]
+
+
+def test_batches_are_split_by_total_bytes(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    monkeypatch.setattr(gmail_client.settings, "gmail_batch_max_bytes", 100)
+    service = FakeBatchService()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    files = gmail_client.download_attachments("M1", ["att-a", "att-logo", "att-b"], [60, 60, 30])
+    assert [f.read() for f in files] == [b"att-a", b"att-logo", b"att-b"]
+    assert service.batches == 2
@@ -29,7 +29,7 @@ def test_get_gmail_service_from_env(monkeypatch, tmp_path):
     importlib.reload(settings)
     import gaij.gmail_client as gmail_client
     importlib.reload(gmail_client)
-    dummy_creds = object()
+    dummy_creds = SimpleNamespace(valid=True)
     monkeypatch.setattr(
         gmail_client,
         "Credentials",
@@ -40,7 +40,7 @@ def test_get_gmail_service_from_env(monkeypatch, tmp_path):
     )
     dummy_service = object()
     monkeypatch.setattr(gmail_client, "build", lambda *args, **kwargs: dummy_service)
-    gmail_client._service = None
+    gmail_client._pool = None
     service = gmail_client.get_gmail_service()
     assert service is dummy_service
     assert gmail_client.get_gmail_service() is dummy_service  # cached
@@ -55,7 +55,7 @@ def test_get_gmail_service_missing_token(monkeypatch, tmp_path):
     importlib.reload(settings)
     import gaij.gmail_client as gmail_client
     importlib.reload(gmail_client)
-    gmail_client._service = None
+    gmail_client._pool = None
     with pytest.raises(FileNotFoundError):
         gmail_client.get_gmail_service()
 
@@ -0,0 +1,157 @@
+import base64
+import threading
+
+
+def _raw(mid, sender):
+    body = base64.urlsafe_b64encode(f"Body {mid}".encode()).decode()
+    return {
+        "id": mid,
+        "payload": {
+            "mimeType": "text/plain",
+            "body": {"data": body},
+            "headers": [
+                {"name": "From", "value": sender},
+                {"name": "Subject", "value": f"Subject {mid}"},
+            ],
+        },
+    }
+
+
+class FetchError(Exception):
+    pass
+
+
+class Request:
+    def __init__(self, service, kwargs):
+        self.service = service
+        self.kwargs = kwargs
+
+    def execute(self):
+        self.service.single_calls.append(self.kwargs["id"])
+        return self.service.respond(self.kwargs)
+
+
+class Batch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        self.service.batches.append([r.kwargs["id"] for r, _ in self.requests])
+        for request, request_id in self.requests:
+            try:
+                response = self.service.respond(request.kwargs)
+            except FetchError as err:
+                self.callback(request_id, None, err)
+            else:
+                self.callback(request_id, response, None)
+
+
+class Service:
+    def __init__(self, senders, missing=()):
+        self.senders = senders
+        self.missing = set(missing)
+        self.batches = []
+        self.single_calls = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **kwargs):
+        return Request(self, kwargs)
+
+    def new_batch_http_request(self, callback):
+        return Batch(self, callback)
+
+    def respond(self, kwargs):
+        if kwargs["id"] in self.missing:
+            raise FetchError("not found")
+        return _raw(kwargs["id"], self.senders[kwargs["id"]])
+
+
+def test_get_messages_batches_and_maps_errors_to_empty(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    senders = {str(i): "a@example.com" for i in range(60)}
+    service = Service(senders, missing={"3"})
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+
+    messages = gmail_client.get_messages(list(senders))
+
+    assert [len(b) for b in service.batches] == [50, 10]
+    assert messages[3] == {}
+    assert messages[0]["subject"] == "Subject 0"
+    assert messages[59]["body_text"] == "Body 59"
+    assert service.single_calls == []
+
+
+def test_prefetch_fetches_full_payload_only_when_wanted(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    service = Service({"1": "ok@example.com", "2": "spam@example.com"})
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+
+    gmail_client.prefetch_messages(["1", "2"], lambda meta: meta["from"] == "ok@example.com")
+
+    assert service.batches == [["1", "2"], ["1"]]
+    assert gmail_client.get_message("1")["body_text"] == "Body 1"
+    assert service.single_calls == []
+    # Prefetched responses are used once.
+    gmail_client.get_message("1")
+    assert service.single_calls == ["1"]
+
+
+def test_prefetching_yields_all_ids_and_fetches_a_chunk_ahead(app_setup, monkeypatch):
+    app = app_setup["app"]
+    monkeypatch.setattr(app.settings, "gmail_prefetch_chunk", 2)
+    fetched = []
+    second_chunk = threading.Event()
+
+    def prefetch(ids, want):
+        fetched.append(list(ids))
+        if ids == ["3", "4"]:
+            second_chunk.set()
+
+    monkeypatch.setattr(app.gmail_client, "prefetch_messages", prefetch)
+
+    ids = app._prefetching(iter(["1", "2", "3", "4", "5"]))
+    assert next(ids) == "1"
+    # The second chunk is fetched while the first is still being processed.
+    assert second_chunk.wait(timeout=5)
+    assert list(ids) == ["2", "3", "4", "5"]
+    assert [c for c in fetched if c] == [["1", "2"], ["3", "4"], ["5"]]
+
+
+def test_prefetch_failure_does_not_stop_processing(app_setup, monkeypatch):
+    app = app_setup["app"]
+
+    def broken(ids, want):
+        raise RuntimeError("batch endpoint unavailable")
+
+    monkeypatch.setattr(app.gmail_client, "prefetch_messages", broken)
+    assert list(app._prefetching(["1", "2"])) == ["1", "2"]
+
+
+def test_prefetch_thread_uses_its_own_service(app_setup, monkeypatch):
+    app = app_setup["app"]
+    senders = {"1": "a@example.com", "2": "b@example.com"}
+    local = threading.local()
+    services = []
+
+    def service_for_thread():
+        if not hasattr(local, "service"):
+            local.service = Service(senders)
+            local.service.thread = threading.current_thread().name
+            services.append(local.service)
+        return local.service
+
+    monkeypatch.setattr(app.gmail_client, "get_gmail_service", service_for_thread)
+    assert list(app._prefetching(["1", "2"])) == ["1", "2"]
+    used = [s for s in services if s.batches]
+    assert used
+    assert all(s.thread.startswith("gaij-prefetch") for s in used)
@@ -0,0 +1,71 @@
+import gc
+import threading
+import time
+
+
+class FakeCredentials:
+    def __init__(self):
+        self.valid = False
+        self.refreshes = 0
+
+    def refresh(self, request):
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.valid = True
+
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_threads_get_own_service_and_reuse_after_exit(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    monkeypatch.setattr(gmail_client, "build", lambda *a, **k: object())
+    creds = FakeCredentials()
+    creds.valid = True
+    pool = gmail_client.ServicePool(creds)
+
+    main = pool.get()
+    assert pool.get() is main
+    barrier = threading.Barrier(2)
+    seen = []
+
+    def worker():
+        seen.append(pool.get())
+        barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(s) for s in [main, *seen]}) == 3
+
+    gc.collect()
+    assert pool.stats()["idle"] == 2
+    assert _in_thread(pool.get) in seen
+    stats = pool.stats()
+    assert stats["built"] == 3
+    assert stats["checkouts"] == 4
+
+
+def test_expired_token_is_refreshed_once(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    monkeypatch.setattr(gmail_client, "build", lambda *a, **k: object())
+    creds = FakeCredentials()
+    pool = gmail_client.ServicePool(creds)
+
+    threads = [threading.Thread(target=pool.get) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert creds.refreshes == 1
+    stats = pool.stats()
+    assert stats["refreshes"] == 1
+    assert stats["refresh_wait_max_ms"] > 0
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+from googleapiclient.errors import HttpError
+
+PAGES = {
+    None: {
+        "history": [
+            {"id": "11", "messagesAdded": [{"message": {"id": "a"}}, {"message": {"id": "b"}}]},
+            {"id": "12", "messagesAdded": [{"message": {"id": "a"}}]},
+        ],
+        "nextPageToken": "p2",
+    },
+    "p2": {
+        "history": [
+            {"id": "13", "messagesAdded": [{"message": {"id": "b"}}, {"message": {"id": "c"}}]},
+            {"id": "21", "messagesAdded": [{"message": {"id": "late"}}]},
+        ],
+        "nextPageToken": "p3",
+    },
+    "p3": {"history": [{"id": "22", "messagesAdded": [{"message": {"id": "later"}}]}]},
+}
+
+
+class History:
+    def __init__(self, rejected=()):
+        self.requests = []
+        self.rejected = set(rejected)
+
+    def users(self):
+        return self
+
+    def history(self):
+        return self
+
+    def list(self, **kwargs):
+        self.requests.append(kwargs)
+        return self
+
+    def execute(self):
+        token = self.requests[-1].get("pageToken")
+        if token in self.rejected:
+            # Only the stored token is stale; freshly issued ones work.
+            self.rejected.discard(token)
+            raise HttpError(SimpleNamespace(status=400, reason="Bad Request"), b"")
+        return PAGES[token]
+
+
+def test_lister_filters_dedupes_and_stops_past_end(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    service = History()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    pages = []
+
+    ids = list(
+        gmail_client.list_new_message_ids_since(
+            10, 20, on_page=lambda token, page: pages.append((token, page))
+        )
+    )
+
+    assert ids == ["a", "b", "c"]
+    assert pages == [(None, ["a", "b"]), ("p2", ["c"])]
+    assert len(service.requests) == 2
+    assert all(r["labelId"] == "INBOX" for r in service.requests)
+
+
+def test_lister_resumes_and_restarts_on_rejected_token(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    service = History()
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    assert list(gmail_client.list_new_message_ids_since(10, 20, page_token="p2")) == ["b", "c"]
+
+    service = History(rejected={"p2"})
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: service)
+    assert list(gmail_client.list_new_message_ids_since(10, 20, page_token="p2")) == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+def test_failed_range_resumes_from_first_failing_page(app_setup, monkeypatch):
+    app = app_setup["app"]
+    fs = app_setup["firestore_state"]
+    service = History()
+    monkeypatch.setattr(app.gmail_client, "get_gmail_service", lambda: service)
+    outcome = {"c": False}
+    monkeypatch.setattr(app, "_process_safely", lambda mid, writer=None: outcome.get(mid, True))
+
+    assert app.handle_new_messages(10, 20) is False
+    assert fs.get_history_cursor(10) == "p2"
+    assert fs.get_last_history_id() is None
+
+    outcome.clear()
+    service.requests.clear()
+    assert app.handle_new_messages(10, 20) is True
+    assert service.requests[0]["pageToken"] == "p2"
+    assert fs.get_history_cursor(10) is None
+    assert fs.get_last_history_id() == 20
+
+
+def test_history_cursor_is_tied_to_start_id(firestore_state_module):
+    fs = firestore_state_module
+    fs.set_history_cursor(5, "tok")
+    assert fs.get_history_cursor(5) == "tok"
+    assert fs.get_history_cursor(6) is None
@@ -0,0 +1,85 @@
+import base64
+
+from bs4 import BeautifulSoup
+from bs4.element import NavigableString
+
+import gaij.html_document as html_document
+from gaij.html_document import HtmlDocument
+from gaij.html_renderer import render_html
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def test_document_parses_once_and_is_not_mutated(monkeypatch):
+    calls = []
+    original = html_document.BeautifulSoup
+
+    def counting(*a, **k):
+        calls.append(a)
+        return original(*a, **k)
+
+    monkeypatch.setattr(html_document, "BeautifulSoup", counting)
+    html = "<p>One<br>Two <img src='cid:logo@x'><img src='https://e/x.png'></p>"
+    document = HtmlDocument(html)
+
+    assert document.text == "OneTwo"
+    assert document.cid_refs == {"logo@x"}
+    render_html(html, [], "pdf", document=document)
+    render_html(html, [], "pdf", document=document)
+    assert len(calls) == 1
+    # Always the stdlib parser, so the ADF does not depend on what is installed.
+    assert calls[0][1] == "html.parser"
+    assert document.soup.find("br") is not None
+
+
+def test_render_text_matches_br_replacement():
+    html = "<div>A<br/>B<p>C<br>D</p><script>x()</script><!-- note --></div>"
+    soup = BeautifulSoup(html, "html.parser")
+    for br in soup.find_all("br"):
+        br.replace_with(NavigableString("\n"))
+    assert HtmlDocument(html, "html.parser").render_text == soup.get_text(separator="\n")
+
+
+def test_get_message_shares_document(app_setup, monkeypatch):
+    gmail_client = app_setup["gmail_client"]
+    message = {
+        "id": "M1",
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [{"name": "Subject", "value": "Hi"}],
+            "parts": [
+                {"mimeType": "text/html", "body": {"data": _b64(b"<p>Hello <b>there</b></p>")}},
+            ],
+        },
+    }
+
+    class Service:
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def get(self, **kw):
+            return self
+
+        def execute(self):
+            return message
+
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: Service())
+    built = []
+    original = gmail_client.HtmlDocument
+
+    def tracking(*a, **k):
+        doc = original(*a, **k)
+        built.append(doc)
+        return doc
+
+    monkeypatch.setattr(gmail_client, "HtmlDocument", tracking)
+    msg = gmail_client.get_message("M1")
+    assert msg["body_text"] == "Hello there"
+    assert len(built) == 1
+    assert msg["html_document"] is built[0]
+    assert app_setup["app"]._message_document(msg) is built[0]
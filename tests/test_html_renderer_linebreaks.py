@@ -1,3 +1,6 @@
+import re
+import zlib
+
 from gaij.html_renderer import render_html
 
 
@@ -5,7 +8,11 @@ def test_render_html_preserves_linebreaks_in_pdf():
     html = "<p>Line1<br>Line2</p>"
     pdf_bytes, name = render_html(html, [], fmt="pdf")
     assert name.endswith(".pdf")
-    # The PDF stream should render each line separately, moving the cursor
-    # down between them.  ``Td`` operations indicate line breaks.
-    assert b"(Line1) Tj 0 -14 Td" in pdf_bytes
-    assert b"0 -14 Td (Line2) Tj" in pdf_bytes
+    # Content streams are compressed; each line is shown separately and
+    # ``T*`` moves the cursor down between them.
+    stream = re.search(rb"stream\n(.*?)\nendstream", pdf_bytes, re.DOTALL).group(1)
+    content = zlib.decompress(stream)
+    rows = re.findall(rb"\((.*?)\) Tj", content)
+    assert rows[0] == b"Line1"
+    assert rows[-1] == b"Line2"
+    assert content.count(b"T* ") == len(rows) - 1
@@ -1,4 +1,40 @@
+import io
+import struct
+import zlib
+
+from gaij import png_writer
 from gaij.html_renderer import render_html
+from gaij.png_writer import PngOptions, wrap_text, write_text_png
+
+
+def _decode(png):
+    """Return the chunk map, width, height and 1-bit rows (True = ink)."""
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    pos, idat, chunks = 8, b"", {}
+    while pos < len(png):
+        length, kind = struct.unpack(">I4s", png[pos : pos + 8])
+        data = png[pos + 8 : pos + 8 + length]
+        (crc,) = struct.unpack(">I", png[pos + 8 + length : pos + 12 + length])
+        assert crc == zlib.crc32(kind + data)
+        if kind == b"IDAT":
+            idat += data
+        else:
+            chunks[kind] = data
+        pos += 12 + length
+    width, height, depth, color = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color) == (1, 0)
+    raw = zlib.decompress(idat)
+    stride = (width + 7) // 8
+    assert len(raw) == height * (stride + 1)
+    rows = [
+        [
+            not (byte >> (7 - bit)) & 1
+            for byte in raw[y * (stride + 1) + 1 : (y + 1) * (stride + 1)]
+            for bit in range(8)
+        ]
+        for y in range(height)
+    ]
+    return chunks, width, height, rows
 
 
 def test_render_full_fidelity_png_unit():
@@ -14,4 +50,75 @@ def test_render_full_fidelity_png_unit():
     ]
     png_bytes, name = render_html(html, inline_parts, "png")
     assert name.endswith(".png")
-    assert png_bytes.startswith(b"PNGFAKE")
+    _, _, height, rows = _decode(png_bytes)
+    assert any(any(row) for row in rows)
+    # One text line plus the image placeholder, at the default 2x scale.
+    assert height == 2 * 12 + 2 * 18
+
+
+def test_png_draws_glyphs_at_dpi_scale():
+    sink = io.BytesIO()
+    write_text_png(sink, "I", PngOptions(dpi=48, columns=1))
+    chunks, width, height, rows = _decode(sink.getvalue())
+
+    assert (width, height) == (24, 6 + 9 + 6)
+    # "I" is a serifed vertical bar: three columns wide at top and bottom.
+    glyph = ["".join("#" if p else "." for p in row[6:11]) for row in rows[6:13]]
+    assert glyph == [".###.", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."]
+    assert struct.unpack(">IIB", chunks[b"pHYs"]) == (1890, 1890, 1)
+
+
+def test_wrap_text_breaks_at_spaces_and_folds_non_ascii():
+    assert wrap_text("héllo wörld\tx", 8) == ["hello", "world x"]
+    assert wrap_text("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+    assert wrap_text("a\n\nb", 4) == ["a", "", "b"]
+    assert wrap_text("ab cd ef\ngh", 2, limit=2) == ["ab", "cd"]
+
+
+def test_png_height_and_size_are_bounded():
+    text = "\n".join(f"line {i} " + "lorem ipsum " * 8 for i in range(2000))
+
+    sink = io.BytesIO()
+    drawn = write_text_png(sink, text, PngOptions(max_height=500))
+    _, _, height, _ = _decode(sink.getvalue())
+    assert height <= 500
+    assert drawn == (500 - 24) // 18
+
+    sink = io.BytesIO()
+    drawn = write_text_png(sink, text, PngOptions(max_bytes=20_000))
+    assert len(sink.getvalue()) <= 20_000
+    assert 1 < drawn < 2000
+    _decode(sink.getvalue())
+
+
+def test_png_checks_its_size_every_few_lines(monkeypatch):
+    syncs = []
+    sync = png_writer._PngStream.sync
+    monkeypatch.setattr(png_writer._PngStream, "sync", lambda self: syncs.append(1) or sync(self))
+    text = "\n".join(f"line {i} " + "lorem ipsum " * 4 for i in range(200))
+    assert write_text_png(io.BytesIO(), text) == 200
+    assert len(syncs) <= 200 // 16 + 2
+
+
+def test_png_stays_within_max_bytes():
+    dense = "\n".join(f"{i} " + "Wq#8@" * 30 for i in range(3000))
+    texts = [
+        "\n".join(f"line {i} " + "lorem ipsum " * 8 for i in range(5000)),
+        # Cheap lines first, so the first lines underestimate the rest.
+        "\n".join(["."] * 16) + "\n" + dense,
+    ]
+    for text in texts:
+        for columns in (100, 40):
+            for max_bytes in (5_000, 20_000, 100_000):
+                sink = io.BytesIO()
+                write_text_png(sink, text, PngOptions(columns=columns, max_bytes=max_bytes))
+                assert len(sink.getvalue()) <= max_bytes, (columns, max_bytes)
+
+
+def test_not_shown_line_fits_narrow_previews():
+    text = "\n".join(f"line {i}" for i in range(5000))
+    for columns in (20, 5, 1):
+        sink = io.BytesIO()
+        options = PngOptions(columns=columns, max_height=1000)
+        assert write_text_png(sink, text, options) < 5000
+        _decode(sink.getvalue())
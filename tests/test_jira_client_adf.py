@@ -22,7 +22,7 @@ def test_create_ticket_payload(monkeypatch, app_setup):
                 return {"key": "ABC-1"}
         return Resp()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     key = jira_client.create_ticket(
         "Summary",
         {"type": "doc", "content": []},
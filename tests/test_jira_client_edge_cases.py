@@ -10,7 +10,7 @@ def test_create_ticket_failure(monkeypatch, app_setup):
             text = "bad"
         return Resp()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     key = jira_client.create_ticket("Summary", {"type": "doc", "content": []}, "Client")
     assert key is None
 
@@ -19,8 +19,8 @@ def test_upload_attachments_inline_and_error(monkeypatch, app_setup):
     jira_client = app_setup["jira_client"]
     monkeypatch.setattr(jira_client.settings, "attach_inline_images", False)
 
-    def fake_post(url, auth=None, headers=None, files=None, timeout=None):
-        name = files["file"][0]
+    def fake_post(url, auth=None, headers=None, data=None, timeout=None):
+        name = data.filenames[0]
         if name == "error.png":
             raise requests.RequestException("boom")
         class R:
@@ -30,7 +30,7 @@ def test_upload_attachments_inline_and_error(monkeypatch, app_setup):
                 return [{"id": "1"}]
         return R()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     attachments = [
         {
             "filename": "inline.png",
@@ -62,5 +62,5 @@ def test_update_issue_description_error(monkeypatch, app_setup):
             text = "fail"
         return Resp()
 
-    monkeypatch.setattr(jira_client.requests, "put", fake_put)
+    monkeypatch.setattr(jira_client.jira_http, "put", fake_put)
     jira_client.update_issue_description("KEY", {"type": "doc", "version": 1, "content": []})
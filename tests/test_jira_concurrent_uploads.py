@@ -0,0 +1,75 @@
+import threading
+
+
+def _att(name, cid=None, mime="application/pdf"):
+    return {
+        "filename": name,
+        "mime_type": mime,
+        "data_bytes": name.encode(),
+        "is_inline": cid is not None,
+        "content_id": cid,
+    }
+
+
+class Resp:
+    def __init__(self, status_code, ids):
+        self.status_code = status_code
+        self.text = ""
+        self._ids = ids
+
+    def json(self):
+        return [{"id": i} for i in self._ids]
+
+
+def test_uploads_run_concurrently_and_keep_order(app_setup, monkeypatch):
+    jira_client = app_setup["jira_client"]
+    monkeypatch.setattr(jira_client.settings, "jira_upload_concurrency", 3)
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_post(url, headers=None, data=None):
+        barrier.wait()  # only passes if all three uploads are in flight
+        name = data.filenames[0]
+        return Resp(200, [f"id-{name}"])
+
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
+    attachments = [_att("c.pdf"), _att("a.png", cid="img", mime="image/png"), _att("b.pdf")]
+    results, id_map = jira_client.upload_attachments("JIRA-1", attachments)
+    assert list(results.items()) == [
+        ("c.pdf", "uploaded"),
+        ("a.png", "uploaded"),
+        ("b.pdf", "uploaded"),
+    ]
+    assert id_map == {"c.pdf": "id-c.pdf", "img": "id-a.png", "b.pdf": "id-b.pdf"}
+
+
+def test_packed_uploads_share_requests(app_setup, monkeypatch):
+    jira_client = app_setup["jira_client"]
+    monkeypatch.setattr(jira_client.settings, "jira_upload_batch_size", 2)
+    requests_seen = []
+
+    def fake_post(url, headers=None, data=None):
+        names = list(data.filenames)
+        requests_seen.append(names)
+        assert data.read().count(b'name="file"') == len(names)
+        if "bad.pdf" in names:
+            return Resp(413, [])
+        return Resp(200, [f"id-{n}" for n in names])
+
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
+    attachments = [
+        _att("one.pdf"),
+        _att("logo.png", cid="logo", mime="image/png"),
+        _att("skip.exe", mime="application/x-msdownload"),
+        _att("bad.pdf"),
+        _att("two.pdf"),
+    ]
+    results, id_map = jira_client.upload_attachments("JIRA-1", attachments)
+    assert sorted(requests_seen) == [["bad.pdf", "two.pdf"], ["one.pdf", "logo.png"]]
+    assert results == {
+        "one.pdf": "uploaded",
+        "logo.png": "uploaded",
+        "skip.exe": "disallowed",
+        "bad.pdf": "failed 413",
+        "two.pdf": "failed 413",
+    }
+    assert id_map == {"one.pdf": "id-one.pdf", "logo": "id-logo.png"}
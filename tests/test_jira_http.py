@@ -0,0 +1,81 @@
+import io
+
+import pytest
+import requests
+
+from gaij.multipart import MultipartBody
+
+
+class Resp:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        body = kwargs.get("data")
+        self.calls.append((method, url, body.read() if body is not None else None))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def jira_http(app_setup, monkeypatch):
+    module = app_setup["jira_client"].jira_http
+    sleeps = []
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+    module.sleeps = sleeps
+    return module
+
+
+def use_session(monkeypatch, module, outcomes):
+    session = FakeSession(outcomes)
+    monkeypatch.setattr(module, "get_session", lambda: session)
+    return session
+
+
+def test_retry_after_is_honoured_and_body_rewound(jira_http, monkeypatch):
+    session = use_session(monkeypatch, jira_http, [Resp(429, {"Retry-After": "2"}), Resp(201)])
+    body = MultipartBody([("a.pdf", "application/pdf", io.BytesIO(b"abc"), 3)])
+    url = f"{jira_http.settings.jira_url}/rest/api/3/issue/UIV4-12/attachments"
+    resp = jira_http.post(url, data=body)
+    assert resp.status_code == 201
+    assert jira_http.sleeps == [2.0]
+    assert session.calls[0][2] == session.calls[1][2]  # full body sent both times
+    stats = jira_http.latency_stats()["POST /rest/api/3/issue/{key}/attachments"]
+    assert stats["count"] == 2
+
+
+def test_post_is_not_retried_on_bad_gateway(jira_http, monkeypatch):
+    session = use_session(monkeypatch, jira_http, [Resp(502), Resp(201)])
+    resp = jira_http.post(f"{jira_http.settings.jira_url}/rest/api/3/issue", json={})
+    assert resp.status_code == 502
+    assert len(session.calls) == 1
+
+
+def test_put_retries_connection_errors_then_gives_up(jira_http, monkeypatch):
+    monkeypatch.setattr(jira_http.settings, "jira_max_retries", 2)
+    errors = [requests.ConnectionError("reset")] * 3
+    session = use_session(monkeypatch, jira_http, errors)
+    with pytest.raises(requests.ConnectionError):
+        jira_http.put(f"{jira_http.settings.jira_url}/rest/api/3/issue/UIV4-1", json={})
+    assert len(session.calls) == 3
+    assert len(jira_http.sleeps) == 2
+    assert all(0 <= s <= jira_http.settings.jira_backoff_max_seconds for s in jira_http.sleeps)
+
+
+def test_session_is_shared_and_pooled(jira_http, monkeypatch):
+    monkeypatch.setattr(jira_http, "_session", None)
+    session = jira_http.get_session()
+    assert jira_http.get_session() is session
+    adapter = session.get_adapter("https://example.atlassian.net")
+    assert adapter._pool_maxsize == jira_http.settings.jira_pool_maxsize
+    assert session.auth.username == "user@example.com"
@@ -43,8 +43,8 @@ def test_jira_upload_failure_partial(app_setup, monkeypatch):
 
     uploaded: list[str] = []
 
-    def fake_post(url, auth=None, headers=None, files=None, timeout=None):
-        name = files["file"][0]
+    def fake_post(url, auth=None, headers=None, data=None, timeout=None):
+        name = data.filenames[0]
         uploaded.append(name)
         class R:
             text = ""
@@ -53,14 +53,14 @@ def test_jira_upload_failure_partial(app_setup, monkeypatch):
                 return [{"id": "1"}]
         return R()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     desc: dict[str, object] = {}
     monkeypatch.setattr(jira_client, "update_issue_description", lambda k, a: desc.setdefault("adf", a))
 
     app.process_message("A1")
 
     assert fs.is_processed("A1")
-    assert uploaded == ["good.pdf", "bad.pdf"]
+    assert sorted(uploaded) == ["bad.pdf", "good.pdf"]
     content = desc["adf"]["content"]  # type: ignore[index]
     assert any(p["content"][0]["text"] == "good.pdf" for p in content)
     assert all("bad.pdf" not in p["content"][0]["text"] for p in content if p.get("content"))
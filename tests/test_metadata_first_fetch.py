@@ -0,0 +1,100 @@
+import importlib
+
+
+def test_disallowed_sender_skips_full_fetch_and_firestore(app_setup, monkeypatch):
+    app = app_setup["app"]
+    gmail_client = app_setup["gmail_client"]
+    fs = app_setup["firestore_state"]
+    monkeypatch.setattr(app, "ALLOWED_SENDERS", {"ok@example.com"})
+    monkeypatch.setattr(
+        gmail_client,
+        "get_message_metadata",
+        lambda mid: {"id": mid, "from": "News <news@example.com>", "subject": "Deals"},
+    )
+    full_fetches = []
+    monkeypatch.setattr(gmail_client, "get_message", lambda mid: full_fetches.append(mid) or {})
+
+    app.process_message("M1")
+
+    assert full_fetches == []
+    assert fs._get_client().store == {}
+
+
+def test_allowed_sender_fetches_full_message(app_setup, monkeypatch):
+    app = app_setup["app"]
+    gmail_client = app_setup["gmail_client"]
+    monkeypatch.setattr(app, "ALLOWED_SENDERS", {"ok@example.com"})
+    monkeypatch.setattr(
+        gmail_client,
+        "get_message_metadata",
+        lambda mid: {"id": mid, "from": "OK <ok@example.com>", "subject": "Help"},
+    )
+    message = {
+        "from": "OK <ok@example.com>",
+        "subject": "Help",
+        "message_id": "<m1>",
+        "body_text": "Body",
+        "body_html": "",
+        "inline_map": {},
+        "inline_parts": [],
+        "attachments": [],
+    }
+    monkeypatch.setattr(gmail_client, "get_message", lambda mid: message)
+    monkeypatch.setattr(
+        app_setup["gpt_agent"], "gpt_classify_issue", lambda s, b: {"issueType": "Task"}
+    )
+    monkeypatch.setattr(app.settings, "preserve_html_render", False)
+    created = []
+    monkeypatch.setattr(
+        app_setup["jira_client"], "create_ticket", lambda *a, **k: created.append(a) or "J-1"
+    )
+
+    app.process_message("M1")
+
+    assert len(created) == 1
+    assert app_setup["firestore_state"].is_processed("M1")
+
+
+def test_get_message_metadata_requests_headers_only(app_setup, monkeypatch):
+    gmail_client = importlib.reload(app_setup["gmail_client"])
+    calls = []
+
+    class Messages:
+        def get(self, **kwargs):
+            calls.append(kwargs)
+            return self
+
+        def execute(self):
+            return {
+                "id": "1",
+                "labelIds": ["INBOX"],
+                "payload": {
+                    "headers": [
+                        {"name": "from", "value": "a@example.com"},
+                        {"name": "Subject", "value": "Hi"},
+                        {"name": "Message-ID", "value": "<x>"},
+                    ]
+                },
+            }
+
+    class Users:
+        def messages(self):
+            return Messages()
+
+    class Service:
+        def users(self):
+            return Users()
+
+    monkeypatch.setattr(gmail_client, "get_gmail_service", lambda: Service())
+    meta = gmail_client.get_message_metadata("1")
+
+    assert meta == {
+        "id": "1",
+        "from": "a@example.com",
+        "subject": "Hi",
+        "message_id": "<x>",
+        "label_ids": ["INBOX"],
+    }
+    assert calls[0]["format"] == "metadata"
+    assert calls[0]["metadataHeaders"] == ["From", "Subject", "Message-ID"]
+    assert "payload/headers" in calls[0]["fields"]
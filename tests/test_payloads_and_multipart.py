@@ -0,0 +1,55 @@
+import base64
+import email
+import io
+
+import requests
+
+from gaij import payloads
+from gaij.multipart import MultipartBody
+
+
+def test_spool_base64url_decodes_in_chunks_and_spills():
+    raw = bytes(range(256)) * 4000  # ~1 MB, spans several decode chunks
+    encoded = base64.urlsafe_b64encode(raw).decode()
+    spool = payloads.spool_base64url(encoded, max_size=1024)
+    assert spool._rolled  # spilled to disk instead of staying in memory
+    part = {"data_file": spool}
+    assert payloads.payload_size(part) == len(raw)
+    assert payloads.read_payload(part) == raw
+    payloads.close_payloads([part])
+    assert spool.closed
+
+
+def test_payload_helpers_accept_in_memory_bytes():
+    part = {"data_bytes": b"abc"}
+    assert payloads.payload_size(part) == 3
+    assert payloads.read_payload(part) == b"abc"
+    payloads.close_payloads([part])
+
+
+def test_multipart_body_streams_with_content_length():
+    data = b"x" * 200_000
+    body = MultipartBody(
+        [("a.pdf", "application/pdf", io.BytesIO(data), len(data)),
+         ('we"ird.txt', "text/plain", io.BytesIO(b"hi"), 2)]
+    )
+    prepared = requests.Request(
+        "POST",
+        "https://example.invalid/upload",
+        data=body,
+        headers={"Content-Type": body.content_type},
+    ).prepare()
+    assert prepared.body is body
+    assert int(prepared.headers["Content-Length"]) == body.len
+
+    raw = b"".join(iter(body))
+    assert len(raw) == body.len
+    message = email.message_from_bytes(
+        b"Content-Type: " + body.content_type.encode() + b"\r\n\r\n" + raw
+    )
+    parts = message.get_payload()
+    assert [p.get_filename() for p in parts] == ["a.pdf", "we%22ird.txt"]
+    assert parts[0].get_payload(decode=True) == data
+
+    body.rewind()
+    assert body.read() == raw
@@ -0,0 +1,81 @@
+import io
+import re
+import struct
+import zlib
+
+from gaij.html_renderer import render_html
+from gaij.pdf_images import load_image
+
+
+def _jpeg(width, height, components=3, adobe=False):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    if adobe:
+        app0 += b"\xff\xee" + struct.pack(">H", 14) + b"Adobe" + bytes(7)
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 8 + 3 * components, 8, height, width, components)
+    return b"\xff\xd8" + app0 + sof + bytes(3 * components) + b"\xff\xd9"
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png(width, height, color=2, interlace=0):
+    rows = b"".join(b"\x00" + bytes(3 * width) for _ in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, color, 0, 0, interlace)
+    data = zlib.compress(rows)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", ihdr)
+        + _chunk(b"IDAT", data[:10])
+        + _chunk(b"IDAT", data[10:])
+        + _chunk(b"IEND", b"")
+    ), data
+
+
+def _part(cid, data, name="img"):
+    return {"filename": name, "data_bytes": data, "is_inline": True, "content_id": cid}
+
+
+def test_jpeg_is_embedded_unchanged_with_dctdecode():
+    jpeg = _jpeg(640, 480)
+    image = load_image(io.BytesIO(jpeg))
+    assert (image.width, image.height) == (640, 480)
+    assert b"/DeviceRGB" in image.entries
+
+    pdf, _ = render_html("<p>Hi<img src='cid:a'></p>", [_part("a", jpeg)], "pdf")
+
+    assert b"/Subtype /Image /Width 640 /Height 480" in pdf
+    assert b"/Filter /DCTDecode /Length %d >>\nstream\n" % len(jpeg) + jpeg in pdf
+    assert re.search(rb"/XObject << /Im(\d+) \1 0 R >>", pdf)
+
+
+def test_cmyk_jpeg_is_inverted_only_with_adobe_marker():
+    plain = load_image(io.BytesIO(_jpeg(8, 8, components=4)))
+    assert plain.entries.startswith(b"/ColorSpace /DeviceCMYK /BitsPerComponent")
+    assert b"/Decode" not in plain.entries
+
+    adobe = load_image(io.BytesIO(_jpeg(8, 8, components=4, adobe=True)))
+    assert b"/DeviceCMYK /Decode [1 0 1 0 1 0 1 0]" in adobe.entries
+    rgb = load_image(io.BytesIO(_jpeg(8, 8, adobe=True)))
+    assert b"/Decode" not in rgb.entries
+
+
+def test_png_idat_is_passed_through_with_png_predictor():
+    png, idat = _png(20, 10)
+    image = load_image(io.BytesIO(png))
+    assert image.length == len(idat)
+    assert b"".join(image.chunks) == idat
+    assert b"/Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns 20" in image.entries
+
+
+def test_unsupported_and_unreferenced_images():
+    assert load_image(io.BytesIO(_png(4, 4, color=6)[0])) is None
+    assert load_image(io.BytesIO(_png(4, 4, interlace=1)[0])) is None
+    assert load_image(io.BytesIO(b"GIF89a")) is None
+
+    parts = [_part("a", b"GIF89a", "anim.gif"), _part("b", _jpeg(8, 8), "unused.jpg")]
+    pdf, _ = render_html("<p>Hi<img src='cid:a'></p>", parts, "pdf")
+
+    stream = re.search(rb"/FlateDecode >>\nstream\n(.*?)\nendstream", pdf, re.DOTALL)
+    assert b"([image: anim.gif]) Tj" in zlib.decompress(stream.group(1))
+    assert b"/Subtype /Image" not in pdf
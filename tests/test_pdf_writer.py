@@ -0,0 +1,69 @@
+import io
+import re
+import zlib
+
+from gaij.pdf_writer import PdfWriter, text_width, wrap_line, write_text_pdf
+
+
+class WriteOnlySink:
+    """Accepts writes only, like a socket or upload stream."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+
+def _contents(pdf):
+    streams = re.findall(rb"stream\n(.*?)\nendstream", pdf, re.DOTALL)
+    return [zlib.decompress(s) for s in streams]
+
+
+def test_long_text_is_wrapped_and_paginated():
+    sink = io.BytesIO()
+    lines = "\n".join(f"line {i} " + "word " * 40 for i in range(100))
+    pages = write_text_pdf(sink, lines)
+    pdf = sink.getvalue()
+
+    assert pages > 2
+    assert pdf.count(b"/Type /Page ") == pages
+    assert b"/Count %d" % pages in pdf
+    # 648pt of text area at a 14pt leading.
+    rows_per_page = 47
+    for content in _contents(pdf):
+        rows = re.findall(rb"\((.*?)\) Tj", content)
+        assert len(rows) <= rows_per_page
+        assert all(text_width(r.decode("cp1252"), 12) <= 468 for r in rows)
+
+
+def test_xref_offsets_point_at_objects():
+    pdf = io.BytesIO()
+    write_text_pdf(pdf, "Hello\n" * 200)
+    data = pdf.getvalue()
+    startxref = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    assert data[startxref:].startswith(b"xref\n")
+    entries = re.findall(rb"(\d{10}) 00000 n", data[startxref:])
+    for number, offset in enumerate(entries, start=1):
+        assert data[int(offset) :].startswith(b"%d 0 obj" % number)
+
+
+def test_streams_to_write_only_sink_and_escapes_text():
+    sink = WriteOnlySink()
+    write_text_pdf(sink, "a (b) \\ cé ☃")
+    pdf = b"".join(sink.chunks)
+    assert pdf.startswith(b"%PDF-") and pdf.endswith(b"%%EOF\n")
+    assert b"(a \\(b\\) \\\\ c\xe9 ?) Tj" in _contents(pdf)[0]
+
+
+def test_empty_text_still_has_a_page():
+    sink = io.BytesIO()
+    assert write_text_pdf(sink, "") == 1
+
+
+def test_wrap_line_splits_overlong_words():
+    rows = wrap_line("x" * 300 + " tail", 100, 12)
+    assert all(text_width(r, 12) <= 100 for r in rows)
+    assert "".join(rows[:-1]) + rows[-1].replace(" tail", "") == "x" * 300
+    assert rows[-1].endswith("tail")
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+from openai import BadRequestError
+
+from gaij.prompt_builder import SYSTEM_PROMPT, build_prompt, compact_body, count_tokens
+
+THREAD = """Hi team,
+
+The export button fails with a 500 error.
+
+Thanks,
+Ann
+--
+Ann Smith | Support Lead
+
+CONFIDENTIALITY NOTICE: This e-mail is confidential and intended solely for
+the addressee.
+
+On Mon, Jan 1, 2024 at 9:00 AM Bob <bob@example.com> wrote:
+> Can you send details?
+> Older thread text
+"""
+
+
+def test_compact_body_drops_quotes_signature_and_disclaimer():
+    text = compact_body(THREAD)
+    assert "export button fails" in text
+    assert "Ann" in text
+    assert "Support Lead" not in text
+    assert "CONFIDENTIALITY" not in text
+    assert "Older thread" not in text
+
+
+def test_compact_body_keeps_pure_forward_and_strips_outlook_history():
+    forward = "-----Original Message-----\nFrom: a@b.c\nThe real request"
+    assert "The real request" in compact_body(forward)
+    outlook = "Please fix.\n\nFrom: Bob\nSent: Monday\nSubject: old\nold stuff"
+    assert compact_body(outlook) == "Please fix."
+    disclaimer = "Body.\n\nThis message is privileged. If you received this email in error..."
+    assert compact_body(disclaimer) == "Body."
+
+
+def test_build_prompt_budget_and_static_prefix():
+    body = "word " * 5000
+    prompt = build_prompt("Subject", body, 100)
+    assert prompt.messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert "OETraining" in SYSTEM_PROMPT
+    assert count_tokens(prompt.messages[1]["content"]) <= 100 + 10
+    assert prompt.compact_tokens < prompt.raw_tokens
+    assert build_prompt("Other", "x", 100).messages[0] == prompt.messages[0]
+
+
+def _bad_request(message):
+    # Built without an HTTP response object, which the test does not need.
+    exc = BadRequestError.__new__(BadRequestError)
+    Exception.__init__(exc, message)
+    return exc
+
+
+def _client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_json_mode_requested_and_usage_logged(app_setup, monkeypatch, caplog):
+    gpt_agent = app_setup["gpt_agent"]
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            usage=SimpleNamespace(
+                prompt_tokens=900,
+                completion_tokens=12,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=768),
+            ),
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"issueType":"Bug"}'))],
+        )
+
+    monkeypatch.setattr(gpt_agent, "_client", _client(create))
+    with caplog.at_level("INFO"):
+        assert gpt_agent.gpt_classify_issue("s", THREAD) == {"issueType": "Bug"}
+    assert calls[0]["response_format"] == {"type": "json_object"}
+    assert calls[0]["messages"][0]["role"] == "system"
+    assert "Older thread" not in calls[0]["messages"][1]["content"]
+    assert "before compaction" in caplog.text
+    assert "768 cached" in caplog.text
+
+
+def test_json_mode_falls_back_when_model_rejects_it(app_setup, monkeypatch):
+    gpt_agent = app_setup["gpt_agent"]
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if "response_format" in kwargs:
+            raise _bad_request("Invalid parameter: 'response_format' of type 'json_object'")
+        content = 'Sure:\n```json\n{"issueType": "Story", "client": "ALA"}\n```'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    monkeypatch.setattr(gpt_agent, "_client", _client(create))
+    assert gpt_agent.gpt_classify_issue("a", "b") == {"issueType": "Story", "client": "ALA"}
+    assert gpt_agent.gpt_classify_issue("c", "d") == {"issueType": "Story", "client": "ALA"}
+    assert ["response_format" in c for c in calls] == [True, False, False]
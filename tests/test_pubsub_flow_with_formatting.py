@@ -43,7 +43,7 @@ def test_pubsub_flow_with_formatting(app_setup, monkeypatch, pubsub_envelope):
     }
 
     monkeypatch.setattr(
-        gmail_client, "list_new_message_ids_since", lambda a, b: iter(["1"])
+        gmail_client, "list_new_message_ids_since", lambda a, b, **kw: iter(["1"])
     )
     monkeypatch.setattr(gmail_client, "get_message", lambda mid: message)
     monkeypatch.setattr(gpt_agent, "gpt_classify_issue", lambda s, b: {"issueType": "Task"})
@@ -51,8 +51,8 @@ def test_pubsub_flow_with_formatting(app_setup, monkeypatch, pubsub_envelope):
 
     uploaded = []
 
-    def fake_post(url, auth=None, headers=None, files=None, timeout=None):
-        name = files["file"][0]
+    def fake_post(url, auth=None, headers=None, data=None, timeout=None):
+        name = data.filenames[0]
         uploaded.append(name)
         idx = len(uploaded)
         class R:
@@ -62,7 +62,7 @@ def test_pubsub_flow_with_formatting(app_setup, monkeypatch, pubsub_envelope):
                 return [{"id": str(idx)}]
         return R()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     desc = {}
     monkeypatch.setattr(jira_client, "update_issue_description", lambda k, a: desc.setdefault("adf", a))
 
@@ -0,0 +1,89 @@
+import io
+
+
+def _part(data, cid="logo", name="logo.png"):
+    return {"filename": name, "mime_type": "image/png", "data_bytes": data, "content_id": cid}
+
+
+def test_cache_key_covers_html_parts_and_format(app_setup):
+    cache_key = app_setup["app"].render_cache.cache_key
+
+    base = cache_key("<p>Hi</p>", [_part(b"A")], "pdf")
+    spooled = {**_part(b""), "data_file": io.BytesIO(b"A")}
+    del spooled["data_bytes"]
+    assert cache_key("<p>Hi</p>", [spooled], "pdf") == base
+    assert cache_key("<p>Hi</p>", [_part(b"B")], "pdf") != base
+    assert cache_key("<p>Hi</p>", [_part(b"A", name="other.png")], "pdf") != base
+    assert cache_key("<p>Hi</p>", [_part(b"A")], "png") != base
+    assert cache_key("<p>Ho</p>", [_part(b"A")], "pdf") != base
+
+
+def test_memory_cache_evicts_by_size(app_setup):
+    MemoryCache = app_setup["app"].render_cache.MemoryCache  # noqa: N806
+
+    cache = MemoryCache(10)
+    cache.put("a", b"1234", "a.pdf")
+    cache.put("b", b"1234", "b.pdf")
+    assert cache.get("a") == (b"1234", "a.pdf")
+    cache.put("c", b"1234", "c.pdf")
+    assert cache.get("b") is None
+    assert cache.size == 8
+    cache.put("huge", b"x" * 11, "huge.pdf")
+    assert cache.get("huge") is None
+
+
+def test_disk_cache_is_shared_and_size_bounded(app_setup, tmp_path):
+    DiskCache = app_setup["app"].render_cache.DiskCache  # noqa: N806
+    path = str(tmp_path / "renders.sqlite3")
+
+    writer = DiskCache(path, 10)
+    writer.put("a", b"1234", "a.pdf")
+    writer.put("b", b"1234", "b.pdf")
+    reader = DiskCache(path, 10)
+    assert reader.get("a") == (b"1234", "a.pdf")
+    reader.put("c", b"1234", "c.pdf")
+    assert reader.get("b") is None
+    assert writer.get("a") is not None
+    assert writer.get("c") == (b"1234", "c.pdf")
+
+
+def test_repeated_message_reuses_render(app_setup, monkeypatch):
+    app = app_setup["app"]
+    jira_client = app_setup["jira_client"]
+    message = {
+        "from": "Marisa@oetraining.com",
+        "subject": "Alert",
+        "message_id": "<id1>",
+        "body_text": "Disk full",
+        "body_html": "<p>Disk full<img src='cid:logo'></p>",
+        "inline_map": {},
+        "inline_parts": [_part(b"img")],
+        "attachments": [],
+    }
+    monkeypatch.setattr(app_setup["gmail_client"], "get_message", lambda mid: dict(message))
+    monkeypatch.setattr(
+        app_setup["gpt_agent"], "gpt_classify_issue", lambda s, b: {"issueType": "Task"}
+    )
+    monkeypatch.setattr(jira_client, "create_ticket", lambda *a, **k: "JIRA-1")
+    uploaded = []
+
+    def upload(key, parts):
+        uploaded.extend((p["filename"], app.payloads.read_payload(p)) for p in parts)
+        return {p["filename"]: "uploaded" for p in parts}, {}
+
+    monkeypatch.setattr(jira_client, "upload_attachments", upload)
+    monkeypatch.setattr(jira_client, "update_issue_description", lambda k, adf: None)
+    renders = []
+    original = app.render_html_to
+    monkeypatch.setattr(
+        app, "render_html_to", lambda *a, **k: renders.append(a) or original(*a, **k)
+    )
+
+    app.process_message("A1")
+    app.process_message("A2")
+
+    assert len(renders) == 1
+    assert [name for name, _ in uploaded] == ["email-render.pdf", "email-render.pdf"]
+    assert uploaded[0][1] == uploaded[1][1]
+    stats = app_setup["client"].get("/stats").get_json()["render_cache"]
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
@@ -68,8 +68,8 @@ def test_render_full_fidelity_pdf_integration(app_setup, monkeypatch):
 
     uploaded = []
 
-    def fake_post(url, auth=None, headers=None, files=None, timeout=None):
-        name = files["file"][0]
+    def fake_post(url, auth=None, headers=None, data=None, timeout=None):
+        name = data.filenames[0]
         uploaded.append(name)
         idx = len(uploaded)
         class R:
@@ -79,7 +79,7 @@ def test_render_full_fidelity_pdf_integration(app_setup, monkeypatch):
                 return [{"id": str(idx)}]
         return R()
 
-    monkeypatch.setattr(jira_client.requests, "post", fake_post)
+    monkeypatch.setattr(jira_client.jira_http, "post", fake_post)
     desc = {}
     monkeypatch.setattr(jira_client, "update_issue_description", lambda k, a: desc.setdefault("adf", a))
 
@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from gaij import render_pool
+from gaij.html_renderer import render_html
+from gaij.render_pool import RenderPool, RenderTimeoutError
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(1, timeout=0.05, memory_bytes=0)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_renders_and_survives_a_timeout(pool):
+    slow = pool.submit("<p>" + "word " * 400_000 + "</p>" * 20_000, [], "pdf")
+    with pytest.raises(RenderTimeoutError):
+        slow.result(timeout=30)
+
+    data, name = pool.submit("<p>Hi</p>", [], "pdf").result(timeout=30)
+    assert name == "email-render.pdf"
+    assert data.startswith(b"%PDF-")
+
+
+def test_failed_render_is_logged_not_delivered(pool):
+    delivered = []
+    job = Future()
+    job.set_exception(MemoryError())
+    pool.when_done(job, delivered.append).result(timeout=5)
+    assert delivered == []
+
+
+def test_timeout_starts_when_the_render_does(pool, monkeypatch):
+    monkeypatch.setattr(render_pool, "_WAIT_GRACE_SECONDS", 0.0)
+    delivered = []
+    queued = Future()
+    waiter = pool.when_done(queued, delivered.append)
+    time.sleep(0.3)  # waiting behind other renders
+    assert queued.set_running_or_notify_cancel()
+    queued.set_result((b"data", "email-render.pdf"))
+    waiter.result(timeout=5)
+    assert delivered == [(b"data", "email-render.pdf")]
+
+    stuck = Future()
+    stuck.set_running_or_notify_cancel()
+    started = time.monotonic()
+    pool.when_done(stuck, delivered.append).result(timeout=5)
+    assert time.monotonic() - started < 1
+    assert len(delivered) == 1
+
+
+class InlinePool:
+    """Renders in-process and holds the completion until the test runs it."""
+
+    def __init__(self):
+        self.submitted = []
+        self.pending = []
+
+    def submit(self, html, inline_parts, fmt, png_options=None):
+        self.submitted.append(inline_parts)
+        job = Future()
+        job.set_result(render_html(html, inline_parts, fmt, png_options=png_options))
+        return job
+
+    def when_done(self, job, callback):
+        self.pending.append(lambda: callback(job.result()))
+
+
+def test_issue_is_created_before_the_render_is_attached(app_setup, monkeypatch):
+    app = app_setup["app"]
+    jira_client = app_setup["jira_client"]
+    monkeypatch.setattr(app.settings, "html_render_processes", 1)
+    render = InlinePool()
+    monkeypatch.setattr(app, "_get_render_pool", lambda: render)
+    message = {
+        "from": "Marisa@oetraining.com",
+        "subject": "Sub",
+        "message_id": "<id1>",
+        "body_text": "Body",
+        "body_html": "<p>Body</p>",
+        "inline_map": {},
+        "inline_parts": [],
+        "attachments": [
+            {"filename": "doc.pdf", "mime_type": "application/pdf", "data_bytes": b"%PDF"}
+        ],
+    }
+    monkeypatch.setattr(app_setup["gmail_client"], "get_message", lambda mid: message)
+    monkeypatch.setattr(
+        app_setup["gpt_agent"], "gpt_classify_issue", lambda s, b: {"issueType": "Task"}
+    )
+    monkeypatch.setattr(jira_client, "create_ticket", lambda *a, **k: "JIRA-1")
+    uploads = []
+
+    def upload(key, parts):
+        names = [p["filename"] for p in parts]
+        uploads.append(names)
+        return dict.fromkeys(names, "uploaded"), {}
+
+    monkeypatch.setattr(jira_client, "upload_attachments", upload)
+    descriptions = []
+    monkeypatch.setattr(
+        jira_client, "update_issue_description", lambda k, adf: descriptions.append(adf)
+    )
+
+    app.process_message("A1")
+
+    assert uploads == [["doc.pdf"]]
+    assert app_setup["firestore_state"].is_processed("A1")
+    assert app.render_cache.stats()["stores"] == 1
+
+    render.pending.pop()()
+
+    assert uploads[-1] == ["email-render.pdf"]
+    texts = [p["content"][0]["text"] for p in descriptions[-1]["content"] if p.get("content")]
+    assert texts[0] == "Full-fidelity email rendering attached: email-render.pdf"
+    assert {"doc.pdf", "email-render.pdf"} <= set(texts)
@@ -0,0 +1,82 @@
+from gaij.html_to_adf import build_adf_from_html, build_adf_from_tree, parse_html
+
+
+def _message(attachments):
+    return {
+        "from": "Marisa@oetraining.com",
+        "subject": "Sub",
+        "message_id": "<id1>",
+        "body_text": "Body",
+        "body_html": "<p>Body <img src='__INLINE_IMAGE__[img1]__'></p>",
+        "inline_map": {},
+        "inline_parts": [],
+        "attachments": attachments,
+    }
+
+
+def _run(app_setup, monkeypatch, message):
+    app = app_setup["app"]
+    jira_client = app_setup["jira_client"]
+    monkeypatch.setattr(app_setup["gmail_client"], "get_message", lambda mid: message)
+    monkeypatch.setattr(
+        app_setup["gpt_agent"], "gpt_classify_issue", lambda s, b: {"issueType": "Task"}
+    )
+    created = []
+    monkeypatch.setattr(
+        jira_client, "create_ticket", lambda s, adf, *a, **k: created.append(adf) or "JIRA-1"
+    )
+    monkeypatch.setattr(
+        jira_client,
+        "upload_attachments",
+        lambda key, atts: (
+            {a["filename"]: "uploaded" for a in atts},
+            {"img1": "10"} if atts else {},
+        ),
+    )
+    puts = []
+    monkeypatch.setattr(jira_client, "update_issue_description", lambda k, a: puts.append(a))
+    app.process_message("A1")
+    return created, puts
+
+
+def _attachment():
+    return {
+        "filename": "img.png",
+        "mime_type": "image/png",
+        "data_bytes": b"x",
+        "is_inline": True,
+        "content_id": "img1",
+    }
+
+
+def test_single_pass_creates_plain_then_puts_once(app_setup, monkeypatch):
+    created, puts = _run(app_setup, monkeypatch, _message([_attachment()]))
+    assert created[0]["content"][0]["content"][0]["text"] == "Body"
+    assert len(puts) == 1
+    final = puts[0]
+    assert final["content"][0]["content"][0]["text"].startswith("Full-fidelity")
+    assert any(n.get("type") == "mediaSingle" for n in final["content"])
+
+
+def test_no_put_when_nothing_to_upload(app_setup, monkeypatch):
+    monkeypatch.setattr(app_setup["app"].settings, "preserve_html_render", False)
+    created, puts = _run(app_setup, monkeypatch, _message([]))
+    assert created[0]["type"] == "doc"
+    assert puts == []
+
+
+def test_legacy_mode_creates_full_description(app_setup, monkeypatch):
+    monkeypatch.setattr(app_setup["app"].settings, "jira_single_pass_description", False)
+    created, puts = _run(app_setup, monkeypatch, _message([_attachment()]))
+    assert created[0]["content"][0]["content"][0]["text"].startswith("Full-fidelity")
+    assert len(puts) == 1
+
+
+def test_tree_can_be_reused():
+    html = "<p>Hi <img src='__INLINE_IMAGE__[a]__'></p>"
+    tree = parse_html(html)
+    first = build_adf_from_tree(tree, {})
+    second = build_adf_from_tree(tree, {"a": "1"})
+    assert first == build_adf_from_html(html, {})
+    assert second == build_adf_from_html(html, {"a": "1"})
+    assert first != second
@@ -0,0 +1,172 @@
+def _client(fs):
+    fs._get_collection()
+    return fs._client
+
+
+def test_writer_commits_markers_and_checkpoint_in_one_batch(firestore_state_module):
+    fs = firestore_state_module
+    for mid in ("A", "B", "C"):
+        assert fs.claim_message(mid)
+    writer = fs.StateWriter()
+    for mid in ("A", "B", "C"):
+        writer.mark_processed(mid)
+    assert "A" in fs._held  # still leased until the flush
+    writer.set_last_history_id(42)
+    assert writer.flush() is True
+    assert _client(fs).commits == [4]
+    assert fs.get_last_history_id() == 42
+    assert all(fs.is_processed(mid) for mid in ("A", "B", "C"))
+    assert not fs._held
+    assert writer.flush() is True
+    assert _client(fs).commits == [4]
+
+
+def test_writer_splits_batches_with_checkpoint_last(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    monkeypatch.setattr(fs, "_BATCH_LIMIT", 2)
+    writer = fs.StateWriter()
+    for mid in ("A", "B", "C"):
+        assert fs.claim_message(mid)
+        writer.mark_processed(mid)
+    writer.set_last_history_id(7)
+    assert writer.flush()
+    assert _client(fs).commits == [2, 2]
+    assert fs.get_last_history_id() == 7
+
+
+def test_writer_keeps_the_claim_and_retries_a_failed_commit(
+    firestore_state_module, monkeypatch
+):
+    fs = firestore_state_module
+    client = _client(fs)
+    make_batch = client.batch
+
+    class FailingBatch:
+        def set(self, ref, data):
+            pass
+
+        def update(self, ref, data, option=None):
+            pass
+
+        def create(self, ref, data):
+            pass
+
+        def commit(self):
+            raise fs.exceptions.ServiceUnavailable("down")
+
+    monkeypatch.setattr(client, "batch", lambda: FailingBatch())
+    assert fs.claim_message("A")
+    writer = fs.StateWriter()
+    writer.mark_processed("A")
+    writer.set_last_history_id(9)
+    assert writer.flush() is False
+    assert not fs.is_processed("A")
+    assert fs.get_last_history_id() is None
+    # The issue exists, so the message must not be claimed and filed again.
+    assert "A" in fs._held
+    assert not fs.claim_message("A")
+
+    monkeypatch.setattr(client, "batch", make_batch)
+    fs.renew_leases()
+    assert fs.is_processed("A")
+    assert not fs._held
+
+
+def test_writer_keeps_leases_until_their_batch_commits(firestore_state_module, monkeypatch):
+    fs = firestore_state_module
+    monkeypatch.setattr(fs, "_BATCH_LIMIT", 2)
+    client = _client(fs)
+    make_batch = client.batch
+    held_at_commit = []
+
+    def batch():
+        real = make_batch()
+        commit = real.commit
+
+        def failing_commit():
+            held_at_commit.append(sorted(fs._held))
+            if len(held_at_commit) == 2:
+                raise fs.exceptions.ServiceUnavailable("down")
+            commit()
+
+        real.commit = failing_commit
+        return real
+
+    monkeypatch.setattr(client, "batch", batch)
+    writer = fs.StateWriter()
+    for mid in ("A", "B", "C", "D"):
+        assert fs.claim_message(mid)
+        writer.mark_processed(mid)
+    assert writer.flush() is False
+    assert held_at_commit == [["A", "B", "C", "D"]] * 2
+    assert fs.is_processed("A") and fs.is_processed("B")
+    assert not fs.is_processed("C")
+    assert sorted(fs._held) == ["C", "D"]
+    assert not fs.claim_message("C")
+
+    fs.renew_leases()
+    assert fs.is_processed("C") and fs.is_processed("D")
+    assert not fs._held
+
+
+def test_writer_drops_markers_of_lost_leases(firestore_state_module):
+    fs = firestore_state_module
+    writer = fs.StateWriter()
+    for mid in ("A", "B", "C"):
+        assert fs.claim_message(mid)
+        writer.mark_processed(mid)
+    fs._marker_doc("B").update({"owner": "thief"})  # another worker took over
+    writer.mark_processed("D")  # never claimed
+    writer.set_last_history_id(5)
+    assert writer.flush() is True
+    assert fs.is_processed("A") and fs.is_processed("C")
+    marker = fs._get_collection().store["gaij_state/messages/ids/B"]
+    assert (marker["state"], marker["owner"]) == ("claimed", "thief")
+    assert "gaij_state/messages/ids/D" not in fs._get_collection().store
+    assert fs.get_last_history_id() == 5
+    assert not fs._held
+
+
+def _range_setup(app_setup, monkeypatch, ids, fail=()):
+    app = app_setup["app"]
+    fs = app_setup["firestore_state"]
+    monkeypatch.setattr(app.settings, "state_flush_mode", "range")
+    monkeypatch.setattr(app.settings, "preserve_html_render", False)
+    monkeypatch.setattr(app.gmail_client, "list_new_message_ids_since", lambda a, b, **kw: list(ids))
+
+    def get_message(mid):
+        if mid in fail:
+            raise RuntimeError("boom")
+        return {"from": "a@oetraining.com", "subject": mid, "body_text": "b", "attachments": []}
+
+    monkeypatch.setattr(app.gmail_client, "get_message", get_message)
+    monkeypatch.setattr(
+        app_setup["gpt_agent"], "gpt_classify_issue", lambda s, b: {"issueType": "Task"}
+    )
+    monkeypatch.setattr(app.jira_client, "create_ticket", lambda *a, **k: "J-1")
+    return app, fs
+
+
+def test_range_mode_commits_once_per_range(app_setup, monkeypatch):
+    app, fs = _range_setup(app_setup, monkeypatch, [str(i) for i in range(10)])
+    assert app.handle_new_messages(1, 99) is True
+    assert _client(fs).commits == [11]
+    assert fs.get_last_history_id() == 99
+    assert fs.is_processed("9")
+
+
+def test_range_mode_failure_keeps_checkpoint_but_saves_markers(app_setup, monkeypatch):
+    app, fs = _range_setup(app_setup, monkeypatch, ["1", "2", "3"], fail={"2"})
+    assert app.handle_new_messages(1, 99) is False
+    assert _client(fs).commits == [2]
+    assert fs.get_last_history_id() is None
+    assert fs.is_processed("1") and fs.is_processed("3")
+    assert not fs.is_processed("2")
+
+
+def test_message_mode_commits_per_message(app_setup, monkeypatch):
+    app, fs = _range_setup(app_setup, monkeypatch, ["1", "2"])
+    monkeypatch.setattr(app.settings, "state_flush_mode", "message")
+    assert app.handle_new_messages(1, 99) is True
+    assert _client(fs).commits == [1, 1]
+    assert fs.get_last_history_id() == 99
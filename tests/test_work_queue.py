@@ -0,0 +1,107 @@
+import threading
+
+from gaij.work_queue import HistoryQueue, run_consumer
+
+
+def test_enqueue_merges_adjacent_and_overlapping(tmp_path):
+    queue = HistoryQueue(str(tmp_path / "q.sqlite3"))
+    assert queue.enqueue(10, 20)
+    assert queue.enqueue(20, 30)  # adjacent
+    assert queue.enqueue(15, 35)  # overlapping, start raised to watermark
+    assert queue.pending() == [(10, 35)]
+    assert queue.watermark() == 35
+
+
+def test_enqueue_stale_push_is_dropped(tmp_path):
+    queue = HistoryQueue(str(tmp_path / "q.sqlite3"))
+    assert queue.enqueue(10, 20)
+    assert queue.enqueue(0, 18) is False
+    assert queue.enqueue(0, 20) is False
+    assert queue.pending() == [(10, 20)]
+
+
+def test_leased_range_is_not_merged(tmp_path):
+    queue = HistoryQueue(str(tmp_path / "q.sqlite3"))
+    queue.enqueue(10, 20)
+    item = queue.lease()
+    assert (item.start, item.end) == (10, 20)
+    assert queue.lease() is None
+    queue.enqueue(20, 30)
+    assert queue.pending() == [(10, 20), (20, 30)]
+    queue.complete(item)
+    assert queue.pending() == [(20, 30)]
+
+
+def test_release_backs_off_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "q.sqlite3")
+    queue = HistoryQueue(path)
+    queue.enqueue(10, 20)
+    item = queue.lease()
+    queue.release(item)
+    assert queue.lease() is None  # still backing off
+    queue.close()
+
+    reopened = HistoryQueue(path)
+    assert reopened.pending() == [(10, 20)]
+    assert reopened.watermark() == 20
+
+
+def test_run_consumer_drains_queue(tmp_path):
+    queue = HistoryQueue(str(tmp_path / "q.sqlite3"))
+    queue.enqueue(1, 5)
+    stop = threading.Event()
+    handled = []
+
+    def handler(start, end, checkpoint):
+        handled.append((start, end, checkpoint))
+        stop.set()
+        return True
+
+    run_consumer(queue, handler, stop, poll_interval=0.01)
+    assert handled == [(1, 5, 5)]
+    assert queue.pending() == []
+
+
+def test_checkpoint_stops_at_earlier_pending_range(tmp_path):
+    queue = HistoryQueue(str(tmp_path / "q.sqlite3"))
+    queue.enqueue(10, 20)
+    first = queue.lease()
+    queue.enqueue(20, 30)  # not merged: the first range is leased
+    queue.release(first)  # and now backing off
+    second = queue.lease()
+    assert (second.start, second.end) == (20, 30)
+    assert queue.checkpoint_for(second) == 10
+
+    queue.complete(first)
+    assert queue.checkpoint_for(second) == 30
+
+
+def test_pubsub_async_mode_acks_before_processing(
+    app_setup, monkeypatch, pubsub_envelope, tmp_path
+):
+    app = app_setup["app"]
+    client = app_setup["client"]
+    fs = app_setup["firestore_state"]
+    fs.set_last_history_id(100)
+    monkeypatch.setattr(app.settings, "pubsub_async_mode", True)
+    monkeypatch.setattr(app.settings, "work_queue_path", str(tmp_path / "q.sqlite3"))
+
+    handled = []
+    done = threading.Event()
+
+    def fake_handle(start, end, checkpoint_id=None):
+        handled.append((start, end))
+        done.set()
+        return True
+
+    monkeypatch.setattr(app, "handle_new_messages", fake_handle)
+    try:
+        resp = client.post("/pubsub", json=pubsub_envelope)
+        assert resp.status_code == 204
+        assert done.wait(5)
+        # A redelivery of the same push is dropped without touching Firestore.
+        monkeypatch.setattr(fs, "get_last_history_id", lambda: 1 / 0)
+        assert client.post("/pubsub", json=pubsub_envelope).status_code == 204
+    finally:
+        app.shutdown_history_queue()
+    assert handled == [(100, 12345)]